@@ -0,0 +1,84 @@
+"""
+耐久性のモード（strict / batch / relaxed）ごとの在庫の書き込み速度。
+
+    python -m benchmarks.bench_durability --ops 300 --burst 2000
+
+保存先（csv / sqlite）× モードごとに一時フォルダを使い、
+1. 1件ずつの入庫（画面から1件ずつ登録する場合）を ops 回
+2. batch() でまとめた入庫（スキャナの移動ファイルの一括取込）を burst 件
+を行って writes/sec を JSON で出力する。batch モードは実際に行った fsync の回数も出す。
+最後に保存先を開き直し、在庫数量が入庫合計と一致することを確認する。一致しなければ終了コード 1。
+"""
+import argparse, json, shutil, sys, tempfile, time
+from collections import defaultdict
+from factory_app.infra import inventory_repo as repo
+from factory_app.infra.durability import DURABILITY_MODES, GROUP, use_durability
+
+PRODUCTS = [f"P{i:03d}" for i in range(50)]
+EXP = "2027/01/01"
+NOW = "2026/10/01 08:00:00"
+
+def _ops_per_sec(n: int, fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return round(n / (time.perf_counter() - t0), 1)
+
+def run_one(backend: str, mode: str, n_ops: int, n_burst: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_durability_")
+    try:
+        use_durability(mode)
+        repo.use_storage(root, backend)
+        store = repo.get_store()
+        expected = defaultdict(float)
+        flushes = GROUP.flushes
+
+        def single():
+            for k in range(n_ops):
+                code = PRODUCTS[k % len(PRODUCTS)]
+                store.inbound(code, EXP, "2026/10/01", 1.0, NOW)
+                expected[code] += 1.0
+
+        def burst():
+            with store.batch():
+                for k in range(n_burst):
+                    code = PRODUCTS[k % len(PRODUCTS)]
+                    store.inbound(code, EXP, "2026/10/02", 2.0, NOW)
+                    expected[code] += 2.0
+
+        single_rate = _ops_per_sec(n_ops, single)
+        burst_rate = _ops_per_sec(n_burst, burst)
+        GROUP.flush()
+        res = {"single_writes_per_sec": single_rate, "burst_writes_per_sec": burst_rate}
+        if mode == "batch":
+            res["fsyncs"] = GROUP.flushes - flushes
+
+        repo.use_storage(root, backend)   # 開き直して永続化された内容を読む
+        df = repo.load_inventory()
+        actual = df.groupby("product_code")["qty"].sum().to_dict()
+        res["consistent"] = bool(actual == dict(expected))
+        return res
+    finally:
+        use_durability(None)
+        shutil.rmtree(root, ignore_errors=True)
+
+def run(n_ops: int, n_burst: int, backends) -> dict:
+    res = {"ops": n_ops, "burst": n_burst}
+    for backend in backends:
+        for mode in DURABILITY_MODES:
+            res[f"{backend}_{mode}"] = run_one(backend, mode, n_ops, n_burst)
+    res["consistent"] = all(v["consistent"] for k, v in res.items() if isinstance(v, dict))
+    return res
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--ops", type=int, default=300)
+    ap.add_argument("--burst", type=int, default=2000)
+    ap.add_argument("--backend", choices=["csv", "sqlite", "both"], default="both")
+    args = ap.parse_args(argv)
+    backends = ["csv", "sqlite"] if args.backend == "both" else [args.backend]
+    res = run(args.ops, args.burst, backends)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+期限切れ・期限間近の判定：賞味期限の索引（infra.expiry_index、変更行だけ取り込む）と、毎回在庫表を全件走査する方法。
+
+    python -m benchmarks.bench_expiry --lots 100000 --ops 300
+    python -m benchmarks.bench_expiry --lots 100000 --backend sqlite
+
+ロット数ごとに一時フォルダへ在庫を作り、入庫・出庫・戻しを ops 回行って、移動の直後ごとに
+1. 索引：変更行を取り込んで件数だけ数える（画面の表示）
+2. 索引：期限切れ・期限間近のロットの一覧（inventory_repo.expiry_alerts）
+3. 全件走査：在庫表を読み、数量 > 0・賞味期限の範囲で絞って並べる
+の時間を JSON で出力する。一覧が全件走査の結果と1回でも違えば終了コード 1。
+"""
+import argparse, json, random, shutil, sys, tempfile, time
+import pandas as pd
+from factory_app.infra import inventory_repo
+from factory_app.infra.durability import RELAXED, use_durability
+from factory_app.infra.expiry_index import add_days
+from factory_app.infra.logging_conf import use_metrics
+
+TODAY = "2026/10/18"
+DAYS = 30
+
+def _lot(i: int):
+    # 基準日の少し前から約2年先までの賞味期限
+    return f"P{i // 4:05d}", add_days("2026/09/01", (i * 37) % 720)
+
+def seed(root: str, n_lots: int, backend: str) -> None:
+    inventory_repo.use_storage(root, backend)
+    moves = pd.DataFrame([{"op": "inbound", "product_code": c, "exp_date": e, "in_date": "2026/08/01",
+                           "qty": 1 + i % 3} for i, (c, e) in ((i, _lot(i)) for i in range(n_lots))])
+    inventory_repo.apply_movements(moves, table=False)
+
+def _move(rng: random.Random, n_lots: int) -> None:
+    code, exp = _lot(rng.randrange(n_lots))
+    r = rng.random()
+    if r < 0.3:
+        inventory_repo.inbound(code, exp, "2026/10/01", 1.0, table=False)
+    elif r < 0.9:
+        inventory_repo.outbound(code, exp, 1.0, table=False)   # 在庫 0 になって索引から外れるロットも出る
+    else:
+        inventory_repo.return_in(code, exp, "2026/09/15", 1.0, table=False)
+
+def full_scan(today: str, days: int):
+    """索引を使わない方法：在庫表を全件読み、絞り込んで並べる"""
+    df = inventory_repo.load_inventory().reset_index().rename(columns={"index": "rid"})
+    live = df[(df["qty"] > 0) & (df["exp_date"] != "")]
+    live = live.sort_values(["exp_date", "product_code", "in_date", "rid"])
+    cols = ["product_code", "exp_date", "in_date", "qty"]
+    expired = live[live["exp_date"] < today][cols]
+    near = live[(live["exp_date"] >= today) & (live["exp_date"] <= add_days(today, days))][cols]
+    return [tuple(r) for r in expired.itertuples(index=False)], [tuple(r) for r in near.itertuples(index=False)]
+
+def _ms(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 3)
+
+def run_one(n_lots: int, n_ops: int, backend: str, seed_no: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_expiry_")
+    try:
+        seed(root, n_lots, backend)
+        t0 = time.perf_counter()
+        inventory_repo.expiry_index()
+        build_ms = (time.perf_counter() - t0) * 1000
+        rng = random.Random(seed_no)
+        counts, lists, scans = [], [], []
+        mismatches = 0
+        for k in range(n_ops):
+            _move(rng, n_lots)
+            t0 = time.perf_counter()
+            index = inventory_repo.expiry_index()
+            index.count_before(TODAY), index.count_between(TODAY, add_days(TODAY, DAYS))
+            counts.append(time.perf_counter() - t0)
+            _move(rng, n_lots)
+            t0 = time.perf_counter()
+            _, _, expired, near = inventory_repo.expiry_alerts(DAYS, TODAY)
+            lists.append(time.perf_counter() - t0)
+            if k % max(1, n_ops // 10) == 0:   # 全件走査は遅いので一部だけ
+                t0 = time.perf_counter()
+                want = full_scan(TODAY, DAYS)
+                scans.append(time.perf_counter() - t0)
+                mismatches += (expired, near) != want
+        return {
+            "lots": n_lots, "ops": n_ops, "backend": backend,
+            "expired_lots": len(expired), "near_lots": len(near),
+            "index_build_ms": round(build_ms, 1),
+            "index_counts_p50_ms": _ms(counts, 0.5), "index_counts_p99_ms": _ms(counts, 0.99),
+            "index_lists_p50_ms": _ms(lists, 0.5), "index_lists_p99_ms": _ms(lists, 0.99),
+            "full_scan_p50_ms": _ms(scans, 0.5), "full_scan_p99_ms": _ms(scans, 0.99),
+            "mismatches": int(mismatches),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--lots", default="100000")
+    ap.add_argument("--ops", type=int, default=300)
+    ap.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    use_durability(RELAXED)
+    use_metrics(False)
+    try:
+        res = {"today": TODAY, "days": DAYS,
+               "cases": [run_one(int(n), args.ops, args.backend, args.seed) for n in args.lots.split(",")]}
+    finally:
+        use_durability(None)
+    res["consistent"] = all(c["mismatches"] == 0 for c in res["cases"])
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+点検表 Excel 一括出力のベンチマーク兼照合。
+
+    python -m benchmarks.bench_export --items 30 --processes 4
+
+12か月 × 全機械 × 全種別 のシートを次の方法で書き出し、所要時間を JSON で出力する。
+1. 旧方式：シートごとに通常の Workbook を組み立てて1ファイルずつ保存（列幅は get_column_letter で修正したもの）
+2. write_only で1ファイルずつ（同一プロセス）
+3. write_only で1ファイルずつ（プロセスプール）
+4. write_only で月ごとに1ブック（プロセスプール）
+5. write_only で1年分を1ブック
+旧方式と write_only の出力（値・塗り・配置・結合・列幅）が一致しなければ終了コード 1。
+"""
+import argparse, calendar, json, os, random, shutil, sys, tempfile, time
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import PatternFill, Alignment, Font
+from openpyxl.utils import get_column_letter
+from factory_app.domain.state import CIRCLE
+from factory_app.infra.excel_export import export_check_books
+from factory_app.infra.settings import DEFAULT_MACHINES as MACHINES, DEFAULT_TYPE_NAMES as TYPE_NAMES
+
+def make_sheets(year: int, n_items: int, seed: int):
+    rng = random.Random(seed)
+    items = [f"点検項目{i:02d}" for i in range(n_items)]
+    sheets = []
+    for month in range(1, 13):
+        nd = calendar.monthrange(year, month)[1]
+        for type_name in TYPE_NAMES:
+            for machine in MACHINES:
+                sheets.append(dict(year=year, month=month, machine=machine, type_name=type_name, items=items,
+                                   matrix={it: [CIRCLE if rng.random() < 0.8 else "" for _ in range(nd)] for it in items},
+                                   signs=[rng.choice(["", "山田", "佐藤"]) for _ in range(nd)]))
+    return sheets
+
+def legacy_export(*, year, month, machine, type_name, items, matrix, signs, save_path):
+    """変更前の export_monthly_check_sheet（chr(64+i) だけ get_column_letter に直したもの）"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = f"{type_name}"[:31]
+    ws.cell(1, 1, f"{type_name}（{year}年{month}月） 機械: {machine}")
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=2+len(signs))
+    ws.cell(1,1).font = Font(bold=True)
+    ws.cell(1,1).alignment = Alignment(horizontal="left")
+    ws.cell(2, 1, "点検項目")
+    for d in range(len(signs)):
+        ws.cell(2, 2+d, f"{d+1}")
+        ws.cell(2, 2+d).alignment = Alignment(horizontal="center")
+    yellow = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
+    center = Alignment(horizontal="center", vertical="center")
+    r = 3
+    for it in items:
+        ws.cell(r, 1, it)
+        for d, val in enumerate(matrix.get(it, [])):
+            c = ws.cell(r, 2+d, val)
+            c.alignment = center
+            if val != CIRCLE:
+                c.fill = yellow
+        r += 1
+    ws.cell(r, 1, "サイン")
+    for d, s in enumerate(signs):
+        ws.cell(r, 2+d, s).alignment = center
+    ws.column_dimensions["A"].width = 22
+    for i in range(2, 2+len(signs)):
+        ws.column_dimensions[get_column_letter(i)].width = 4
+    wb.save(save_path)
+    return save_path
+
+def _fingerprint(ws):
+    cells = []
+    for row in ws.iter_rows():
+        for c in row:
+            v = c.value if c.value != "" else None
+            cells.append((c.coordinate, v, c.fill.fill_type, c.fill.fgColor.rgb,
+                          c.alignment.horizontal, c.alignment.vertical, bool(c.font.b)))
+    widths = {k: v.width for k, v in ws.column_dimensions.items()}
+    return cells, sorted(str(r) for r in ws.merged_cells.ranges), widths
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, round(time.perf_counter() - t0, 3)
+
+def run(year: int, n_items: int, processes: int, seed: int) -> dict:
+    sheets = make_sheets(year, n_items, seed)
+    root = tempfile.mkdtemp(prefix="bench_export_")
+    try:
+        dirs = {k: os.path.join(root, k) for k in ("legacy", "serial", "pool", "month", "year")}
+        for d in dirs.values():
+            os.makedirs(d)
+
+        def per_sheet(d):
+            return [(os.path.join(d, f"{i:03d}.xlsx"), [sh]) for i, sh in enumerate(sheets)]
+
+        legacy, t_legacy = _timed(lambda: [legacy_export(**sh, save_path=p) for p, (sh,) in per_sheet(dirs["legacy"])])
+        serial, t_serial = _timed(lambda: export_check_books(per_sheet(dirs["serial"]), processes=1))
+        _, t_pool = _timed(lambda: export_check_books(per_sheet(dirs["pool"]), processes=processes))
+        months = {}
+        for sh in sheets:
+            months.setdefault(os.path.join(dirs["month"], f"{sh['month']:02d}.xlsx"), []).append(sh)
+        _, t_month = _timed(lambda: export_check_books(list(months.items()), processes=processes))
+        _, t_year = _timed(lambda: export_check_books([(os.path.join(dirs["year"], "year.xlsx"), sheets)], processes=1))
+
+        match = all(_fingerprint(load_workbook(a).active) == _fingerprint(load_workbook(b).active)
+                    for a, b in zip(legacy, serial))
+        year_wb = load_workbook(os.path.join(dirs["year"], "year.xlsx"), read_only=True)
+        return {
+            "sheets": len(sheets), "items": n_items, "processes": processes,
+            "legacy_per_file_sec": t_legacy, "write_only_per_file_sec": t_serial,
+            "write_only_per_file_pool_sec": t_pool, "write_only_per_month_pool_sec": t_month,
+            "write_only_one_book_sec": t_year,
+            "one_book_sheets": len(year_wb.sheetnames),
+            "output_matches_legacy": bool(match),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--year", type=int, default=2026)
+    ap.add_argument("--items", type=int, default=30)
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    res = run(args.year, args.items, args.processes, args.seed)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["output_matches_legacy"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+点検表グリッドの切替時間の計測。
+
+    python -m benchmarks.bench_grid --items 30 --switches 30
+    python -m benchmarks.bench_grid --items 30 --limit-ms 100
+
+点検項目 N 件の状態を「機械 × 月（28/30/31日）」で切り替えながら、
+1. InspectionGrid.show（ウィジェット使い回し・差分更新）
+2. 旧 rerender_grid（子ウィジェットを全て破棄して作り直し）
+の1回あたりの所要時間を JSON で出力する。--limit-ms を指定した場合だけ、show の最大値がそれを超えたら終了コード 1。
+FreeSimpleGUI（または PySimpleGUI）と画面（DISPLAY）が必要。
+ウィジェットを使い回すこと（切替で要素を作らず、変わった要素だけ update する）の検証は
+画面なしで動く tests/test_inspection_grid.py で行う。
+"""
+import argparse, json, random, statistics, sys, time
+try:
+    import FreeSimpleGUI as sg
+except Exception:
+    import PySimpleGUI as sg
+from factory_app.domain.state import MonthlyState, CIRCLE
+from factory_app.ui.inspection_grid import InspectionGrid, GRID_KEY
+
+FONT = ("Meiryo UI", 10)
+
+def make_states(n_items: int, seed: int):
+    rng = random.Random(seed)
+    items = [f"点検項目{i:02d}" for i in range(n_items)]
+    states = []
+    for machine in ["1番充填", "2番充填", "3番充填"]:
+        for year, month in [(2026, 2), (2026, 4), (2026, 5)]:
+            st = MonthlyState(year=year, month=month, machine=machine, type_name="始業前点検")
+            st.ensure_shapes(items)
+            for row in st.items.values():
+                for d in range(len(row)):
+                    row[d] = CIRCLE if rng.random() < 0.7 else ""
+            st.sign = [rng.choice(["", "山田", "佐藤"]) for _ in st.sign]
+            states.append(st)
+    return states
+
+def legacy_layout(state, font):
+    """変更前の main_ui._grid_layout（項目名をキーにして毎回作り直す）"""
+    num_days = state.num_days
+    rows = [[sg.Text("点検項目", size=(18,1), font=font)]
+            + [sg.Text(str(d), size=(3,1), justification="center", font=font) for d in range(1, num_days+1)]]
+    for it, row in state.items.items():
+        line = [sg.Text(it, size=(18,1), font=font)]
+        line += [sg.Button(row[d-1] or "　", key=f"-I-CHECK_{it}_{d}-", size=(2,1), pad=(1,1)) for d in range(1, num_days+1)]
+        rows.append(line)
+    rows.append([sg.Text("サイン", size=(18,1), font=font)]
+                + [sg.Input(state.sign[d-1], key=f"-I-SIGN_{d}-", size=(4,1), pad=(1,1)) for d in range(1, num_days+1)])
+    return rows
+
+def legacy_rerender(window, key, state, font):
+    cont = window[key]
+    for child in cont.Widget.winfo_children():
+        child.destroy()
+    cont.Widget.update()
+    cont.Layout(legacy_layout(state, font))
+    cont.Widget.update()
+
+def _time(fn, window, states, switches):
+    times = []
+    for i in range(switches):
+        t0 = time.perf_counter()
+        fn(states[i % len(states)])
+        window.refresh()   # 描画まで含めて計る
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+def run(n_items: int, switches: int, seed: int) -> dict:
+    states = make_states(n_items, seed)
+    grid = InspectionGrid(FONT, rows=n_items)
+    legacy_key = "-LEGACY-"
+    layout = [[sg.Column(grid.layout(), key=GRID_KEY, scrollable=True, vertical_scroll_only=True, size=(900, 400)),
+               sg.Column(legacy_layout(states[0], FONT), key=legacy_key, scrollable=True, vertical_scroll_only=True,
+                         size=(900, 400))]]
+    window = sg.Window("bench_grid", layout, finalize=True)
+    try:
+        grid.show(window, states[0])
+        show_ms = _time(lambda st: grid.show(window, st), window, states, switches)
+        legacy_ms = _time(lambda st: legacy_rerender(window, legacy_key, st, FONT), window, states, switches)
+    finally:
+        window.close()
+    return {
+        "items": n_items, "switches": switches,
+        "pooled_show_ms_median": round(statistics.median(show_ms), 2), "pooled_show_ms_max": round(max(show_ms), 2),
+        "legacy_rebuild_ms_median": round(statistics.median(legacy_ms), 2),
+        "legacy_rebuild_ms_max": round(max(legacy_ms), 2),
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--items", type=int, default=30)
+    ap.add_argument("--switches", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--limit-ms", type=float, default=None, help="show の最大値の上限（例: 100）。省略時は計測のみ")
+    args = ap.parse_args(argv)
+    res = run(args.items, args.switches, args.seed)
+    if args.limit_ms is not None:
+        res["limit_ms"] = args.limit_ms
+        res["within_limit"] = res["pooled_show_ms_max"] <= args.limit_ms
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res.get("within_limit", True) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+過去の点検表 Excel の一括取込：ブックを通常モードで開いて1か月ずつ保存する方法と、
+読み取り専用（流し読み）+ プロセスプール + まとめて保存（usecase.inspection.import_excel_history）。
+
+    python -m benchmarks.bench_import --years 20 --processes 4
+    python -m benchmarks.bench_import --years 5 --batch 100 --durability relaxed
+
+years 年分 × 12か月 × 全機械 × 全種別 の点検表を1シート1ファイル（export-sheets --per sheet と同じ）で一時フォルダへ書き出し、
+1. 従来：load_workbook（通常モード）→ シートを読む → save_monthly_state を1か月ずつ（同一プロセス）
+2. 取込：流し読み + batch か月ずつ保存（同一プロセス）
+3. 取込：流し読み + batch か月ずつ保存（プロセスプール）
+の時間と、1年分を1ブックにしたファイルを通常モード・読み取り専用で読んだときのメモリのピークを JSON で出力する。
+取り込んだ月次状態が書き出した内容と1件でも違えば終了コード 1。
+"""
+import argparse, calendar, json, os, random, shutil, sys, tempfile, time, tracemalloc
+from openpyxl import load_workbook
+from factory_app.domain.state import CIRCLE, MonthlyState
+from factory_app.infra import repo
+from factory_app.infra.durability import DURABILITY_MODES, STRICT, use_durability
+from factory_app.infra.excel_export import export_check_books
+from factory_app.infra.excel_import import read_check_book, read_check_sheet
+from factory_app.infra.logging_conf import use_metrics
+from factory_app.infra.settings import DEFAULT_MACHINES as MACHINES, DEFAULT_TYPE_NAMES as TYPE_NAMES
+from factory_app.usecase import inspection as uc
+
+FIRST_YEAR = 2006
+
+def make_states(years: int, seed: int):
+    rng = random.Random(seed)
+    states = []
+    for year in range(FIRST_YEAR, FIRST_YEAR + years):
+        for month in range(1, 13):
+            nd = calendar.monthrange(year, month)[1]
+            for type_name in TYPE_NAMES:
+                for machine in MACHINES:
+                    items = repo.default_items(type_name, machine)
+                    states.append(MonthlyState(year, month, machine, type_name,
+                                               items={it: [CIRCLE if rng.random() < 0.85 else "" for _ in range(nd)]
+                                                      for it in items},
+                                               sign=[rng.choice(["", "山田", "佐藤"]) for _ in range(nd)]))
+    return states
+
+def _sheet(st: MonthlyState):
+    return dict(year=st.year, month=st.month, machine=st.machine, type_name=st.type_name,
+                items=list(st.items), matrix=st.items, signs=st.sign)
+
+def legacy_import(paths):
+    """通常モードで開き、1か月ずつ save_monthly_state（1回ごとに書き込みのトランザクション）"""
+    for path in paths:
+        wb = load_workbook(path)
+        for ws in wb.worksheets:
+            sh = read_check_sheet(ws.iter_rows(values_only=True))
+            st = MonthlyState(sh["year"], sh["month"], sh["machine"], sh["type_name"], items=sh["matrix"], sign=sh["signs"])
+            st.ensure_shapes(repo.default_items(st.type_name, st.machine))
+            repo.save_monthly_state(st.type_name, st.year, st.month, st.machine, st.to_dict())
+
+def _mismatches(states) -> int:
+    return sum(repo.load_monthly_state(st.type_name, st.year, st.month, st.machine) != st.to_dict() for st in states)
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, round(time.perf_counter() - t0, 2)
+
+def _peak_mb(fn, *args) -> float:
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 2**20, 1)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--years", type=int, default=20)
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch", type=int, default=uc.IMPORT_BATCH)
+    ap.add_argument("--durability", choices=DURABILITY_MODES, default=STRICT,
+                    help="保存の耐久性（従来の方法は1か月ごとに書き込みを確定する）")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    use_durability(args.durability)
+    use_metrics(False)
+    tmp = tempfile.mkdtemp(prefix="bench_import_")
+    try:
+        states = make_states(args.years, args.seed)
+        src = os.path.join(tmp, "sheets")
+        os.makedirs(src)
+        books = [(os.path.join(src, uc.sheet_file_name(st)), [_sheet(st)]) for st in states]
+        _, export_s = _timed(export_check_books, books, args.processes)
+        year_book = os.path.join(tmp, "year.xlsx")
+        export_check_books([(year_book, [_sheet(st) for st in states if st.year == FIRST_YEAR])], 1)
+        paths = [p for p, _ in books]
+        res = {"years": args.years, "files": len(paths), "processes": args.processes, "batch": args.batch,
+               "durability": args.durability,
+               "cpu_count": os.cpu_count(), "export_s": export_s}
+        mismatches = 0
+        runs = [("legacy_s", legacy_import, (paths,))]
+        runs += [(f"stream_batch_{p}proc_s", uc.import_excel_history, (src, p, args.batch))
+                 for p in sorted({1, args.processes})]
+        for name, fn, fn_args in runs:
+            repo.use_state_root(os.path.join(tmp, name))
+            out, res[name] = _timed(fn, *fn_args)
+            if out is not None:
+                mismatches += out["imported"] != len(states) or bool(out["skipped"]) or bool(out["mismatched"])
+            mismatches += _mismatches(states)
+        res["files_per_s"] = {name: round(len(paths) / res[name], 1) for name, _, _ in runs}
+        # 1年分（全シート）を1ブックにしたファイルを読むときのメモリ
+        res["year_book_sheets"] = len(MACHINES) * len(TYPE_NAMES) * 12
+        res["year_book_peak_mb"] = {
+            "normal": _peak_mb(lambda p: [list(ws.iter_rows(values_only=True)) for ws in load_workbook(p).worksheets],
+                               year_book),
+            "read_only": _peak_mb(read_check_book, year_book)}
+        res["mismatches"] = int(mismatches)
+        res["consistent"] = mismatches == 0
+    finally:
+        use_durability(None)
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
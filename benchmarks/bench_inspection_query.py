@@ -0,0 +1,87 @@
+"""
+点検実施率の集計：月次 JSON を全部読む方式と InspectionStore の SQL 集計の比較。
+
+    python -m benchmarks.bench_inspection_query --years 5 --items 20
+
+年数 × 12か月 × 全機械 × 全種別 の月次 JSON を一時フォルダに作り、
+1. 旧方式：全ファイルを開いて MonthlyState にして数える
+2. InspectionStore.import_json_dir（初回のみ）
+3. InspectionStore.completion_counts（種別 × 機械 × 項目）
+を「直近1年」と「全期間」について計り、所要時間を JSON で出力する。集計結果が一致しなければ終了コード 1。
+ローカルディスク（ファイルキャッシュが効く状態）での計測なので、共有フォルダ上で
+ファイルごとに開く遅延が乗る旧方式の実際の遅さはここには出ない。
+"""
+import argparse, calendar, glob, json, os, random, shutil, sys, tempfile, time
+from collections import defaultdict
+from factory_app.domain.state import MonthlyState, CIRCLE
+from factory_app.infra.inspection_store import InspectionStore
+from factory_app.infra.settings import DEFAULT_MACHINES as MACHINES, DEFAULT_TYPE_NAMES as TYPE_NAMES
+
+def make_files(root: str, years, n_items: int, seed: int) -> int:
+    rng = random.Random(seed)
+    items = [f"点検項目{i:02d}" for i in range(n_items)]
+    n = 0
+    for year in years:
+        for month in range(1, 13):
+            nd = calendar.monthrange(year, month)[1]
+            for type_name in TYPE_NAMES:
+                for machine in MACHINES:
+                    data = {"year": year, "month": month, "machine": machine, "type_name": type_name,
+                            "items": {it: [CIRCLE if rng.random() < 0.8 else "" for _ in range(nd)] for it in items},
+                            "sign": [""] * nd}
+                    path = os.path.join(root, f"{type_name}_{year}-{month:02d}_{machine}.json")
+                    with open(path, "w", encoding="utf-8-sig") as f:
+                        json.dump(data, f, ensure_ascii=False, indent=2)
+                    n += 1
+    return n
+
+def legacy_counts(root: str, year=None):
+    """旧方式：該当年（None なら全期間）の月次ファイルを全部読んで数える"""
+    counts = defaultdict(lambda: [0, 0])
+    for path in glob.glob(os.path.join(root, f"*_{year or '*'}-*_*.json")):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            st = MonthlyState(**json.load(f))
+        for it, row in st.items.items():
+            c = counts[(st.type_name, st.machine, it)]
+            c[0] += sum(v == CIRCLE for v in row)
+            c[1] += len(row)
+    return dict(counts)
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, round(time.perf_counter() - t0, 4)
+
+def run(n_years: int, n_items: int, seed: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_inspection_")
+    try:
+        years = list(range(2026 - n_years + 1, 2027))
+        n_files = make_files(root, years, n_items, seed)
+        store = InspectionStore(os.path.join(root, "inspection.sqlite3"))
+        imported, t_import = _timed(lambda: store.import_json_dir(root))
+        res = {"files": n_files, "imported": imported, "items": n_items, "import_once_sec": t_import}
+        match = True
+        for label, year, lo, hi in [("year", 2026, 20260101, 20261231), ("all", None, 0, 99991231)]:
+            legacy, t_legacy = _timed(lambda: legacy_counts(root, year))
+            df, t_query = _timed(lambda: store.completion_counts(lo, hi))
+            new = {(r.type_name, r.machine, r.item): [int(r.done), int(r.total)] for r in df.itertuples(index=False)}
+            match &= legacy == new
+            res[f"{label}_legacy_parse_files_sec"] = t_legacy
+            res[f"{label}_query_sec"] = t_query
+        res["counts_match"] = bool(match)
+        return res
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--items", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    res = run(args.years, args.items, args.seed)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["counts_match"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+在庫タブの表の更新時間：全件の表を作り直す従来の経路と、変更行だけ取り込んでページを返す経路（inventory_repo.table_page）。
+
+    python -m benchmarks.bench_inventory_view --lots 50000,100000 --ops 200
+    python -m benchmarks.bench_inventory_view --lots 100000 --backend sqlite
+
+ロット数ごとに一時フォルダへ在庫（と製品マスタ）を作り、入庫・出庫・戻しを ops 回行って、1回あたり
+1. 従来：移動 → 並べ替えた在庫表 → 全行を画面用のリストへ変換（_df_to_values 相当）
+2. 差分：移動（table=False）→ table_page で表示中の1ページだけ
+の時間を JSON で出力する。最後にいくつかの絞り込み・並べ替え条件でページを pandas の結果と比べ、
+1件でも違えば終了コード 1。
+"""
+import argparse, json, random, shutil, sys, tempfile, time
+import pandas as pd
+from factory_app.domain.product_index import normalize
+from factory_app.infra import inventory_repo
+from factory_app.infra.durability import RELAXED, use_durability
+from factory_app.infra.inventory_view import PAGE_SIZE, ViewQuery
+from factory_app.infra.logging_conf import use_metrics
+
+QUERIES = [
+    ViewQuery(),
+    ViewQuery(hide_zero=True, sort_by="qty", descending=True),
+    ViewQuery(product="P001", exp_from="2027/03/01", exp_to="2027/06/30"),
+    ViewQuery(product="ﾐﾙｸ", sort_by="exp_date"),
+    ViewQuery(sort_by="updated_at", descending=True),
+]
+
+def _lot(i: int):
+    return f"P{i // 4:05d}", f"2027/{1 + i % 12:02d}/{1 + (i * 7) % 28:02d}"
+
+def seed(root: str, n_lots: int, backend: str) -> None:
+    inventory_repo.use_storage(root, backend)
+    inventory_repo.ensure_files()
+    codes = sorted({_lot(i)[0] for i in range(n_lots)})
+    names = [("ミルク " if k % 3 == 0 else "お茶 ") + c for k, c in enumerate(codes)]
+    pd.DataFrame({"product_code": codes, "product_name": names}).to_csv(
+        inventory_repo.PRODUCT_MASTER_CSV, index=False, encoding=inventory_repo.ENC)
+    moves = pd.DataFrame([{"op": "inbound", "product_code": c, "exp_date": e, "in_date": "2026/09/01",
+                           "qty": 10 + i % 5} for i, (c, e) in ((i, _lot(i)) for i in range(n_lots))])
+    inventory_repo.apply_movements(moves, table=False)
+
+def _move(rng: random.Random, n_lots: int, table: bool):
+    code, exp = _lot(rng.randrange(n_lots))
+    r = rng.random()
+    if r < 0.4:
+        return inventory_repo.inbound(code, exp, "2026/10/01", 1.0, table=table)
+    if r < 0.8:
+        return inventory_repo.outbound(code, exp, 1.0, table=table)
+    return inventory_repo.return_in(code, exp, "2026/09/15", 1.0, table=table)
+
+def _ms(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+def _reference(query: ViewQuery, offset: int):
+    """pandas で同じ条件・順序にした offset 行目からの1ページ（rid は保存順の行番号）"""
+    df = inventory_repo.load_inventory().reset_index().rename(columns={"index": "rid"})
+    pm = inventory_repo.load_product_master()
+    df["product_name"] = df["product_code"].map(pm.set_index("product_code")["product_name"]).fillna("")
+    if query.hide_zero:
+        df = df[df["qty"] > 0]
+    if query.exp_from:
+        df = df[df["exp_date"] >= query.exp_from]
+    if query.exp_to:
+        df = df[df["exp_date"] <= query.exp_to]
+    if query.product:
+        needle = normalize(query.product)
+        hit = df["product_code"].map(normalize).str.contains(needle, regex=False) | \
+            df["product_name"].map(normalize).str.contains(needle, regex=False)
+        df = df[hit]
+    df = df.sort_values([query.sort_by, "product_code", "exp_date", "in_date", "rid"])
+    rows = df[["product_code", "product_name", "exp_date", "in_date", "qty", "updated_at"]].values.tolist()
+    if query.descending:
+        rows = rows[::-1]
+    return len(rows), rows[offset:offset + PAGE_SIZE]
+
+def run_one(n_lots: int, n_ops: int, backend: str, seed_no: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_inventory_view_")
+    try:
+        seed(root, n_lots, backend)
+        rng = random.Random(seed_no)
+        before = []
+        for _ in range(n_ops):
+            t0 = time.perf_counter()
+            _, _, df = _move(rng, n_lots, table=True)
+            values = df.values.tolist() if not df.empty else []
+            before.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        first = inventory_repo.table_page()
+        first_ms = (time.perf_counter() - t0) * 1000
+        after = []
+        for k in range(n_ops):
+            t0 = time.perf_counter()
+            _move(rng, n_lots, table=False)
+            page = inventory_repo.table_page(None, (k % 5) * PAGE_SIZE)
+            after.append(time.perf_counter() - t0)
+        mismatches = 0
+        for q in QUERIES:
+            for offset in (0, 3 * PAGE_SIZE):
+                page = inventory_repo.table_page(q, offset)
+                total, rows = _reference(q, page.offset)
+                mismatches += total != page.total or rows != page.rows
+        return {
+            "lots": n_lots, "ops": n_ops, "backend": backend,
+            "rows_sent_before": len(values), "rows_sent_after": len(first.rows),
+            "first_page_ms": round(first_ms, 1),
+            "full_table_p50_ms": _ms(before, 0.5), "full_table_p99_ms": _ms(before, 0.99),
+            "delta_page_p50_ms": _ms(after, 0.5), "delta_page_p99_ms": _ms(after, 0.99),
+            "mismatches": int(mismatches),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--lots", default="50000,100000")
+    ap.add_argument("--ops", type=int, default=200)
+    ap.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    use_durability(RELAXED)
+    use_metrics(False)
+    try:
+        res = {"cases": [run_one(int(n), args.ops, args.backend, args.seed) for n in args.lots.split(",")]}
+    finally:
+        use_durability(None)
+    res["consistent"] = all(c["mismatches"] == 0 for c in res["cases"])
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+時点在庫の問い合わせ：移動の台帳（月ごとの Parquet + 月末チェックポイント）と、ジャーナルの全履歴を読み直す方法。
+
+    python -m benchmarks.bench_ledger --movements 1000000
+    python -m benchmarks.bench_ledger --movements 3000000 --products 5000
+
+一時フォルダの CSV 保存先に、1年分（2026年）の移動の履歴（journal_archive の JSON Lines、月ごと）と、
+それを畳み込んだ在庫表を合成して
+1. 台帳の退避なし：年末・年央の在庫（全履歴の読み直し）
+2. archive-ledger（1回だけ）の時間と、Parquet / JSON Lines の大きさ
+3. 退避後：年末・年央・月の途中の在庫の時間と、読んだファイル
+を JSON で出力する。合成した移動から直接求めた在庫と1件でも違えば終了コード 1。
+"""
+import argparse, json, os, shutil, sys, tempfile, time
+import numpy as np
+import pandas as pd
+from factory_app.infra import inventory_repo
+from factory_app.infra.logging_conf import use_metrics
+
+YEAR = 2026
+DAYS = ["2026/06/30", "2026/12/31", "2026/09/17"]
+
+def synth(n: int, n_products: int, seed: int) -> pd.DataFrame:
+    """seq 順の1年分の移動（入庫 60% / 出庫 30% / 戻し 10%）"""
+    rng = np.random.default_rng(seed)
+    sec = np.sort(rng.integers(0, 365 * 86400, n))
+    ts = (pd.Timestamp(f"{YEAR}-01-01") + pd.to_timedelta(sec, unit="s")).strftime("%Y-%m-%d %H:%M:%S")
+    r = rng.random(n)
+    op = np.where(r < 0.6, "inbound", np.where(r < 0.9, "outbound", "return_in"))
+    code = np.char.add("P", np.char.zfill(rng.integers(0, n_products, n).astype(str), 5))
+    exp = np.array([f"{YEAR + 1}/{m:02d}/01" for m in range(1, 7)])[rng.integers(0, 6, n)]
+    qty = rng.integers(1, 20, n).astype(float)
+    return pd.DataFrame({"seq": np.arange(1, n + 1), "ts": ts, "op": op, "product_code": code,
+                         "exp_date": exp, "in_date": "2026/01/01", "qty": qty})
+
+def write_storage(root: str, moves: pd.DataFrame) -> int:
+    """移動を月ごとのジャーナル履歴として書き、畳み込んだ在庫表をスナップショットにする。戻り値: JSON Lines のバイト数"""
+    inventory_repo.use_storage(root, "csv")
+    inventory_repo.ensure_files()
+    os.makedirs(inventory_repo.JOURNAL_ARCHIVE_DIR, exist_ok=True)
+    size = 0
+    for month, part in moves.groupby(moves["ts"].str[:7], sort=True):
+        path = os.path.join(inventory_repo.JOURNAL_ARCHIVE_DIR,
+                            f"inventory_journal_{month.replace('-', '')}01000000_{int(part['seq'].max()):010d}.jsonl")
+        lines = []
+        for seq, ts, op, code, exp, ind, qty in part.itertuples(index=False, name=None):
+            rec = {"seq": seq, "ts": ts, "op": op, "product_code": code, "exp_date": exp,
+                   "in_date": "" if op == "outbound" else ind, "qty": qty}
+            if op == "outbound":
+                rec["alloc"] = [[ind, qty]]
+            lines.append(json.dumps(rec, ensure_ascii=False))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        size += os.path.getsize(path)
+    final = expected(moves, f"{YEAR}/12/31")
+    final.insert(2, "in_date", "2026/01/01")
+    final["updated_at"] = ""
+    final.to_csv(inventory_repo.INVENTORY_CSV, index=False, encoding=inventory_repo.ENC)
+    with open(inventory_repo.SNAPSHOT_META, "w", encoding="utf-8") as f:
+        json.dump({"seq": int(moves["seq"].max()), "sha1": None}, f)
+    return size
+
+def expected(moves: pd.DataFrame, day: str) -> pd.DataFrame:
+    """合成した移動から直接求めた day の終わりの在庫"""
+    part = moves[moves["ts"] <= day.replace("/", "-") + " 23:59:59"]
+    signed = part["qty"].where(part["op"] != "outbound", -part["qty"])
+    pos = signed.groupby([part["product_code"], part["exp_date"]]).sum()
+    pos = pos[pos.abs() > 1e-9].rename("qty").reset_index()
+    return pos.sort_values(["product_code", "exp_date"]).reset_index(drop=True)
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, round((time.perf_counter() - t0) * 1000, 1)
+
+def _same(got: pd.DataFrame, want: pd.DataFrame) -> bool:
+    return (len(got) == len(want) and (got["product_code"].to_numpy() == want["product_code"].to_numpy()).all()
+            and (got["exp_date"].to_numpy() == want["exp_date"].to_numpy()).all()
+            and np.allclose(got["qty"].to_numpy(float), want["qty"].to_numpy(float)))
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--movements", type=int, default=1000000)
+    ap.add_argument("--products", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    use_metrics(False)
+    root = tempfile.mkdtemp(prefix="bench_ledger_")
+    try:
+        moves = synth(args.movements, args.products, args.seed)
+        jsonl_bytes = write_storage(root, moves)
+        want = {d: expected(moves, d) for d in DAYS}
+        res = {"movements": args.movements, "products": args.products, "jsonl_mb": round(jsonl_bytes / 2**20, 1)}
+        mismatches = 0
+        res["no_archive_ms"] = {}
+        for d in DAYS[:2]:
+            got, ms = _timed(inventory_repo.stock_at, d)
+            res["no_archive_ms"][d] = ms
+            mismatches += not _same(got, want[d])
+        months, res["archive_ms"] = _timed(inventory_repo.archive_ledger, f"{YEAR + 1}-01")
+        res["archived_months"] = len(months)
+        res["parquet_mb"] = round(sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in
+                                      os.walk(inventory_repo.LEDGER_DIR) for f in fs) / 2**20, 1)
+        res["archived_ms"] = {}
+        res["files_read"] = {}
+        for d in DAYS:
+            ledger = inventory_repo.ledger()
+            got, ms = _timed(ledger.stock_at, inventory_repo.get_store(), d)
+            res["archived_ms"][d] = ms
+            res["files_read"][d] = ledger.last_reads
+            mismatches += not _same(got, want[d])
+        res["mismatches"] = int(mismatches)
+        res["consistent"] = mismatches == 0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
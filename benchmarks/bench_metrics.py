@@ -0,0 +1,68 @@
+"""
+計測（logging_conf.instrumented）の上乗せ時間。
+
+    python -m benchmarks.bench_metrics --calls 200000 --ops 300
+
+1. 何もしない関数を calls 回：素の関数 / 計測無効 / 計測有効（JSON ログは捨てる）の1回あたり ns
+2. 在庫の入庫（一時フォルダ）を ops 回：計測無効 / 有効の1回あたり ms
+を JSON で出力する。計測無効の上乗せが max-disabled-ns を超えれば終了コード 1。
+"""
+import argparse, json, os, shutil, sys, tempfile, time
+from factory_app.infra import inventory_repo
+from factory_app.infra.durability import RELAXED, use_durability
+from factory_app.infra.logging_conf import instrumented, use_metrics
+
+def _plain() -> int:
+    return 1
+
+_wrapped = instrumented("bench.noop")(_plain)
+
+def _ns_per_call(fn, n: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter_ns() - t0) / n)
+    return round(best, 1)
+
+def _inbound_ms(n: int) -> float:
+    t0 = time.perf_counter()
+    for k in range(n):
+        inventory_repo.inbound(f"P{k % 50:03d}", "2027/01/01", "2026/10/01", 1.0)
+    return round((time.perf_counter() - t0) * 1000 / n, 3)
+
+def run(calls: int, ops: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_metrics_")
+    try:
+        use_durability(RELAXED)
+        inventory_repo.use_storage(root, "csv")
+        res = {"calls": calls, "ops": ops}
+        use_metrics(False)
+        res["plain_ns"] = _ns_per_call(_plain, calls)
+        res["disabled_ns"] = _ns_per_call(_wrapped, calls)
+        disabled_ms = _inbound_ms(ops)
+        use_metrics(True, json_log=os.path.join(root, "metrics.jsonl"))
+        res["enabled_ns"] = _ns_per_call(_wrapped, calls)
+        enabled_ms = _inbound_ms(ops)
+        res["disabled_overhead_ns"] = round(res["disabled_ns"] - res["plain_ns"], 1)
+        res["inbound_ms"] = {"disabled": disabled_ms, "enabled": enabled_ms}
+        return res
+    finally:
+        use_metrics(False)
+        use_durability(None)
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--calls", type=int, default=200000)
+    ap.add_argument("--ops", type=int, default=300)
+    ap.add_argument("--max-disabled-ns", type=float, default=500.0)
+    args = ap.parse_args(argv)
+    res = run(args.calls, args.ops)
+    res["within_budget"] = bool(res["disabled_overhead_ns"] <= args.max_disabled_ns)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["within_budget"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+製品検索の索引（domain.product_index）の作成時間と、1文字入力ごとの検索時間。
+
+    python -m benchmarks.bench_product_search --products 5000,50000 --queries 300
+
+製品数ごとに合成の製品マスタ（カナ・漢字・全角／半角の混じった製品名）を作り、
+1. 索引の作成時間
+2. 製品名・コードの一部を1文字ずつ入力したときの検索時間（索引 / 全件を毎回正規化して比べる素朴な方法）
+3. 従来の画面（全製品コードを Combo に入れる）で渡していた候補数と、索引で出す候補数
+を JSON で出力する。索引の結果が素朴な方法の結果と1件でも違えば終了コード 1。
+"""
+import argparse, json, random, statistics, sys, time
+from factory_app.domain.product_index import ProductIndex, SEARCH_LIMIT, normalize
+
+WORDS = ["カルピス", "ｶﾙﾋﾟｽ", "ウーロン茶", "緑茶", "ほうじ茶", "麦茶", "ｺｰﾋｰ", "コーヒー", "ミルク", "ＭＩＬＫ",
+         "オレンジ", "りんご", "ﾚﾓﾝ", "スポーツ", "ドリンク", "無糖", "微糖", "ＰＥＴ", "缶", "紙パック"]
+SIZES = ["２５０ml", "350ML", "５００ｍｌ", "1L", "1.5L", "２Ｌ"]
+
+def make_master(n: int, seed: int):
+    rng = random.Random(seed)
+    codes = [f"{rng.choice('ABCDEFGH')}{i:06d}" for i in range(n)]
+    names = [" ".join(rng.sample(WORDS, rng.randint(1, 3))) + " " + rng.choice(SIZES) for _ in range(n)]
+    return codes, names
+
+def naive_search(codes, names, query: str, limit: int = SEARCH_LIMIT):
+    """索引なし：毎回すべてを正規化して同じ順位付けで並べる"""
+    q = normalize(query)
+    order = sorted(range(len(codes)), key=codes.__getitem__)
+    if not q:
+        return [(codes[i], names[i]) for i in order[:limit]]
+    ck = {i: normalize(codes[i]) for i in order}
+    nk = {i: normalize(names[i]) for i in order}
+    tiers = [sorted((i for i in order if ck[i].startswith(q)), key=lambda i: (ck[i], codes[i])),
+             sorted((i for i in order if nk[i].startswith(q)), key=lambda i: (nk[i], codes[i])),
+             [i for i in order if q in ck[i]], [i for i in order if q in nk[i]]]
+    out = []
+    for tier in tiers:
+        for i in tier:
+            if i not in out:
+                out.append(i)
+    return [(codes[i], names[i]) for i in out[:limit]]
+
+def keystrokes(codes, names, n: int, seed: int):
+    """製品名の単語・コードの一部を1文字ずつ打った入力の列"""
+    rng = random.Random(seed)
+    out = []
+    while len(out) < n:
+        i = rng.randrange(len(codes))
+        word = rng.choice([codes[i][:5], codes[i][3:], rng.choice(names[i].split()), "かるぴす", "ｺｰﾋ"])
+        out += [word[:k] for k in range(1, len(word) + 1)]
+    return out[:n]
+
+def _ms(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 4)
+
+def run_one(n: int, n_queries: int, seed: int) -> dict:
+    codes, names = make_master(n, seed)
+    t0 = time.perf_counter()
+    index = ProductIndex(codes, names)
+    build = time.perf_counter() - t0
+    queries = keystrokes(codes, names, n_queries, seed)
+    samples, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(index.search(q))
+        samples.append(time.perf_counter() - t0)
+    naive = []
+    mismatches = 0
+    for q, got in zip(queries[: max(20, n_queries // 10)], results):   # 素朴な方法は遅いので一部だけ
+        t0 = time.perf_counter()
+        want = naive_search(codes, names, q)
+        naive.append(time.perf_counter() - t0)
+        mismatches += got != want
+    return {
+        "products": n, "build_ms": round(build * 1000, 1),
+        "search_p50_ms": _ms(samples, 0.5), "search_p99_ms": _ms(samples, 0.99),
+        "naive_p50_ms": round(statistics.median(naive) * 1000, 2),
+        "combo_values_before": n, "combo_values_after": SEARCH_LIMIT,
+        "mismatches": mismatches,
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--products", default="5000,50000")
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    res = {"cases": [run_one(int(n), args.queries, args.seed) for n in args.products.split(",")]}
+    res["consistent"] = all(c["mismatches"] == 0 for c in res["cases"])
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+在庫表の型：文字列（object）の列のままと、型つき（inventory_schema：製品コード category・日付 datetime64）の比較。
+
+    python -m benchmarks.bench_schema --rows 1000000
+    python -m benchmarks.bench_schema --rows 1000000 --products 50000
+
+一時フォルダへ rows 行の inventory.csv を作り、
+1. 読み込み：read_inventory_csv の時間とメモリ（memory_usage(deep) と tracemalloc で測った実際の確保量）、
+   型つきは読んだ表を to_typed で変換する（stock_summary が保存先の表から作るのと同じ）
+2. 集計：製品別・製品 × 賞味期限の合計、賞味期限の範囲での絞り込み、(製品, 賞味期限, 入庫日) 順の並べ替え
+3. 一括取込の日付の正規化（_fmt_dates）：行ごとに判定する従来の方法と、異なる値だけ判定する方法
+の時間を JSON で出力する。型つきの結果を文字列へ戻したものが従来の結果と1件でも違えば終了コード 1。
+"""
+import argparse, gc, json, os, shutil, sys, tempfile, time, tracemalloc
+import numpy as np
+import pandas as pd
+from factory_app.infra import inventory_repo
+from factory_app.infra.inventory_schema import from_typed, to_typed
+from factory_app.infra.inventory_store import read_inventory_csv
+
+ENC = inventory_repo.ENC
+EXP_FROM, EXP_TO = "2026/12/01", "2027/02/28"
+
+def write_csv(path: str, n: int, n_products: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    exp = pd.Timestamp("2026-06-01") + pd.to_timedelta(rng.integers(0, 720, n), unit="D")
+    ind = pd.Timestamp("2025-06-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+    upd = pd.Timestamp("2026-10-01") + pd.to_timedelta(rng.integers(0, 86400 * 14, n), unit="s")
+    pd.DataFrame({"product_code": np.char.add("P", np.char.zfill(rng.integers(0, n_products, n).astype(str), 6)),
+                  "exp_date": exp.strftime("%Y/%m/%d"), "in_date": ind.strftime("%Y/%m/%d"),
+                  "qty": rng.integers(0, 40, n) / 4, "updated_at": upd.strftime("%Y-%m-%d %H:%M:%S")}
+                 ).to_csv(path, index=False, encoding=ENC)
+
+def _timed(fn, *args, repeat: int = 3):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        ms = (time.perf_counter() - t0) * 1000
+        best = ms if best is None else min(best, ms)
+    return out, round(best, 1)
+
+def _allocated_mb(fn, *args) -> float:
+    """fn の戻り値が保持しているメモリ（tracemalloc、共有される文字列は1回だけ数える）"""
+    gc.collect()
+    tracemalloc.start()
+    out = fn(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del out
+    return round(current / 2**20, 1)
+
+# --- 同じ処理の2通り（文字列の列 / 型つきの列）---
+def summary_str(df: pd.DataFrame, keys):
+    live = df[df["qty"] > 0]
+    return live.groupby(keys, sort=True)["qty"].sum().reset_index()
+
+def summary_typed(df: pd.DataFrame, keys):
+    live = df[df["qty"].to_numpy() > 0]
+    return from_typed(live.groupby(keys, sort=True, observed=True, dropna=False)["qty"].sum().reset_index())
+
+def filter_str(df: pd.DataFrame):
+    return df[(df["qty"] > 0) & (df["exp_date"] >= EXP_FROM) & (df["exp_date"] <= EXP_TO)].index
+
+def filter_typed(df: pd.DataFrame):
+    exp = df["exp_date"]
+    return df[(df["qty"].to_numpy() > 0) & (exp >= pd.Timestamp(EXP_FROM)) & (exp <= pd.Timestamp(EXP_TO))].index
+
+def sort_index(df: pd.DataFrame):
+    return df.sort_values(["product_code", "exp_date", "in_date"], kind="stable").index
+
+def read_typed(path: str) -> pd.DataFrame:
+    return to_typed(read_inventory_csv(path, ENC))
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1000000)
+    ap.add_argument("--products", type=int, default=20000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    root = tempfile.mkdtemp(prefix="bench_schema_")
+    try:
+        path = os.path.join(root, "inventory.csv")
+        write_csv(path, args.rows, args.products, args.seed)
+        res = {"rows": args.rows, "products": args.products, "csv_mb": round(os.path.getsize(path) / 2**20, 1)}
+        plain, res["load_str_ms"] = _timed(read_inventory_csv, path, ENC)
+        typed, res["load_typed_ms"] = _timed(read_typed, path)
+        _, res["to_typed_ms"] = _timed(to_typed, plain)
+        res["memory_deep_mb"] = {"str": round(plain.memory_usage(deep=True).sum() / 2**20, 1),
+                                 "typed": round(typed.memory_usage(deep=True).sum() / 2**20, 1)}
+        res["memory_allocated_mb"] = {"str": _allocated_mb(read_inventory_csv, path, ENC),
+                                      "typed": _allocated_mb(read_typed, path)}
+        mismatches = int(not from_typed(typed).equals(plain))
+        res["ops_ms"] = {}
+        for name, keys in (("by_product", ["product_code"]), ("by_exp", ["product_code", "exp_date"])):
+            a, ms_a = _timed(summary_str, plain, keys)
+            b, ms_b = _timed(summary_typed, typed, keys)
+            res["ops_ms"][name] = {"str": ms_a, "typed": ms_b}
+            mismatches += not a.equals(b)
+        for name, fn_a, fn_b in (("filter_exp_range", filter_str, filter_typed), ("sort", sort_index, sort_index)):
+            a, ms_a = _timed(fn_a, plain)
+            b, ms_b = _timed(fn_b, typed)
+            res["ops_ms"][name] = {"str": ms_a, "typed": ms_b}
+            mismatches += not a.equals(b)
+        # 一括取込：スキャナの移動ファイルの日付（書式の揺れを含む）
+        raw = plain["exp_date"].str.replace("/", "-", regex=False).where(plain.index % 3 != 0, plain["exp_date"])
+        a, ms_a = _timed(inventory_repo._fmt_unique_dates, raw.str.strip(), repeat=1)
+        b, ms_b = _timed(inventory_repo._fmt_dates, raw, repeat=1)
+        res["ops_ms"]["normalize_dates"] = {"per_row": ms_a, "unique_values": ms_b}
+        mismatches += not (a[0].equals(b[0]) and a[1].equals(b[1]))
+        res["mismatches"] = int(mismatches)
+        res["consistent"] = mismatches == 0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
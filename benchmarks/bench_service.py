@@ -0,0 +1,180 @@
+"""
+HTTP サービス（factory_app.service）の負荷試験。
+
+    python -m benchmarks.bench_service --clients 50 --requests 3000
+    python -m benchmarks.bench_service --url http://192.168.0.10:8765 --token <service_token> --clients 20 --requests 1000
+
+--url を省略すると一時フォルダの保存先でサービスを（使い捨てのトークンで）このプロセス内に起動し、
+まとめて反映する既定の設定（max_batch=MAX_BATCH）と、1件ずつ反映する設定（max_batch=1）の両方を計る。
+clients 本の接続（keep-alive）から合計 requests 件を送る。内訳は
+入庫 30% / 出庫 30% / 点検のチェック 20% / 点検の読込 20%。
+requests/sec と遅延のパーセンタイル（全体・要求の種類ごと）を JSON で出力する。
+自前で起動した場合は最後に在庫数量とチェックが送った内容と一致するか確認し、一致しなければ終了コード 1。
+"""
+import argparse, asyncio, json, random, secrets, shutil, sys, tempfile, time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+import numpy as np
+from factory_app.infra import inventory_repo, repo
+from factory_app.infra.settings import DEFAULT_MACHINES, DEFAULT_TYPE_NAMES, get_setting, inspection_items
+from factory_app.service import MAX_BATCH, TOKEN_SETTING, BackgroundService
+
+PRODUCTS = [f"P{i:03d}" for i in range(50)]
+EXP = "2027/01/01"
+SEED_QTY = 1_000_000.0
+YEAR, MONTH = 2026, 10
+
+async def _request(reader, writer, token: str, method: str, path: str, body=None):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+                 "Content-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        if k.strip().lower() == "content-length":
+            length = int(v)
+    payload = await reader.readexactly(length) if length else b""
+    return status, json.loads(payload) if payload else None
+
+def _plan(n: int, seed: int):
+    """送る要求の列と、その結果として期待する在庫・チェック"""
+    rng = random.Random(seed)
+    plan = []
+    stock = defaultdict(float)
+    checks = set()
+    for _ in range(n):
+        r = rng.random()
+        code = rng.choice(PRODUCTS)
+        t, mc = rng.choice(DEFAULT_TYPE_NAMES), rng.choice(DEFAULT_MACHINES)
+        key = {"type_name": t, "year": YEAR, "month": MONTH, "machine": mc}
+        if r < 0.3:
+            plan.append(("inbound", "POST", "/inventory/inbound",
+                         {"product_code": code, "exp_date": EXP, "in_date": "2026/10/01", "qty": 1}))
+            stock[code] += 1
+        elif r < 0.6:
+            plan.append(("outbound", "POST", "/inventory/outbound", {"product_code": code, "exp_date": EXP, "qty": 0.5}))
+            stock[code] -= 0.5
+        elif r < 0.8:
+            item = rng.choice(inspection_items(t, mc))
+            day = rng.randint(1, 31)
+            plan.append(("toggle", "POST", "/inspection/toggle", dict(key, item=item, day=day, checked=True)))
+            checks.add((t, mc, item, day))
+        else:
+            plan.append(("state", "GET", "/inspection/state?" + urlencode(key), None))
+    return plan, stock, checks
+
+async def _load(host: str, port: int, token: str, plan, clients: int):
+    lat = defaultdict(list)
+    errors = []
+    queue = list(reversed(plan))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while queue:
+                kind, method, path, body = queue.pop()
+                t0 = time.perf_counter()
+                status, res = await _request(reader, writer, token, method, path, body)
+                lat[kind].append(time.perf_counter() - t0)
+                if status != 200 or (isinstance(res, dict) and res.get("ok") is False):
+                    errors.append({"kind": kind, "status": status, "response": res})
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - t0, lat, errors
+
+def _pct(samples) -> dict:
+    ms = np.array(samples) * 1000
+    return {"n": len(samples), "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2), "max_ms": round(float(ms.max()), 2)}
+
+async def _health(host: str, port: int, token: str) -> dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return (await _request(reader, writer, token, "GET", "/health"))[1]
+    finally:
+        writer.close()
+
+def run_once(host: str, port: int, token: str, plan, clients: int) -> dict:
+    async def main():
+        before = await _health(host, port, token)
+        elapsed, lat, errors = await _load(host, port, token, plan, clients)
+        after = await _health(host, port, token)
+        return elapsed, lat, errors, before, after
+    elapsed, lat, errors, before, after = asyncio.run(main())
+    everything = [x for v in lat.values() for x in v]
+    batches = after["batches"] - before["batches"]
+    return {
+        "requests_per_sec": round(len(everything) / elapsed, 1),
+        "elapsed_sec": round(elapsed, 3),
+        "all": _pct(everything),
+        "by_kind": {k: _pct(v) for k, v in sorted(lat.items())},
+        "errors": len(errors), "error_samples": errors[:3],
+        "write_batches": batches,
+        "writes_per_batch": round((after["writes"] - before["writes"]) / batches, 1) if batches else None,
+    }
+
+def run_local(plan, stock, checks, clients: int, max_batch: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_service_")
+    try:
+        inventory_repo.use_storage(root)
+        repo.use_state_root(root)
+        inventory_repo.apply_movements(inventory_repo.pd.DataFrame(
+            [{"op": "inbound", "product_code": c, "exp_date": EXP, "in_date": "2026/09/01", "qty": SEED_QTY}
+             for c in PRODUCTS]))
+        token = secrets.token_urlsafe(16)
+        bg = BackgroundService(token, max_batch=max_batch)
+        try:
+            res = run_once("127.0.0.1", bg.port, token, plan, clients)
+        finally:
+            bg.close()
+        # 開き直して、送った内容どおりに保存されたか確かめる
+        inventory_repo.use_storage(root)
+        repo.use_state_root(root)
+        inv = inventory_repo.load_inventory().groupby("product_code")["qty"].sum()
+        stock_ok = all(abs(inv.get(c, 0.0) - SEED_QTY - stock[c]) < 1e-6 for c in PRODUCTS)
+        states = {}
+        missing = 0
+        for t, mc, item, day in checks:
+            key = (t, YEAR, MONTH, mc)
+            if key not in states:
+                states[key] = repo.load_monthly_state(*key) or {"items": {}}
+            row = states[key]["items"].get(item) or []
+            missing += not (day <= len(row) and row[day - 1])
+        res["consistent"] = bool(stock_ok and missing == 0)
+        return res
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--url", help="既に起動しているサービス（省略時はこのプロセス内で起動）")
+    ap.add_argument("--token", help='--url のサービスのトークン（省略時は settings.json の "service_token"）')
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=3000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    plan, stock, checks = _plan(args.requests, args.seed)
+    res = {"clients": args.clients, "requests": args.requests}
+    if args.url:
+        url = urlsplit(args.url)
+        token = args.token or str(get_setting(TOKEN_SETTING, "") or "")
+        res["remote"] = run_once(url.hostname, url.port or 80, token, plan, args.clients)
+        ok = True
+    else:
+        res["batched"] = run_local(plan, stock, checks, args.clients, MAX_BATCH)
+        res["unbatched"] = run_local(plan, stock, checks, args.clients, 1)
+        ok = res["batched"]["consistent"] and res["unbatched"]["consistent"]
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
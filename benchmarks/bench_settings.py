@@ -0,0 +1,72 @@
+"""
+設定の参照（Excel 保存先の取得）の比較。
+
+    python -m benchmarks.bench_settings --keys 500 --lookups 20000
+
+一時フォルダに保存先が keys 件登録された settings.json を作り、
+1. 旧方式：参照のたびに settings.json を開いて解析
+2. SettingsCache（変更確認は CHECK_INTERVAL ごと）
+3. SettingsCache（毎回 stat で変更確認）
+で lookups 回参照した時間を JSON で出力する。
+途中でファイルを書き換え、キャッシュ側が再起動なしで新しい値を返すことも確認する。結果が違えば終了コード 1。
+"""
+import argparse, json, os, shutil, sys, tempfile, time
+from factory_app.infra.settings import SettingsCache
+
+def legacy_load(path: str):
+    """変更前の repo.load_settings"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except Exception:
+            return {}
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, round(time.perf_counter() - t0, 4)
+
+def run(n_keys: int, n_lookups: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_settings_")
+    try:
+        path = os.path.join(root, "settings.json")
+        data = {f"始業前点検_{2000 + i // 12}_{i % 12 + 1}": f"\\\\share\\点検\\{i:05d}.xlsx" for i in range(n_keys)}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        keys = list(data)
+        lookup = [keys[i % len(keys)] for i in range(n_lookups)]
+
+        legacy, t_legacy = _timed(lambda: [legacy_load(path).get(k) for k in lookup])
+        cached = SettingsCache(path)
+        new, t_cached = _timed(lambda: [cached.get().get(k) for k in lookup])
+        stat_each = SettingsCache(path, check_interval=0)
+        _, t_stat = _timed(lambda: [stat_each.get().get(k) for k in lookup])
+
+        # 外部で書き換えた内容が反映されるか
+        data[keys[0]] = "changed.xlsx"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        cached.invalidate()
+        reloaded = cached.get().get(keys[0]) == "changed.xlsx" and stat_each.get().get(keys[0]) == "changed.xlsx"
+        return {
+            "keys": n_keys, "lookups": n_lookups,
+            "legacy_parse_each_sec": t_legacy, "cached_sec": t_cached, "cached_stat_each_sec": t_stat,
+            "hot_reload": bool(reloaded),
+            "results_match": bool(legacy == new and reloaded),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--keys", type=int, default=500)
+    ap.add_argument("--lookups", type=int, default=20000)
+    args = ap.parse_args(argv)
+    res = run(args.keys, args.lookups)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["results_match"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+拠点ごとに分けた在庫：拠点数・プロセス数を変えたときの入出庫と、全拠点をまたぐ集計（site_stock_summary / site_expiry_summary）。
+
+    python -m benchmarks.bench_sites --lots 100000 --sites 1,2,4,8 --processes 1,4
+    python -m benchmarks.bench_sites --lots 100000 --backend sqlite
+
+同じ数のロットを拠点数ごとに均等に分けて一時フォルダへ在庫を作り、
+1. 入出庫：1拠点の在庫を初めて読むまで（拠点の大きさに比例）と、読んだあとの1回あたり（拠点数に依らない）
+2. 全拠点の製品別在庫の合算・期限切れ/期限間近の件数：プロセス数ごと（1 は同じプロセスで順に）
+の時間を JSON で出力する。製品別在庫が合成したロットと移動から直接求めた値と、
+期限の件数が拠点の在庫表を順に全件読んで数えた値と1件でも違えば終了コード 1。
+"""
+import argparse, json, os, random, shutil, sys, tempfile, time
+import numpy as np
+import pandas as pd
+from factory_app.infra import inventory_repo
+from factory_app.infra.durability import RELAXED, use_durability
+from factory_app.infra.expiry_index import add_days
+from factory_app.infra.logging_conf import use_metrics
+from factory_app.usecase import inventory as uc
+
+TODAY = "2026/10/18"
+DAYS = 30
+
+def synth(n_lots: int) -> pd.DataFrame:
+    i = np.arange(n_lots)
+    return pd.DataFrame({"op": "inbound", "product_code": [f"P{k:05d}" for k in i // 8],
+                         "exp_date": [add_days("2026/09/01", int(d)) for d in (i * 37) % 720],
+                         "in_date": "2026/08/01", "qty": (1 + i % 3).astype(float)})
+
+def seed(root: str, lots: pd.DataFrame, n_sites: int, backend: str) -> list:
+    names = [f"site{k:02d}" for k in range(n_sites)]
+    inventory_repo.use_storage(root, backend)
+    for k, name in enumerate(names):
+        inventory_repo.use_site(name)
+        inventory_repo.apply_movements(lots.iloc[k::n_sites].reset_index(drop=True), table=False)
+    inventory_repo.use_storage(root, backend)
+    return names
+
+def scan_expiry(root: str, backend: str, names: list):
+    """集計を使わない方法：拠点の在庫表を順に全件読み、数量 > 0 のロットを期限で数える"""
+    expired = near = 0
+    for name in names:
+        inventory_repo.use_storage(root, backend, name)
+        exp = inventory_repo.load_inventory().query("qty > 0")["exp_date"]
+        expired += int((exp < TODAY).sum())
+        near += int(((exp >= TODAY) & (exp <= add_days(TODAY, DAYS))).sum())
+    inventory_repo.use_storage(root, backend)
+    return expired, near
+
+def _ms(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+def run_one(lots: pd.DataFrame, n_sites: int, processes: list, n_ops: int, backend: str, seed_no: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_sites_")
+    try:
+        names = seed(root, lots, n_sites, backend)
+        want_stock = lots.groupby("product_code", sort=True)["qty"].sum()
+        res = {"sites": n_sites, "lots_per_site": len(lots) // n_sites, "backend": backend}
+        # 入出庫：拠点の在庫を初めて読む1回と、その後の1回あたり
+        inventory_repo.use_storage(root, backend, names[0])
+        rng = random.Random(seed_no)
+        first, ops = None, []
+        for _ in range(n_ops):
+            row = lots.iloc[rng.randrange(len(lots) // n_sites) * n_sites]
+            t0 = time.perf_counter()
+            if rng.random() < 0.5:
+                inventory_repo.inbound(row["product_code"], row["exp_date"], "2026/10/01", 1.0, table=False)
+            else:
+                inventory_repo.return_in(row["product_code"], row["exp_date"], "2026/10/01", 1.0, table=False)
+            elapsed = time.perf_counter() - t0
+            if first is None:
+                first = elapsed
+            else:
+                ops.append(elapsed)
+            want_stock[row["product_code"]] += 1.0   # 上の移動の分
+        res["first_move_ms"] = round(first * 1000, 1)
+        res["move_p50_ms"], res["move_p99_ms"] = _ms(ops, 0.5), _ms(ops, 0.99)
+        t0 = time.perf_counter()
+        want_expired, want_near = scan_expiry(root, backend, names)
+        res["expiry_scan_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        mismatches = 0
+        res["stock_ms"], res["expiry_ms"] = {}, {}
+        for p in processes:
+            t0 = time.perf_counter()
+            stock = uc.site_stock_summary(sites=names, processes=p, combined=True)
+            res["stock_ms"][p] = round((time.perf_counter() - t0) * 1000, 1)
+            t0 = time.perf_counter()
+            summary = uc.site_expiry_summary(today=TODAY, days=DAYS, sites=names, processes=p)
+            res["expiry_ms"][p] = round((time.perf_counter() - t0) * 1000, 1)
+            got = stock.set_index("product_code")["qty"]
+            mismatches += not (got.index.equals(want_stock.index) and np.allclose(got.to_numpy(), want_stock.to_numpy()))
+            mismatches += int(summary["expired"].sum()) != want_expired or int(summary["near"].sum()) != want_near
+        res["mismatches"] = int(mismatches)
+        return res
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--lots", type=int, default=100000)
+    ap.add_argument("--sites", default="1,2,4,8")
+    ap.add_argument("--processes", default=f"1,{os.cpu_count() or 1}")
+    ap.add_argument("--ops", type=int, default=200)
+    ap.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    use_durability(RELAXED)
+    use_metrics(False)
+    lots = synth(args.lots)
+    processes = sorted({int(p) for p in args.processes.split(",")})
+    try:
+        res = {"lots": args.lots, "cpu_count": os.cpu_count(), "today": TODAY, "days": DAYS,
+               "cases": [run_one(lots, int(n), processes, args.ops, args.backend, args.seed)
+                         for n in args.sites.split(",")]}
+    finally:
+        use_durability(None)
+    res["consistent"] = all(c["mismatches"] == 0 for c in res["cases"])
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+画面の起動時間（画面を出すまでに必要な import と点検タブの組み立て）の計測と予算チェック。
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 500
+
+新しい Python プロセスで
+1. factory_app.ui.main_ui の import（GUI ツールキットを含む）
+2. 点検タブの組み立て（build_inspection_tab、点検状態は読まない）
+の時間を計り、その時点で pandas / numpy / openpyxl が読み込まれていないことを確認する。
+参考として、画面を出した後にバックグラウンドで行う当月の点検状態の読込（一時フォルダの保存先）と
+在庫タブの読込（pandas の import を含む）、
+pandas・openpyxl を起動時に読み込んだ場合の import 時間も出す。
+runs 回の中央値を JSON で出力し、予算超過または重いモジュールが起動時に読み込まれていれば終了コード 1。
+画面の無い環境でも動くよう、ウィンドウは作らない。
+"""
+import argparse, json, statistics, subprocess, sys
+
+HEAVY = ("pandas", "numpy", "openpyxl")
+
+_PROBE = r"""
+import json, shutil, sys, tempfile, time
+from datetime import datetime
+t0 = time.perf_counter()
+import factory_app.ui.main_ui
+from factory_app.infra import repo
+from factory_app.usecase import inspection as uc
+root = tempfile.mkdtemp(prefix="bench_startup_")
+repo.use_state_root(root)
+t1 = time.perf_counter()
+factory_app.ui.main_ui.build_inspection_tab()
+t2 = time.perf_counter()
+heavy = [m for m in %(heavy)r if m in sys.modules]
+now = datetime.now()
+uc.load_or_init_state(uc.type_names()[0], now.year, now.month, uc.machines()[0])
+t3 = time.perf_counter()
+from factory_app.infra import inventory_repo
+inventory_repo.use_storage(root)
+from factory_app.ui.inventory_ui import _load_first_page
+_load_first_page()
+t4 = time.perf_counter()
+shutil.rmtree(root, ignore_errors=True)
+print(json.dumps({"import": t1 - t0, "build_tab": t2 - t1, "first_state": t3 - t2, "inventory": t4 - t3,
+                  "heavy": heavy}))
+""" % {"heavy": HEAVY}
+
+_EAGER = r"""
+import json, time
+t0 = time.perf_counter()
+import factory_app.ui.main_ui, pandas, openpyxl
+print(json.dumps({"import": time.perf_counter() - t0}))
+"""
+
+def _probe(code: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _ms(values) -> float:
+    return round(statistics.median(values) * 1000, 1)
+
+def run(runs: int, budget_ms: float) -> dict:
+    probes = [_probe(_PROBE) for _ in range(runs)]
+    eager = [_probe(_EAGER) for _ in range(runs)]
+    startup = _ms([p["import"] + p["build_tab"] for p in probes])
+    heavy = sorted({m for p in probes for m in p["heavy"]})
+    return {
+        "runs": runs,
+        "import_ms": _ms([p["import"] for p in probes]),
+        "build_tab_ms": _ms([p["build_tab"] for p in probes]),
+        "startup_ms": startup,
+        "first_state_background_ms": _ms([p["first_state"] for p in probes]),
+        "inventory_background_ms": _ms([p["inventory"] for p in probes]),
+        "eager_import_ms": _ms([e["import"] for e in eager]),
+        "heavy_modules_at_startup": heavy,
+        "budget_ms": budget_ms,
+        "within_budget": bool(startup <= budget_ms and not heavy),
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=500.0)
+    args = ap.parse_args(argv)
+    res = run(args.runs, args.budget_ms)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["within_budget"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+MonthlyState の点検記録（文字列リスト → DayBits）の比較。
+
+    python -m benchmarks.bench_state --years 5 --items 30
+
+年数 × 12か月 × 全機械 × 全種別 の月次データ（JSON から読んだ dict）について、
+1. 旧方式：文字列リストのまま ensure_shapes（連結・スライス）して保持
+2. MonthlyState（DayBits）
+のメモリ使用量（tracemalloc）、読込（MonthlyState 化 + ensure_shapes）、実施数の集計、未実施日の列挙の時間を JSON で出力する。
+実施数・未実施日・to_dict（保存される JSON）が旧方式と一致しなければ終了コード 1。
+"""
+import argparse, calendar, gc, json, random, sys, time, tracemalloc
+from factory_app.domain.state import MonthlyState, CIRCLE
+from factory_app.infra.settings import DEFAULT_MACHINES as MACHINES, DEFAULT_TYPE_NAMES as TYPE_NAMES
+
+def make_dicts(n_years: int, n_items: int, seed: int):
+    rng = random.Random(seed)
+    items = [f"点検項目{i:02d}" for i in range(n_items)]
+    out = []
+    for year in range(2026 - n_years + 1, 2027):
+        for month in range(1, 13):
+            nd = calendar.monthrange(year, month)[1]
+            for type_name in TYPE_NAMES:
+                for machine in MACHINES:
+                    out.append({"year": year, "month": month, "machine": machine, "type_name": type_name,
+                                "items": {it: [CIRCLE if rng.random() < 0.8 else "" for _ in range(nd)] for it in items},
+                                "sign": [""] * nd})
+    return out, items
+
+def legacy_load(d, master):
+    """変更前の MonthlyState(**data) + ensure_shapes 相当（文字列リストのまま）"""
+    nd = calendar.monthrange(d["year"], d["month"])[1]
+    return {it: (d["items"].get(it, []) + [""] * nd)[:nd] for it in master}
+
+def _measure(build, make_src):
+    """(結果, 所要時間, 保持メモリ)。時間は tracemalloc を切った状態で別に計る。"""
+    src = make_src()
+    t0 = time.perf_counter()
+    build(src)
+    sec = time.perf_counter() - t0
+    src = make_src()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    obj = build(src)
+    del src   # 元の dict は数えない（保持している分だけ）
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return obj, sec, size
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, round(time.perf_counter() - t0, 4)
+
+def _build_states(src, master):
+    states = []
+    for d in src:
+        st = MonthlyState(**d)
+        st.ensure_shapes(master)
+        states.append(st)
+    return states
+
+def run(n_years: int, n_items: int, seed: int) -> dict:
+    raw, master = make_dicts(n_years, n_items, seed)
+    # JSON を読んだ直後と同じく、文字列は別々のオブジェクトにする
+    make_src = lambda: json.loads(json.dumps(raw, ensure_ascii=False))
+    legacy, t_legacy_load, m_legacy = _measure(lambda src: [legacy_load(d, master) for d in src], make_src)
+    states, t_new_load, m_new = _measure(lambda src: _build_states(src, master), make_src)
+
+    legacy_counts, t_legacy_count = _timed(
+        lambda: [{it: sum(v == CIRCLE for v in row) for it, row in m.items()} for m in legacy])
+    new_counts, t_new_count = _timed(lambda: [st.done_counts() for st in states])
+    legacy_missing, t_legacy_missing = _timed(
+        lambda: [[d + 1 for d, v in enumerate(row) if v != CIRCLE] for m in legacy for row in m.values()])
+    new_missing, t_new_missing = _timed(lambda: [row.unchecked_days() for st in states for row in st.items.values()])
+    same_json = all(st.to_dict()["items"] == m for st, m in zip(states, legacy))
+
+    return {
+        "states": len(states), "items": n_items,
+        "legacy_memory_kb": round(m_legacy / 1024), "daybits_memory_kb": round(m_new / 1024),
+        "legacy_load_sec": round(t_legacy_load, 4), "daybits_load_sec": round(t_new_load, 4),
+        "legacy_count_sec": t_legacy_count, "daybits_count_sec": t_new_count,
+        "legacy_unchecked_sec": t_legacy_missing, "daybits_unchecked_sec": t_new_missing,
+        "results_match": bool(legacy_counts == new_counts and legacy_missing == new_missing and same_json),
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--items", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    res = run(args.years, args.items, args.seed)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["results_match"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+複数端末（プロセス）から同じ保存先へ同時に入出庫するストレステスト。
+
+    python -m benchmarks.stress_inventory --workers 4 --ops 200 --backend csv
+    python -m benchmarks.stress_inventory --backend sqlite
+
+各プロセスは inventory_repo.use_storage(一時フォルダ) で同じ保存先を使い、
+ランダムな製品・期限に入庫と出庫を交互に行う。終了後、各 (製品, 期限) の在庫数量が
+「入庫合計 - 成功した出庫合計」と一致すること（更新の取りこぼし・二重引当が無いこと）を確認する。
+スループットと照合結果を JSON で出力し、一致しなければ終了コード 1。
+"""
+import argparse, json, random, shutil, sys, tempfile, time
+from collections import defaultdict
+from multiprocessing import Pool
+
+PRODUCTS = [f"P{i:03d}" for i in range(5)]
+EXPS = ["2026/12/01", "2027/01/01"]
+
+def worker(args):
+    root, backend, wid, n_ops, seed = args
+    from factory_app.infra import inventory_repo as repo
+    repo.use_storage(root, backend)
+    rng = random.Random(seed * 1000 + wid)
+    moved = defaultdict(float)
+    errors = 0
+    for k in range(n_ops):
+        code, exp = rng.choice(PRODUCTS), rng.choice(EXPS)
+        # 整数数量にして合計の照合を丸め誤差なしで行う
+        qty = float(rng.randint(1, 5))
+        if k % 2 == 0:
+            ok, msg, _ = repo.inbound(code, exp, f"2026/01/{wid + 1:02d}", qty)
+            sign = 1.0
+        else:
+            ok, msg, _ = repo.outbound(code, exp, qty)
+            sign = -1.0
+        if ok:
+            moved[(code, exp)] += sign * qty
+        elif not msg.startswith("在庫不足"):
+            errors += 1
+    repo.compact_inventory()
+    return dict(moved), errors
+
+def run(backend: str, workers: int, n_ops: int, seed: int) -> dict:
+    root = tempfile.mkdtemp(prefix="stress_inventory_")
+    try:
+        from factory_app.infra import inventory_repo as repo
+        repo.use_storage(root, backend)
+        repo.get_store()   # 保存先の初期化（sqlite の取り込みなど）を先に1回だけ行う
+        t0 = time.perf_counter()
+        with Pool(workers) as pool:
+            results = pool.map(worker, [(root, backend, w, n_ops, seed) for w in range(workers)])
+        elapsed = time.perf_counter() - t0
+
+        expected = defaultdict(float)
+        errors = 0
+        for moved, err in results:
+            errors += err
+            for k, v in moved.items():
+                expected[k] += v
+        repo.use_storage(root, backend)
+        inv = repo.load_inventory()
+        actual = inv.groupby(["product_code", "exp_date"])["qty"].sum().to_dict()
+        keys = set(expected) | set(actual)
+        mismatches = {f"{c} {e}": [expected.get((c, e), 0.0), actual.get((c, e), 0.0)]
+                      for c, e in sorted(keys) if expected.get((c, e), 0.0) != actual.get((c, e), 0.0)}
+        negative = int((inv["qty"] < 0).sum())
+        total_ops = workers * n_ops
+        return {
+            "backend": backend, "workers": workers, "ops_per_worker": n_ops, "seed": seed,
+            "elapsed_sec": round(elapsed, 3), "ops_per_sec": round(total_ops / elapsed, 1),
+            "errors": errors, "negative_rows": negative,
+            "consistent": not mismatches and negative == 0 and errors == 0,
+            "mismatches": mismatches,
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--ops", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    res = run(args.backend, args.workers, args.ops, args.seed)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0 if res["consistent"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+在庫・点検・Excel 出力の主要な処理のベンチマーク一式（基準値との比較つき）。
+
+    python -m benchmarks.suite                                   # 1k / 100k ロット
+    python -m benchmarks.suite --lots 1000,100000,1000000 --years 5
+    python -m benchmarks.suite --save-baseline                   # 結果を基準値として保存
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --tolerance 0.3
+    python -m benchmarks.suite --checks fifo,stress_csv,ledger     # 照合を一部だけ
+
+一時フォルダに合成データを作って計測する。
+- 在庫：ロット数ごとの inventory.csv（製品コードは売れ筋に偏らせ、賞味期限は月初・月中に寄せる）
+  → load_inventory（ファイルから読み直し）と inventory_repo.inbound / outbound / return_in
+- 点検：years 年分の月次 JSON（初回に保存先へ取り込む）
+  → load_or_init_state / save_state / MonthlyState.ensure_shapes / export_monthly_check_sheet
+書き込みの fsync はディスク次第でばらつくため、既定では耐久性 relaxed で計る（fsync の費用は bench_durability）。
+処理ごとに遅延のパーセンタイル（ms）とピークメモリ（tracemalloc、1回分）を JSON で出力する。
+基準値のファイルがあれば p50 を比べ、tolerance を超えて遅くなった処理を regressions に挙げて終了コード 1。
+続けて各ベンチマークの照合（FIFO の引当・複数プロセスの同時更新・台帳・一括取込など）を小さい件数で行い、
+一致しなかったものを failed_checks に挙げて終了コード 1（--checks none で省略）。
+振る舞いの検証そのものは tests/（python -m pytest）で行う。
+"""
+import argparse, calendar, contextlib, importlib, io, json, os, platform, random, shutil, sys, tempfile, time, tracemalloc
+import numpy as np
+import pandas as pd
+from factory_app.domain.state import MonthlyState, CIRCLE
+from factory_app.infra import inventory_repo, repo
+from factory_app.infra.durability import DURABILITY_MODES, RELAXED, use_durability
+from factory_app.infra.inventory_engine import INV_COLUMNS
+from factory_app.infra.settings import DEFAULT_MACHINES, DEFAULT_TYPE_NAMES, inspection_items
+from factory_app.usecase import inspection as uc
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# 基準値より速い・遅いの判定で、これ未満の差（ms）は誤差とみなす
+MIN_DELTA_MS = 1.0
+
+# --- 合成データ ---
+def make_inventory(n_lots: int, seed: int) -> pd.DataFrame:
+    """n_lots 行の在庫表。製品は順位の逆数に比例する頻度（少数の売れ筋に行が集まる）。"""
+    rng = np.random.default_rng(seed)
+    n_products = max(50, n_lots // 20)
+    weights = 1.0 / np.arange(1, n_products + 1) ** 1.1
+    size = n_lots * 2   # 売れ筋では同じロットが重なるので多めに作って重複を除く
+    codes = rng.choice(n_products, size=size, p=weights / weights.sum())
+    base = np.datetime64("2026-10-01")
+    # 賞味期限：1〜24か月先の 1日 / 15日（製造ロットの単位）
+    months = rng.integers(1, 25, size=size)
+    exp = (base.astype("datetime64[M]") + months).astype("datetime64[D]") + np.where(rng.random(size) < 0.5, 0, 14)
+    ind = base - rng.integers(0, 180, size=size)
+    fmt = lambda d: pd.Series(pd.to_datetime(d).strftime("%Y/%m/%d"))
+    df = pd.DataFrame({
+        "product_code": pd.Series(codes).map(lambda i: f"P{i:06d}"),
+        "exp_date": fmt(exp), "in_date": fmt(ind),
+        "qty": rng.choice([0.0, 1.0, 2.0, 5.0, 10.0, 12.5, 24.0, 100.0], size=size),
+        "updated_at": "2026/10/01 08:00:00",
+    })
+    df = df.drop_duplicates(["product_code", "exp_date", "in_date"]).head(n_lots)
+    return df.reset_index(drop=True).reindex(columns=INV_COLUMNS)
+
+def make_state_files(root: str, years: int, seed: int) -> int:
+    """従来形式の月次 JSON（種別_YYYY-MM_機械.json）を years 年分作る"""
+    rng = random.Random(seed)
+    n = 0
+    for year in range(2026 - years + 1, 2027):
+        for month in range(1, 13):
+            nd = calendar.monthrange(year, month)[1]
+            for type_name in DEFAULT_TYPE_NAMES:
+                for machine in DEFAULT_MACHINES:
+                    items = inspection_items(type_name, machine)
+                    data = {"year": year, "month": month, "machine": machine, "type_name": type_name,
+                            "items": {it: [CIRCLE if rng.random() < 0.8 else "" for _ in range(nd)] for it in items},
+                            "sign": [rng.choice(["", "山田", "佐藤"]) for _ in range(nd)]}
+                    path = repo.monthly_state_path(type_name, year, month, machine)
+                    with open(path, "w", encoding="utf-8-sig") as f:
+                        json.dump(data, f, ensure_ascii=False, indent=2)
+                    n += 1
+    return n
+
+# --- 計測 ---
+def _stats(samples, peak: int) -> dict:
+    ms = np.array(samples) * 1000
+    return {"n": len(samples), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3), "mean_ms": round(float(ms.mean()), 3),
+            "peak_kb": round(peak / 1024)}
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """fn を repeat 回計り、最後にもう1回 tracemalloc 下で実行してピークメモリを取る（計時には含めない）"""
+    samples = []
+    for i in range(repeat):
+        arg = setup(i) if setup else None
+        t0 = time.perf_counter()
+        fn(arg) if setup else fn()
+        samples.append(time.perf_counter() - t0)
+    arg = setup(repeat) if setup else None
+    tracemalloc.start()
+    fn(arg) if setup else fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _stats(samples, peak)
+
+def bench_inventory(root: str, n_lots: int, repeat: int, seed: int) -> dict:
+    folder = os.path.join(root, f"inventory_{n_lots}")
+    os.makedirs(folder)
+    df = make_inventory(n_lots, seed)
+    df.to_csv(os.path.join(folder, "inventory.csv"), index=False, encoding=inventory_repo.ENC)
+    pd.DataFrame({"product_code": df["product_code"].unique(), "product_name": ""}).to_csv(
+        os.path.join(folder, "product_master.csv"), index=False, encoding=inventory_repo.ENC)
+    inventory_repo.use_storage(folder, "csv")
+    rng = random.Random(seed)
+    lots = df[df["qty"] > 0][["product_code", "exp_date", "in_date"]].to_numpy().tolist()
+    out = {"lots": int(len(df))}
+
+    def cold_load():
+        inventory_repo.use_storage(folder, "csv")   # メモリ上の状態を捨ててファイルから読む
+        inventory_repo.load_inventory()
+    out["load_inventory"] = measure(cold_load, max(3, repeat // 10))
+
+    def check(res):
+        if not res[0]:
+            raise RuntimeError(res[1])
+    pick = lambda i: rng.choice(lots)
+    out["inbound"] = measure(lambda lot: check(inventory_repo.inbound(lot[0], lot[1], "2026/10/02", 1.0)), repeat, pick)
+    out["outbound"] = measure(lambda lot: check(inventory_repo.outbound(lot[0], lot[1], 0.5)), repeat, pick)
+    out["return_in"] = measure(lambda lot: check(inventory_repo.return_in(lot[0], lot[1], lot[2], 0.5)), repeat, pick)
+    inventory_repo.use_storage(folder, "csv")
+    return out
+
+def bench_inspection(root: str, years: int, repeat: int, seed: int) -> dict:
+    folder = os.path.join(root, "inspection")
+    os.makedirs(folder)
+    repo.use_state_root(folder)
+    n_files = make_state_files(folder, years, seed)
+    t0 = time.perf_counter()
+    repo.get_inspection_store()   # 従来の JSON の取り込み（初回のみ）
+    out = {"years": years, "states": n_files, "import_json_once_sec": round(time.perf_counter() - t0, 3)}
+    rng = random.Random(seed)
+    keys = [(t, y, m, mc) for y in range(2026 - years + 1, 2027) for m in range(1, 13)
+            for t in DEFAULT_TYPE_NAMES for mc in DEFAULT_MACHINES]
+    pick = lambda i: rng.choice(keys)
+
+    out["load_or_init_state"] = measure(lambda k: uc.load_or_init_state(*k), repeat, pick)
+
+    def save(st):
+        uc.toggle_item(st, next(iter(st.items)), 1)
+        uc.save_state(st)
+    out["save_state"] = measure(save, repeat, lambda i: uc.load_or_init_state(*pick(i)))
+
+    raw = [repo.load_monthly_state(*k) for k in keys[:repeat]]
+    masters = {t: inspection_items(t) for t in DEFAULT_TYPE_NAMES}
+    def shapes(d):
+        MonthlyState(**d).ensure_shapes(masters[d["type_name"]])
+    out["ensure_shapes"] = measure(shapes, repeat, lambda i: raw[i % len(raw)])
+
+    xlsx = os.path.join(root, "sheet.xlsx")
+    from factory_app.infra.excel_export import export_monthly_check_sheet
+    def export(st):
+        export_monthly_check_sheet(year=st.year, month=st.month, machine=st.machine, type_name=st.type_name,
+                                   items=list(st.items), matrix=st.items, signs=st.sign, save_path=xlsx)
+    out["export_monthly_check_sheet"] = measure(export, max(3, repeat // 5), lambda i: uc.load_or_init_state(*pick(i)))
+    return out
+
+def run(lot_sizes, years: int, repeat: int, seed: int, mode: str = RELAXED) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        use_durability(mode)
+        res = {"python": platform.python_version(), "machine": platform.machine(), "repeat": repeat,
+               "durability": mode, "cases": {}}
+        for n in lot_sizes:
+            # 大きい表は1回が重いので回数を減らす
+            r = max(5, min(repeat, int(repeat * 100000 / n))) if n > 100000 else repeat
+            res["cases"][f"inventory_{n}"] = bench_inventory(root, n, r, seed)
+        res["cases"]["inspection"] = bench_inspection(root, years, repeat, seed)
+        return res
+    finally:
+        use_durability(None)
+        shutil.rmtree(root, ignore_errors=True)
+
+# --- 照合 ---
+# 各ベンチマークの照合（合成データで従来の実装・直接求めた値と比べる）を小さい件数で実行する。
+# どれか1つでも一致しなければ suite も終了コード 1。(名前, モジュール, 引数)
+CHECKS = [
+    ("fifo", "bench_fifo", ["--lots", "3000", "--requests", "500"]),
+    ("stress_csv", "stress_inventory", ["--backend", "csv", "--workers", "2", "--ops", "40"]),
+    ("stress_sqlite", "stress_inventory", ["--backend", "sqlite", "--workers", "2", "--ops", "40"]),
+    ("durability", "bench_durability", ["--ops", "20", "--burst", "100"]),
+    ("ledger", "bench_ledger", ["--movements", "5000", "--products", "50"]),
+    ("inventory_view", "bench_inventory_view", ["--lots", "2000", "--ops", "30"]),
+    ("expiry", "bench_expiry", ["--lots", "2000", "--ops", "30"]),
+    ("sites", "bench_sites", ["--lots", "2000", "--sites", "1,3", "--processes", "1", "--ops", "20"]),
+    ("schema", "bench_schema", ["--rows", "5000", "--products", "100"]),
+    ("state", "bench_state", ["--years", "1", "--items", "10"]),
+    ("inspection_query", "bench_inspection_query", ["--years", "1", "--items", "10"]),
+    ("settings", "bench_settings", ["--keys", "50", "--lookups", "500"]),
+    ("product_search", "bench_product_search", ["--products", "500", "--queries", "30"]),
+    ("export", "bench_export", ["--items", "5", "--processes", "1"]),
+    ("import", "bench_import", ["--years", "1", "--processes", "1", "--durability", "relaxed"]),
+]
+
+def run_checks(names=None) -> dict:
+    """CHECKS を実行して {名前: 一致したか} を返す（各スクリプトの JSON 出力は捨てる）"""
+    out = {}
+    for name, module, argv in CHECKS:
+        if names and name not in names:
+            continue
+        mod = importlib.import_module(f"benchmarks.{module}")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                out[name] = mod.main(argv) == 0
+        except Exception as e:
+            print(f"check {name} failed: {e!r}", file=sys.stderr)
+            out[name] = False
+    return out
+
+# --- 基準値との比較 ---
+def compare(res: dict, base: dict, tolerance: float) -> list:
+    out = []
+    for group, cases in res["cases"].items():
+        for name, st in cases.items():
+            old = base.get("cases", {}).get(group, {}).get(name)
+            if not isinstance(st, dict) or not isinstance(old, dict):
+                continue
+            new_ms, old_ms = st["p50_ms"], old["p50_ms"]
+            if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms >= MIN_DELTA_MS:
+                out.append({"case": f"{group}.{name}", "baseline_p50_ms": old_ms, "p50_ms": new_ms,
+                            "ratio": round(new_ms / old_ms, 2) if old_ms else None})
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--lots", default="1000,100000", help="カンマ区切りのロット数（例: 1000,100000,1000000）")
+    ap.add_argument("--years", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--durability", choices=DURABILITY_MODES, default=RELAXED)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--tolerance", type=float, default=0.5, help="p50 がこの割合を超えて遅くなれば劣化とみなす")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--checks", default="all", help="照合を行うもの（カンマ区切り、all / none）")
+    args = ap.parse_args(argv)
+    res = run([int(s) for s in args.lots.split(",")], args.years, args.repeat, args.seed, args.durability)
+    if args.checks != "none":
+        res["checks"] = run_checks(None if args.checks == "all" else args.checks.split(","))
+    res["failed_checks"] = [name for name, good in res.get("checks", {}).items() if not good]
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        res["regressions"] = []
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            res["regressions"] = compare(res, json.load(f), args.tolerance)
+    else:
+        res["regressions"] = []
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 1 if res["regressions"] or res["failed_checks"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
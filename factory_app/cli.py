@@ -0,0 +1,293 @@
+"""
+GUI を使わないコマンドライン（夜間バッチ・画面の無いサーバー用）。
+
+    python -m factory_app export-sheets --year 2026 --months 1-3,12 --out D:/out
+    python -m factory_app import-sheets D:/archive/点検表 --processes 4
+    python -m factory_app apply-movements scan_0301.csv scan_0302.csv --report-dir D:/out
+    python -m factory_app stock --by exp --format csv
+    python -m factory_app stock --sites all --combined --processes 4
+    python -m factory_app --site tokyo apply-movements scan_0301.csv
+    python -m factory_app stock --at 2026-03-31 --by exp --format csv
+    python -m factory_app archive-ledger
+    python -m factory_app history --start 2026-03-01 --end 2026-03-31
+    python -m factory_app expiry-report --days 30 --out D:/reports
+    python -m factory_app expiry-report --sites tokyo,osaka --out D:/reports
+    python -m factory_app completion --start 2026-01-01 --end 2026-12-31 --by machine,item
+    python -m factory_app serve --port 8765
+    python -m factory_app gui
+    python -m factory_app --profile inventory.apply_movements apply-movements scan_0301.csv
+
+FreeSimpleGUI は gui サブコマンドのときだけ読み込む。
+結果は標準出力へ JSON（--format csv なら CSV）、ログは標準エラーへ出す。
+--site NAME を付けると拠点 NAME の在庫を使う（省略時は settings.json の "site"）。
+--profile OP を付けると、その処理の1回分の cProfile を保存する（settings.json の "metrics" も参照）。
+終了コード: 0 成功 / 1 一部の行・ファイルが失敗 / 2 引数の誤り / 3 実行時エラー（ロック待ちの時間切れなど）
+"""
+import argparse, json, os, sys
+from datetime import date
+from typing import Any, List, Optional
+import pandas as pd
+from .infra import settings
+from .infra.fifo import POLICIES, FIFO
+from .infra.locking import Timeout
+from .infra.logging_conf import get_logger, configure_metrics
+from .usecase import inspection as uc_insp
+from .usecase import inventory as uc_inv
+
+LOGGER = get_logger(__name__)
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+
+JSON = "json"
+CSV = "csv"
+
+def _months(text: str) -> List[int]:
+    """"1-3,12" → [1, 2, 3, 12]"""
+    out: List[int] = []
+    try:
+        for part in text.split(","):
+            lo, _, hi = part.strip().partition("-")
+            out += range(int(lo), int(hi or lo) + 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid months: {text}")
+    if not out or any(not 1 <= m <= 12 for m in out):
+        raise argparse.ArgumentTypeError(f"months must be within 1-12: {text}")
+    return sorted(set(out))
+
+def _names(text: str) -> List[str]:
+    return [s.strip() for s in text.split(",") if s.strip()]
+
+def _date(text: str) -> date:
+    try:
+        y, m, d = text.replace("/", "-").split("-")
+        return date(int(y), int(m), int(d))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date (YYYY-MM-DD): {text}")
+
+def _emit(data: Any, fmt: str) -> None:
+    if isinstance(data, pd.DataFrame):
+        if fmt == CSV:
+            sys.stdout.write(data.to_csv(index=False))
+        else:
+            sys.stdout.write(data.to_json(orient="records", force_ascii=False, indent=2) + "\n")
+    elif fmt == CSV:
+        sys.stdout.write(pd.DataFrame(data if isinstance(data, list) else [data]).to_csv(index=False))
+    else:
+        sys.stdout.write(json.dumps(data, ensure_ascii=False, indent=2) + "\n")
+
+def _check_names(parser: argparse.ArgumentParser, label: str, given: Optional[List[str]], known: List[str]) -> None:
+    unknown = [n for n in given or [] if n not in known]
+    if unknown:
+        parser.error(f"unknown {label}: {', '.join(unknown)} (configured: {', '.join(known)})")
+
+# --- サブコマンド ---
+def cmd_export_sheets(args) -> int:
+    _check_names(args.parser, "machine", args.machines, settings.machines())
+    _check_names(args.parser, "type", args.types, settings.type_names())
+    files = uc_insp.export_excel_batch(args.year, args.months, args.out, args.machines, args.types,
+                                       per=args.per, processes=args.processes)
+    _emit([{"file": f} for f in files] if args.format == CSV else {"files": files}, args.format)
+    return EXIT_OK
+
+def cmd_import_sheets(args) -> int:
+    res = uc_insp.import_excel_history(args.src, args.processes, args.batch, args.overwrite, args.strict)
+    if args.format == CSV:
+        rows = [dict(status="skipped", file=r["file"], sheet=r["sheet"], detail=r["reason"]) for r in res["skipped"]]
+        rows += [dict(status="mismatched", file=r["file"], sheet=r["sheet"],
+                      detail="missing: " + ", ".join(r["missing"]) + " / unknown: " + ", ".join(r["unknown"]))
+                 for r in res["mismatched"]]
+        _emit(pd.DataFrame(rows, columns=["status", "file", "sheet", "detail"]), CSV)
+    else:
+        _emit(res, JSON)
+    return EXIT_PARTIAL if res["skipped"] else EXIT_OK
+
+def cmd_apply_movements(args) -> int:
+    results = []
+    reports = []
+    for path in args.files:
+        ok, summary, report, _ = uc_inv.import_movements(path, args.policy, table=False)
+        failed = int((~report["ok"]).sum()) if "ok" in report else 0
+        res = {"file": path, "ok": bool(ok), "summary": summary, "rows": len(report), "failed": failed}
+        if args.report_dir and len(report):
+            os.makedirs(args.report_dir, exist_ok=True)
+            res["report"] = os.path.join(args.report_dir, os.path.splitext(os.path.basename(path))[0] + "_result.csv")
+            report.to_csv(res["report"], index=False, encoding="utf-8-sig")
+        results.append(res)
+        reports.append(report.assign(file=path))
+        (LOGGER.info if ok else LOGGER.warning)(f"{path}: {summary}")
+    if args.format == CSV:
+        _emit(pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(), CSV)
+    else:
+        _emit(results, JSON)
+    return EXIT_OK if all(r["ok"] for r in results) else EXIT_PARTIAL
+
+def _sites(text: str) -> List[str]:
+    """"all" → 既知の全拠点、それ以外はカンマ区切り"""
+    return uc_inv.sites() if text.strip() == "all" else _names(text)
+
+def cmd_stock(args) -> int:
+    if args.sites is not None:
+        if args.at:
+            args.parser.error("--at cannot be combined with --sites")
+        _check_names(args.parser, "site", args.sites, uc_inv.sites())
+        _emit(uc_inv.site_stock_summary(args.by, args.products, args.sites, args.processes, args.combined), args.format)
+    elif args.combined:
+        args.parser.error("--combined requires --sites")
+    elif args.at:
+        if args.by == uc_inv.BY_LOT:
+            args.parser.error("--at can be combined with --by product or exp only")
+        _emit(uc_inv.stock_at(args.at.strftime("%Y/%m/%d"), args.by, args.products), args.format)
+    else:
+        _emit(uc_inv.stock_summary(args.by, args.products), args.format)
+    return EXIT_OK
+
+def cmd_archive_ledger(args) -> int:
+    _emit({"archived_months": uc_inv.archive_ledger()}, args.format)
+    return EXIT_OK
+
+def cmd_history(args) -> int:
+    if args.start > args.end:
+        args.parser.error("--start must not be after --end")
+    _emit(uc_inv.movement_history(args.start.strftime("%Y/%m/%d"), args.end.strftime("%Y/%m/%d")), args.format)
+    return EXIT_OK
+
+def cmd_expiry_report(args) -> int:
+    day = args.date.strftime("%Y/%m/%d") if args.date else None
+    if args.sites is not None:
+        _check_names(args.parser, "site", args.sites, uc_inv.sites())
+        df = uc_inv.site_expiry_report(args.days, day, args.sites, args.processes)
+    else:
+        df = uc_inv.expiry_report(args.days, day)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        day = df.attrs["date"].replace("/", "")
+        path = os.path.join(args.out, f"expiry_{day}.csv")
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+        LOGGER.info(f"Expiry report: {path} ({len(df)} lots)")
+    _emit(df, args.format)
+    return EXIT_OK
+
+def cmd_completion(args) -> int:
+    if args.start > args.end:
+        args.parser.error("--start must not be after --end")
+    df = uc_insp.completion_counts(args.start, args.end, args.type, args.machines, tuple(args.by))
+    _emit(df, args.format)
+    return EXIT_OK
+
+def cmd_serve(args) -> int:
+    from .service import serve
+    serve(args.host, args.port)
+    return EXIT_OK
+
+def cmd_gui(args) -> int:
+    from .ui.main_ui import main_loop   # GUI の読み込みはここだけ
+    main_loop()
+    return EXIT_OK
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m factory_app", description=__doc__.strip().splitlines()[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter,
+                                 epilog="\n".join(__doc__.strip().splitlines()[1:]))
+    ap.add_argument("--site", metavar="NAME", help="使う拠点の在庫（省略時は settings.json の \"site\"）")
+    ap.add_argument("--profile", metavar="OP", help="cProfile を保存する処理名（例: inventory.apply_movements）")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def add(name: str, func, help: str) -> argparse.ArgumentParser:
+        p = sub.add_parser(name, help=help, description=help)
+        p.set_defaults(func=func, parser=p)
+        return p
+
+    def add_format(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--format", choices=[JSON, CSV], default=JSON)
+
+    p = add("export-sheets", cmd_export_sheets, "点検表を Excel へ一括出力する")
+    p.add_argument("--year", type=int, required=True)
+    p.add_argument("--months", type=_months, required=True, help="例: 3 / 1-3 / 1-3,12")
+    p.add_argument("--machines", type=_names, help="カンマ区切り（省略時は全機械）")
+    p.add_argument("--types", type=_names, help="カンマ区切り（省略時は全種別）")
+    p.add_argument("--out", required=True, help="出力先フォルダ")
+    p.add_argument("--per", choices=[uc_insp.PER_SHEET, uc_insp.PER_MONTH, uc_insp.PER_YEAR], default=uc_insp.PER_MONTH)
+    p.add_argument("--processes", type=int)
+    add_format(p)
+
+    p = add("import-sheets", cmd_import_sheets, "過去の点検表（export-sheets と同じレイアウトの .xlsx）を取り込む")
+    p.add_argument("src", nargs="+", help="フォルダ（サブフォルダを含む）または .xlsx ファイル")
+    p.add_argument("--processes", type=int)
+    p.add_argument("--batch", type=int, default=uc_insp.IMPORT_BATCH, help="まとめて保存する月数")
+    p.add_argument("--overwrite", action="store_true", help="保存済みの月も上書きする")
+    p.add_argument("--strict", action="store_true", help="点検項目がマスタと違うシートは取り込まない")
+    add_format(p)
+
+    p = add("apply-movements", cmd_apply_movements, "スキャナの移動ファイル（CSV）を順に在庫へ反映する")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--policy", choices=list(POLICIES), default=FIFO)
+    p.add_argument("--report-dir", help="行ごとの結果 CSV の出力先")
+    add_format(p)
+
+    p = add("stock", cmd_stock, "在庫数量の集計を出力する")
+    p.add_argument("--by", choices=[uc_inv.BY_PRODUCT, uc_inv.BY_EXP, uc_inv.BY_LOT], default=uc_inv.BY_PRODUCT)
+    p.add_argument("--products", type=_names, help="カンマ区切りの製品コード")
+    p.add_argument("--at", type=_date, help="この日の終わり時点の在庫（移動の台帳から求める。--by product / exp のみ）")
+    p.add_argument("--sites", type=_sites, help="拠点ごとに集計する（カンマ区切り、all で全拠点）。先頭に site 列")
+    p.add_argument("--combined", action="store_true", help="--sites の拠点を合算する")
+    p.add_argument("--processes", type=int, help="拠点を並列に集計するプロセス数（省略時は CPU 数）")
+    add_format(p)
+
+    p = add("archive-ledger", cmd_archive_ledger, "締めた月（今月より前）の移動を台帳（月ごとの Parquet）へ退避する")
+    add_format(p)
+
+    p = add("history", cmd_history, "期間内の在庫移動（出庫の引当の内訳を含む）を出力する")
+    p.add_argument("--start", type=_date, required=True)
+    p.add_argument("--end", type=_date, required=True)
+    add_format(p)
+
+    p = add("expiry-report", cmd_expiry_report, "期限切れ・期限間近の在庫ロットを出力する（日次の報告用）")
+    p.add_argument("--days", type=int, help="期限間近とみなす日数（省略時は settings.json の expiry_alert_days、既定 30）")
+    p.add_argument("--date", type=_date, help="基準日 YYYY-MM-DD（省略時は今日）")
+    p.add_argument("--out", help="expiry_YYYYMMDD.csv の出力先フォルダ")
+    p.add_argument("--sites", type=_sites, help="拠点をまたいで出力する（カンマ区切り、all で全拠点）。先頭に site 列")
+    p.add_argument("--processes", type=int, help="拠点を並列に集計するプロセス数（省略時は CPU 数）")
+    add_format(p)
+
+    p = add("completion", cmd_completion, "期間内の点検実施率を出力する")
+    p.add_argument("--start", type=_date, required=True)
+    p.add_argument("--end", type=_date, required=True)
+    p.add_argument("--type")
+    p.add_argument("--machines", type=_names)
+    p.add_argument("--by", type=_names, default=["type_name", "machine", "item"],
+                   help="集計単位（type_name,machine,item,ymd,year,month から選ぶ）")
+    add_format(p)
+
+    p = add("serve", cmd_serve, "スキャナ・タブレット向けの HTTP/JSON サービスを起動する")
+    p.add_argument("--host", default="127.0.0.1",
+                   help='他の端末から使う場合はこの PC の LAN 側のアドレス（要求には settings.json の "service_token" が必要）')
+    p.add_argument("--port", type=int, default=8765)
+
+    add("gui", cmd_gui, "画面を起動する（python -m factory_app.main と同じ）")
+    return ap
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(encoding="utf-8")   # パイプ先の文字コードに依らず UTF-8 で出す
+    metrics = settings.get_setting("metrics", None)
+    metrics = dict(metrics) if isinstance(metrics, dict) else {}
+    if args.profile:
+        metrics.update(profile_op=args.profile, profile_slow_ms=0)
+    configure_metrics(metrics)
+    try:
+        if args.site is not None:
+            uc_inv.use_site(args.site)
+        return args.func(args)
+    except Timeout:
+        LOGGER.error("他の端末が更新中のため処理できませんでした。")
+        return EXIT_ERROR
+    except ValueError as e:
+        LOGGER.error(str(e))
+        return EXIT_USAGE
+    except Exception as e:
+        LOGGER.exception(e)
+        return EXIT_ERROR
@@ -1 +1 @@
-__all__ = ['state']
+__all__ = ['state','product_index']
@@ -0,0 +1,88 @@
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Tuple
+
+# 画面の候補に出す件数
+SEARCH_LIMIT = 30
+
+# 連結した検索対象の区切り（normalize 後の文字列には現れない）
+_SEP = "\n"
+_KATA_TO_HIRA = {c: c - 0x60 for c in range(ord("ァ"), ord("ヶ") + 1)}
+
+def normalize(text: str) -> str:
+    """
+    検索用の正規化。全角英数・半角カナは NFKC でそろえ、カタカナはひらがなへ、英字は小文字へ、空白は除く。
+    例: "ｶﾙﾋﾟｽ　５００ML" → "かるぴす500ml"
+    """
+    s = unicodedata.normalize("NFKC", str(text or "")).casefold().translate(_KATA_TO_HIRA)
+    return "".join(s.split())
+
+class _Keys:
+    """正規化したキーの並べ替え済み配列（前方一致）と、連結文字列（部分一致）"""
+    __slots__ = ("sorted_keys", "sorted_ids", "hay", "starts")
+
+    def __init__(self, keys: List[str]) -> None:
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.sorted_keys = [keys[i] for i in order]
+        self.sorted_ids = order
+        self.hay = _SEP.join(keys)
+        self.starts = []
+        pos = 0
+        for k in keys:
+            self.starts.append(pos)
+            pos += len(k) + 1
+
+    def prefix(self, q: str) -> Iterable[int]:
+        """q で始まるキーの番号（キーの順）"""
+        i = bisect_left(self.sorted_keys, q)
+        keys = self.sorted_keys
+        while i < len(keys) and keys[i].startswith(q):
+            yield self.sorted_ids[i]
+            i += 1
+
+    def substring(self, q: str) -> Iterable[int]:
+        """q を含むキーの番号（番号の順）"""
+        pos = self.hay.find(q)
+        while pos >= 0:
+            i = bisect_right(self.starts, pos) - 1
+            yield i
+            if i + 1 >= len(self.starts):
+                return
+            pos = self.hay.find(q, self.starts[i + 1])
+
+class ProductIndex:
+    """
+    製品マスタ（製品コード・製品名）の検索索引。作るのは1回、検索は1文字入力するごとに呼ぶ想定。
+    候補の順: コードの前方一致 → 製品名の前方一致 → コードの部分一致 → 製品名の部分一致（同じ段ではコード順）。
+    上位 limit 件が埋まった時点で打ち切るので、入力が短くても全件は走査しない。
+    """
+
+    def __init__(self, codes: Iterable[str], names: Iterable[str]) -> None:
+        rows = {}
+        for code, name in zip(codes, names):
+            code = "" if code is None else str(code).strip()
+            if code:
+                rows[code] = "" if name is None or name != name else str(name)   # NaN は空
+        self.codes = sorted(rows)
+        self.names = [rows[c] for c in self.codes]
+        self._code = _Keys([normalize(c) for c in self.codes])
+        self._name = _Keys([normalize(n) for n in self.names])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Tuple[str, str]]:
+        """[(製品コード, 製品名), ...]。空の入力ならコード順の先頭 limit 件。"""
+        q = normalize(query)
+        if not q:
+            return list(zip(self.codes[:limit], self.names[:limit]))
+        out: List[int] = []
+        seen = set()
+        for hits in (self._code.prefix(q), self._name.prefix(q), self._code.substring(q), self._name.substring(q)):
+            for i in hits:
+                if i not in seen:
+                    seen.add(i)
+                    out.append(i)
+                    if len(out) >= limit:
+                        return [(self.codes[i], self.names[i]) for i in out]
+        return [(self.codes[i], self.names[i]) for i in out]
@@ -1,19 +1,120 @@
 
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
 
 CIRCLE = "○"
 
+class DayBits:
+    """
+    1項目分の日ごとの記録。○ の日をビット（1日 = bit0）で持つ。
+    list[str]（"○" / ""）と同じように添字・反復・比較ができるので、従来の行として扱える。
+    ○ 以外の文字列は未実施（""）として扱う。
+    """
+    __slots__ = ("bits", "days")
+
+    def __init__(self, bits: int = 0, days: int = 0) -> None:
+        self.bits = bits & ((1 << days) - 1)
+        self.days = days
+
+    @classmethod
+    def of(cls, row: Union["DayBits", Sequence[str]]) -> "DayBits":
+        """list[str] / DayBits から作る（DayBits はそのまま返す）"""
+        if isinstance(row, DayBits):
+            return row
+        return cls(sum(1 << d for d, v in enumerate(row) if v == CIRCLE), len(row))
+
+    def _index(self, i: int) -> int:
+        if i < 0:
+            i += self.days
+        if not 0 <= i < self.days:
+            raise IndexError("day index out of range")
+        return i
+
+    def __len__(self) -> int:
+        return self.days
+
+    def __getitem__(self, i: int) -> str:
+        return CIRCLE if self.bits >> self._index(i) & 1 else ""
+
+    def __setitem__(self, i: int, value: str) -> None:
+        i = self._index(i)
+        if value == CIRCLE:
+            self.bits |= 1 << i
+        else:
+            self.bits &= ~(1 << i)
+
+    def __iter__(self) -> Iterator[str]:
+        bits = self.bits
+        for d in range(self.days):
+            yield CIRCLE if bits >> d & 1 else ""
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, DayBits):
+            return (self.bits, self.days) == (other.bits, other.days)
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    __hash__ = None  # 変更可能なので辞書キーにはしない
+
+    def __repr__(self) -> str:
+        return f"DayBits({''.join('1' if v else '0' for v in self.to_list())})"
+
+    def __reduce__(self):
+        return (DayBits, (self.bits, self.days))
+
+    def to_list(self) -> List[str]:
+        return list(self)
+
+    def checked(self, day: int) -> bool:
+        """day は1始まり"""
+        return bool(self.bits >> self._index(day - 1) & 1)
+
+    def toggle(self, day: int) -> None:
+        self.bits ^= 1 << self._index(day - 1)
+
+    def count(self) -> int:
+        """○ の日数"""
+        return self.bits.bit_count()
+
+    def unchecked_days(self) -> List[int]:
+        """未実施の日（1始まり）"""
+        missing = ~self.bits & ((1 << self.days) - 1)
+        out = []
+        while missing:
+            low = missing & -missing   # 一番下の立っているビット
+            out.append(low.bit_length())
+            missing ^= low
+        return out
+
+    def resized(self, days: int) -> "DayBits":
+        """日数を合わせた写し（はみ出した日は捨て、足りない日は未実施）"""
+        return DayBits(self.bits, days)
+
 @dataclass
 class MonthlyState:
     year: int
     month: int
     machine: str
     type_name: str  # 点検種別（例：始業前点検／保全点検）
-    # 点検項目ごとに日毎の記録（"○" or ""）
-    items: Dict[str, List[str]] = field(default_factory=dict)
+    # 点検項目ごとに日毎の記録（"○" or ""）。内部では DayBits、JSON では従来どおり文字列のリスト。
+    items: Dict[str, DayBits] = field(default_factory=dict)
     # サイン／担当者名（各日）
     sign: List[str] = field(default_factory=list)
+    # 保存時の競合検出用（読み込んだ時点の版と内容）。JSON には含めない。
+    etag: Optional[str] = field(default=None, repr=False, compare=False)
+    base: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.items = {k: DayBits.of(v) for k, v in self.items.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """保存用の dict（従来の JSON と同じ形）"""
+        return {
+            "year": self.year, "month": self.month, "machine": self.machine, "type_name": self.type_name,
+            "items": {k: DayBits.of(v).to_list() for k, v in self.items.items()},
+            "sign": list(self.sign),
+        }
 
     @property
     def num_days(self) -> int:
@@ -26,9 +127,31 @@ class MonthlyState:
         # items: master_items に合わせて並び替え・不足分を追加
         normalized = {}
         for it in master_items:
-            row = self.items.get(it, [])
-            row = (row + [""] * nd)[:nd]
-            normalized[it] = row
+            row = self.items.get(it)
+            row = DayBits.of(row) if row is not None else DayBits(0, nd)
+            normalized[it] = row if row.days == nd else row.resized(nd)
         self.items = normalized
         # sign
         self.sign = (self.sign + [""] * nd)[:nd]
+
+    def done_counts(self) -> Dict[str, int]:
+        """項目ごとの ○ の日数"""
+        return {it: row.count() for it, row in self.items.items()}
+
+def merge_states(ours: MonthlyState, base: Dict[str, Any], theirs: MonthlyState) -> None:
+    """
+    3方向マージ：読み込み後に自分が変えたセル（base と違うもの）は自分の値、それ以外は相手の値を採る。
+    ours を書き換える。theirs は ensure_shapes 済みであること。
+    """
+    base_items = base.get("items", {})
+    for it, row in ours.items.items():
+        b = DayBits.of(base_items.get(it, []))
+        t = theirs.items.get(it)
+        t = t if t is not None else DayBits(0, len(row))
+        # base にある日のうち自分が変えた日だけ自分の値、残りは相手の値
+        changed = (row.bits ^ b.bits) & ((1 << min(len(b), len(row))) - 1)
+        row.bits = (row.bits & changed) | (t.bits & ~changed & ((1 << len(row)) - 1))
+    b_sign = base.get("sign", [])
+    for i in range(len(ours.sign)):
+        if i >= len(b_sign) or ours.sign[i] == b_sign[i]:
+            ours.sign[i] = theirs.sign[i]
@@ -1 +1 @@
-__all__ = ['repo','excel_export','logging_conf']
+__all__ = ['repo','excel_export','logging_conf','inventory_repo','inventory_engine','inventory_journal','inventory_store','inventory_sqlite','fifo','locking','inspection_store','settings','durability']
@@ -0,0 +1,142 @@
+
+import atexit, os, threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from .logging_conf import get_logger
+
+LOGGER = get_logger(__name__)
+
+# 書き込みの耐久性（config/settings.json の "durability"）
+STRICT = "strict"     # 1回の保存ごとに fsync してから戻る（電源断でも保存済みの移動は消えない）
+BATCH = "batch"       # 追記は即座に OS へ渡し、fsync は GROUP_COMMIT_WINDOW ごとにまとめて1回
+RELAXED = "relaxed"   # fsync は OS 任せ（スナップショットの差し替え時だけ行う）
+DURABILITY_MODES = (STRICT, BATCH, RELAXED)
+
+# BATCH で fsync をまとめる時間幅（秒）。電源断で失い得るのはこの間の追記だけ。
+GROUP_COMMIT_WINDOW = 0.2
+
+_MODE: Optional[str] = None
+
+def use_durability(mode: Optional[str]) -> None:
+    """耐久性のモードを指定する（None なら settings.json に従う）。検証やベンチマーク用。"""
+    global _MODE
+    if mode is not None and mode not in DURABILITY_MODES:
+        raise ValueError(f"Unknown durability: {mode}")
+    _MODE = mode
+
+def durability() -> str:
+    from .settings import get_setting   # settings の保存もこのモジュールを使うため、ここで読む
+    mode = _MODE or str(get_setting("durability", STRICT)).lower()
+    return mode if mode in DURABILITY_MODES else STRICT
+
+# SQLite の保存先は synchronous で同じ考え方に合わせる（接続時に適用）
+_SQLITE_SYNC = {STRICT: "FULL", BATCH: "NORMAL", RELAXED: "OFF"}
+
+def apply_sqlite_durability(conn) -> None:
+    conn.execute(f"PRAGMA synchronous={_SQLITE_SYNC[durability()]}")
+
+def fsync_dir(path: str) -> None:
+    """ディレクトリの更新（rename）を確定させる。Windows などディレクトリを開けない環境では何もしない。"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_path(path: str, durable: bool = True):
+    """
+    path を一時ファイル経由で差し替える。ブロックには同じフォルダの一時ファイル名を渡すので、そこへ書き込む。
+    正常終了時だけ fsync → os.replace（→ フォルダを fsync）し、例外時は一時ファイルを消す。
+    途中で電源が落ちても path は元の内容か新しい内容のどちらかになる。
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        yield tmp
+        if durable:
+            with open(tmp, "rb+") as f:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    if durable:
+        fsync_dir(folder)
+
+def atomic_write_bytes(path: str, data: bytes, durable: bool = True) -> None:
+    with atomic_path(path, durable) as tmp:
+        with open(tmp, "wb") as f:
+            f.write(data)
+
+def atomic_write_text(path: str, text: str, encoding: str = "utf-8", durable: bool = True) -> None:
+    atomic_write_bytes(path, text.encode(encoding), durable)
+
+class GroupCommit:
+    """
+    追記済みファイルの fsync を window 秒ごとにまとめて行う（グループコミット）。
+    mark したファイルは最初の mark から window 秒後にバックグラウンドで1回だけ fsync される。
+    """
+
+    def __init__(self, window: float = GROUP_COMMIT_WINDOW) -> None:
+        self.window = window
+        self.flushes = 0   # 実際に fsync した回数（確認用）
+        self._dirty: Dict[str, None] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def mark(self, path: str) -> None:
+        with self._lock:
+            self._dirty[path] = None
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self, path: Optional[str] = None) -> None:
+        """未確定の fsync を今すぐ行う（path を渡すとそのファイルだけ）"""
+        with self._lock:
+            if path is None:
+                paths = list(self._dirty)
+                self._dirty.clear()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            elif path in self._dirty:
+                del self._dirty[path]
+                paths = [path]
+            else:
+                return
+            self.flushes += len(paths)
+        # fsync 中も他のスレッドの追記（mark）は止めない
+        for p in paths:
+            _fsync_path(p)
+
+def _fsync_path(path: str) -> None:
+    try:
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        LOGGER.warning(f"fsync failed {path}: {e}")
+
+GROUP = GroupCommit()
+atexit.register(GROUP.flush)
+
+def commit_append(path: str, f) -> None:
+    """追記したファイル f（flush 済み）をモードに応じて確定させる"""
+    mode = durability()
+    if mode == STRICT:
+        os.fsync(f.fileno())
+    elif mode == BATCH:
+        GROUP.mark(path)
@@ -1,63 +1,118 @@
 
-from typing import List, Dict
+import os
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Alignment, Font
-from .logging_conf import get_logger
-from ..domain.state import CIRCLE
+from openpyxl.utils import get_column_letter
+from .durability import atomic_path
+from .logging_conf import get_logger, add_io
+from ..domain.state import DayBits
 
 LOGGER = get_logger(__name__)
 
+# シート名に使えない文字と長さ上限（Excel の制約）
+_BAD_TITLE_CHARS = '[]:*?/\\'
+MAX_TITLE = 31
+
 def export_monthly_check_sheet(
     *, year: int, month: int, machine: str, type_name: str,
     items: List[str], matrix: Dict[str, List[str]], signs: List[str], save_path: str
 ) -> str:
     """
     items: 行ラベル
-    matrix: {item: ["", "○", ...]}
+    matrix: {item: ["", "○", ...]}（DayBits も可）
     signs: 各日のサイン（長さ = 月日数）
     """
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"{type_name}"[:31]
+    sheet = dict(year=year, month=month, machine=machine, type_name=type_name, items=items, matrix=matrix, signs=signs)
+    return export_check_sheets([sheet], save_path, titles=[f"{type_name}"[:MAX_TITLE]])
+
+def export_check_sheets(sheets: List[Dict[str, Any]], save_path: str, titles: Optional[List[str]] = None) -> str:
+    """
+    複数の点検表（export_monthly_check_sheet と同じキーの dict）を1つのブックへ書き出す。
+    write_only モードで1行ずつ流し込むので、シート数が多くてもメモリはほぼ増えない。
+    titles を省略した場合のシート名は「機械_種別_MM月」（重複時は連番）。
+    """
+    wb = Workbook(write_only=True)
+    used: set = set()
+    for i, sh in enumerate(sheets):
+        title = titles[i] if titles else _unique_title(f"{sh['machine']}_{sh['type_name']}_{sh['month']:02d}月", used)
+        _write_sheet(wb.create_sheet(title), **sh)
+    with atomic_path(save_path) as tmp:
+        wb.save(tmp)
+        add_io(written=os.path.getsize(tmp))
+    LOGGER.info(f"Excel exported ({len(sheets)} sheets) -> {save_path}")
+    return save_path
+
+def export_check_books(books: List[Tuple[str, List[Dict[str, Any]]]], processes: Optional[int] = None) -> List[str]:
+    """
+    (保存先, シートの list) ごとに別ファイルへ書き出す。ファイル同士は独立なのでプロセスプールで並列に作る。
+    processes=1 またはファイルが1つなら同じプロセスで順に書く。戻り値は books と同じ順の保存先。
+    """
+    if not books:
+        return []
+    workers = min(len(books), processes or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_render_book(b) for b in books]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_book, books))
+
+def _render_book(book: Tuple[str, List[Dict[str, Any]]]) -> str:
+    # プロセスプールから呼ぶためモジュール直下に置く
+    save_path, sheets = book
+    return export_check_sheets(sheets, save_path)
+
+def _unique_title(title: str, used: set) -> str:
+    title = "".join("_" if ch in _BAD_TITLE_CHARS else ch for ch in title)[:MAX_TITLE]
+    base, n = title, 2
+    while title in used:
+        suffix = f"({n})"
+        title = base[:MAX_TITLE - len(suffix)] + suffix
+        n += 1
+    used.add(title)
+    return title
+
+def _write_sheet(ws, *, year: int, month: int, machine: str, type_name: str,
+                 items: List[str], matrix: Dict[str, List[str]], signs: List[str]) -> None:
+    # 幅調整（write_only では行を書く前に設定する）
+    ws.column_dimensions["A"].width = 22
+    for i in range(2, 2+len(signs)):
+        ws.column_dimensions[get_column_letter(i)].width = 4
 
     # ヘッダ
-    ws.cell(1, 1, f"{type_name}（{year}年{month}月） 機械: {machine}")
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=2+len(signs))
-    ws.cell(1,1).font = Font(bold=True)
-    ws.cell(1,1).alignment = Alignment(horizontal="left")
+    title = WriteOnlyCell(ws, f"{type_name}（{year}年{month}月） 機械: {machine}")
+    title.font = Font(bold=True)
+    title.alignment = Alignment(horizontal="left")
+    ws.append([title])
+    ws.merged_cells.add(f"A1:{get_column_letter(2+len(signs))}1")
 
     # 2行目: 日付ヘッダ
-    ws.cell(2, 1, "点検項目")
-    for d in range(len(signs)):
-        ws.cell(2, 2+d, f"{d+1}")
-        ws.cell(2, 2+d).alignment = Alignment(horizontal="center")
+    day = _style(ws, alignment=Alignment(horizontal="center"))
+    ws.append(["点検項目"] + [_cell(ws, f"{d+1}", day) for d in range(len(signs))])
 
     # 本体
-    yellow = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
     center = Alignment(horizontal="center", vertical="center")
-
-    r = 3
+    done = _style(ws, alignment=center)
+    # 未実施は黄色
+    todo = _style(ws, alignment=center, fill=PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid"))
     for it in items:
-        ws.cell(r, 1, it)
-        row = matrix.get(it, [])
-        for d, val in enumerate(row, start=0):
-            c = ws.cell(r, 2+d, val)
-            c.alignment = center
-            if val != CIRCLE:
-                c.fill = yellow  # 未実施は黄色
-        r += 1
+        values = matrix.get(it, [])
+        unchecked = ~DayBits.of(values).bits
+        ws.append([it] + [_cell(ws, val, todo if unchecked >> d & 1 else done) for d, val in enumerate(values)])
 
     # サイン行
-    ws.cell(r, 1, "サイン")
-    for d, s in enumerate(signs, start=0):
-        c = ws.cell(r, 2+d, s)
-        c.alignment = center
+    ws.append(["サイン"] + [_cell(ws, s, done) for s in signs])
 
-    # 幅調整
-    ws.column_dimensions["A"].width = 22
-    for i in range(2, 2+len(signs)):
-        ws.column_dimensions[chr(64+i)].width = 4
+def _style(ws, **styles) -> WriteOnlyCell:
+    """書式の見本セル。書式の登録（ハッシュ計算）は見本で1回だけ行い、各セルには _cell で写す。"""
+    c = WriteOnlyCell(ws)
+    for k, v in styles.items():
+        setattr(c, k, v)
+    return c
 
-    wb.save(save_path)
-    LOGGER.info(f"Excel exported -> {save_path}")
-    return save_path
+def _cell(ws, value, proto: WriteOnlyCell) -> WriteOnlyCell:
+    c = WriteOnlyCell(ws, value)
+    c._style = copy(proto._style)
+    return c
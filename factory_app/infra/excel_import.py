@@ -0,0 +1,99 @@
+import os, re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
+from .logging_conf import get_logger, add_io
+
+LOGGER = get_logger(__name__)
+
+# export_monthly_check_sheet の1行目：「種別（YYYY年M月） 機械: 機械名」
+_TITLE = re.compile(r"^\s*(?P<type>.+?)（(?P<year>\d{4})年(?P<month>\d{1,2})月）\s*機械[:：]\s*(?P<machine>.+?)\s*$")
+HEADER_LABEL = "点検項目"
+SIGN_LABEL = "サイン"
+
+def read_check_sheet(rows: Iterator[tuple]) -> Dict[str, Any]:
+    """
+    export_monthly_check_sheet と同じレイアウトのシート（タイトル行・日付ヘッダ行・項目行・サイン行）を読む。
+    戻り値: export_check_sheets と同じキー（year, month, machine, type_name, items, matrix, signs）の dict。
+    レイアウトが違えば ValueError。
+    """
+    first = next(rows, None)
+    m = _TITLE.match(_text(first[0]) if first else "")
+    if m is None:
+        raise ValueError("title row not found")
+    header = next(rows, None)
+    if header is None or _text(header[0]) != HEADER_LABEL:
+        raise ValueError("day header row not found")
+    days = [_text(v) for v in header[1:]]
+    while days and not days[-1]:
+        days.pop()
+    if days != [str(d) for d in range(1, len(days) + 1)]:
+        raise ValueError("day header is not 1..N")
+    nd = len(days)
+    items: List[str] = []
+    matrix: Dict[str, List[str]] = {}
+    for row in rows:
+        label = _text(row[0]) if row else ""
+        if label == SIGN_LABEL:
+            signs = [_text(v) for v in row[1:nd + 1]]
+            return dict(year=int(m["year"]), month=int(m["month"]), machine=m["machine"], type_name=m["type"],
+                        items=items, matrix=matrix, signs=signs + [""] * (nd - len(signs)))
+        if not label:
+            continue
+        if label in matrix:
+            raise ValueError(f"duplicate item row: {label}")
+        values = [_text(v) for v in row[1:nd + 1]]
+        items.append(label)
+        matrix[label] = values + [""] * (nd - len(values))
+    raise ValueError("sign row not found")
+
+def read_check_book(path: str) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]]:
+    """
+    ブックの全シートを読み取り専用（1行ずつ流し読み）で読む。
+    戻り値: ([(シート名, read_check_sheet の dict), ...], [(シート名, 読めなかった理由), ...])
+    """
+    add_io(read=os.path.getsize(path))
+    wb = load_workbook(path, read_only=True, data_only=True)
+    sheets, errors = [], []
+    try:
+        for ws in wb.worksheets:
+            try:
+                sheets.append((ws.title, read_check_sheet(ws.iter_rows(values_only=True))))
+            except ValueError as e:
+                errors.append((ws.title, str(e)))
+    finally:
+        wb.close()
+    return sheets, errors
+
+def iter_check_books(paths: List[str], processes: Optional[int] = None
+                     ) -> Iterator[Tuple[str, List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]]]:
+    """
+    ファイルごとに read_check_book した結果を paths の順に返す（読めないファイルはシート名 "" の理由1件）。
+    ファイル同士は独立なのでプロセスプールで並列に読み、受け取った順に流すので全件をメモリに溜めない。
+    processes=1 またはファイルが1つなら同じプロセスで順に読む。
+    """
+    if not paths:
+        return
+    workers = min(len(paths), processes or os.cpu_count() or 1)
+    if workers <= 1:
+        for p in paths:
+            yield _read_book(p)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 小さなファイルが数千あるので、数十件ずつまとめて渡してプロセス間の往復を減らす
+        yield from pool.map(_read_book, paths, chunksize=max(1, min(64, len(paths) // (workers * 4))))
+
+def _read_book(path: str) -> Tuple[str, List[Tuple[str, Dict[str, Any]]], List[Tuple[str, str]]]:
+    # プロセスプールから呼ぶためモジュール直下に置く
+    try:
+        sheets, errors = read_check_book(path)
+    except Exception as e:   # 壊れたファイル・Excel 以外のファイル
+        return path, [], [("", f"unreadable workbook: {e}")]
+    return path, sheets, errors
+
+def _text(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))   # 日付ヘッダを数値に直したブック
+    return str(v).strip()
@@ -0,0 +1,75 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from .inventory_engine import C_CODE, C_EXP, C_IN, C_QTY
+
+DATE_FMT = "%Y/%m/%d"
+
+# 期限の範囲の上限に使う（同じ賞味期限のキーはすべてこれより小さい）
+_MAX = "\uffff"
+
+def add_days(day: str, days: int) -> str:
+    """YYYY/MM/DD の days 日後（負なら前）"""
+    return (datetime.strptime(day, DATE_FMT) + timedelta(days=days)).strftime(DATE_FMT)
+
+class ExpiryIndex:
+    """
+    数量 > 0 のロットだけを賞味期限順に持つ索引。
+    保存先の changes()（移動で変わった行）を受け取るたびに該当ロットだけを抜き差しするので、
+    「N 日以内に期限が来るロット」「期限切れの在庫」は bisect で範囲を切り出すだけで答えられる。
+    """
+
+    def __init__(self) -> None:
+        self._source: Any = None
+        self._token: Any = None
+        self._keys: List[tuple] = []          # (exp_date, product_code, in_date, rid) の昇順
+        self._key_of: Dict[int, tuple] = {}   # rid → キー
+        self._qty: Dict[int, float] = {}      # rid → 数量
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def sync(self, store: Any) -> int:
+        """保存先の変更を取り込む。戻り値: 取り込んだ変更行数（全件読み直しなら -1）"""
+        token = self._token if store is self._source else None
+        self._token, full, changes = store.changes(token)
+        self._source = store
+        if full:
+            self._keys, self._key_of, self._qty = [], {}, {}
+            for rid, row in changes:
+                if row is not None and _live(row):
+                    self._key_of[rid] = (row[C_EXP], row[C_CODE], row[C_IN], rid)
+                    self._qty[rid] = float(row[C_QTY])
+            self._keys = sorted(self._key_of.values())
+            return -1
+        for rid, row in changes:
+            old = self._key_of.pop(rid, None)
+            if old is not None:
+                del self._keys[bisect_left(self._keys, old)]
+                del self._qty[rid]
+            if row is not None and _live(row):
+                self._key_of[rid] = key = (row[C_EXP], row[C_CODE], row[C_IN], rid)
+                self._qty[rid] = float(row[C_QTY])
+                insort(self._keys, key)
+        return len(changes)
+
+    def between(self, first: str, last: str) -> List[Tuple[str, str, str, float]]:
+        """賞味期限が first 以上 last 以下のロット [(product_code, exp_date, in_date, qty), ...]（期限順）"""
+        lo = bisect_left(self._keys, (first,))
+        hi = bisect_right(self._keys, (last, _MAX))
+        return [(code, exp, ind, self._qty[rid]) for exp, code, ind, rid in self._keys[lo:hi]]
+
+    def before(self, day: str) -> List[Tuple[str, str, str, float]]:
+        """賞味期限が day より前のロット（期限切れ）"""
+        hi = bisect_left(self._keys, (day,))
+        return [(code, exp, ind, self._qty[rid]) for exp, code, ind, rid in self._keys[:hi]]
+
+    def count_between(self, first: str, last: str) -> int:
+        return bisect_right(self._keys, (last, _MAX)) - bisect_left(self._keys, (first,))
+
+    def count_before(self, day: str) -> int:
+        return bisect_left(self._keys, (day,))
+
+def _live(row: list) -> bool:
+    # 賞味期限の無い行（取込の誤り等）は期限の判定ができないので持たない
+    return bool(row[C_EXP]) and float(row[C_QTY]) > 0
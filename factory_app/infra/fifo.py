@@ -0,0 +1,97 @@
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 引当方針
+FIFO = "fifo"   # 指定した (product, exp) の中で入庫日の古い順
+FEFO = "fefo"   # product 内で賞味期限の早い順（同一期限内は入庫日順）
+POLICIES = (FIFO, FEFO)
+
+def allocate(lot_group: np.ndarray, lot_qty: np.ndarray, req_group: np.ndarray, req_qty: np.ndarray
+             ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    複数の出庫要求を cumsum でまとめて引き当てる。
+    lot_group: 各ロットのグループ番号（昇順に並び、グループ内は引当順に並べておくこと）
+    lot_qty:   各ロットの現在数量（0以下のロットは引当対象外）
+    req_group / req_qty: 出庫要求（要求順）。同じグループへの要求は順番に処理する。
+
+    1件ずつのループ（remain -= have）と浮動小数点演算まで同じ結果になるよう、
+    グループ × ロットの行列に [要求数量, -have, -have, ...] を並べて行方向に累積和を取る。
+    在庫合計は従来の pandas の合計（NumPy の sum）と同じ方法で求める。
+    戻り値: (ok, available, new_qty, alloc_req, alloc_lot, alloc_take)
+    """
+    import numpy as np   # 方針の定数だけを使う画面側では numpy を読み込まない
+    lot_group = np.asarray(lot_group, dtype=np.int64)
+    qty = np.asarray(lot_qty, dtype=float).copy()
+    req_group = np.asarray(req_group, dtype=np.int64)
+    req_qty = np.asarray(req_qty, dtype=float)
+    n_req = len(req_group)
+    ok = np.zeros(n_req, dtype=bool)
+    available = np.zeros(n_req, dtype=float)
+    a_req, a_lot, a_take = [], [], []
+    if n_req == 0:
+        return ok, available, qty, _i(), _i(), np.zeros(0)
+
+    # 同一グループへの要求は何番目か（= ラウンド番号）。1ラウンドでは各グループ最大1件。
+    order = np.lexsort((np.arange(n_req), req_group))
+    sg = req_group[order]
+    starts = np.r_[0, np.flatnonzero(sg[1:] != sg[:-1]) + 1]
+    rank = np.empty(n_req, dtype=np.int64)
+    rank[order] = np.arange(n_req) - np.repeat(starts, np.diff(np.r_[starts, n_req]))
+
+    for rnd in range(int(rank.max()) + 1):
+        reqs = np.flatnonzero(rank == rnd)
+        groups = req_group[reqs]
+        sel = np.flatnonzero(np.isin(lot_group, groups) & (qty > 0))
+        n_rows = len(groups)
+        if len(sel):
+            g_order = np.argsort(groups)
+            rows = g_order[np.searchsorted(groups[g_order], lot_group[sel])]
+            first = np.r_[0, np.flatnonzero(rows[1:] != rows[:-1]) + 1]
+            pos = np.arange(len(sel)) - np.repeat(first, np.diff(np.r_[first, len(sel)]))
+            width = int(pos.max()) + 2
+        else:
+            rows = pos = _i()
+            width = 1
+        have = qty[sel]
+
+        # 在庫合計：従来の sub["qty"].sum() と端数まで同じになるよう、グループごとに NumPy の sum で求める
+        # （ロットが8件を超えると NumPy は順に足さずにまとめて加算するので、累積和とは最後の桁が変わり得る）
+        total = np.zeros(n_rows)
+        if len(sel):
+            bounds = np.r_[first, len(sel)].tolist()
+            for r, s, e in zip(rows[first].tolist(), bounds[:-1], bounds[1:]):
+                total[r] = have[s:e].sum()
+        # 各ロット直前の残り要求数量（要求数量から順に減算）
+        rem = np.zeros((n_rows, width))
+        rem[:, 0] = req_qty[reqs]
+        rem[rows, pos + 1] = -have
+        remain = np.cumsum(rem, axis=1)
+
+        good = ~(total < req_qty[reqs])
+        ok[reqs] = good
+        available[reqs] = total
+        before = remain[rows, pos]
+        active = good[rows] & (before > 0)
+        partial = have >= before
+        take = np.where(active, np.where(partial, before, have), 0.0)
+        qty[sel] = np.where(active, np.where(partial, have - before, 0.0), have)
+
+        hit = np.flatnonzero(active)
+        a_req.append(reqs[rows[hit]])
+        a_lot.append(sel[hit])
+        a_take.append(take[hit])
+
+    alloc_req = np.concatenate(a_req)
+    alloc_lot = np.concatenate(a_lot)
+    alloc_take = np.concatenate(a_take)
+    # 要求順 → 引当順に並べ替え
+    o = np.lexsort((alloc_lot, alloc_req))
+    return ok, available, qty, alloc_req[o], alloc_lot[o], alloc_take[o]
+
+def _i() -> np.ndarray:
+    import numpy as np
+    return np.zeros(0, dtype=np.int64)
@@ -0,0 +1,274 @@
+
+import glob, hashlib, json, os, re, sqlite3, threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+from .durability import apply_sqlite_durability
+from .locking import LOCK_TIMEOUT, storage_lock, ConflictError
+from .logging_conf import get_logger, add_io
+from ..domain.state import DayBits
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+LOGGER = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS states (
+    type_name TEXT NOT NULL,
+    year      INTEGER NOT NULL,
+    month     INTEGER NOT NULL,
+    machine   TEXT NOT NULL,
+    data      TEXT NOT NULL,   -- 従来の月次 JSON と同じ内容
+    etag      TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    PRIMARY KEY (type_name, year, month, machine)
+);
+-- 集計用：月 × 項目 = 1行。bits は ○ の日のビット（1日 = bit0）、days はその月の記録日数
+CREATE TABLE IF NOT EXISTS item_days (
+    type_name TEXT NOT NULL,
+    machine   TEXT NOT NULL,
+    year      INTEGER NOT NULL,
+    month     INTEGER NOT NULL,
+    item      TEXT NOT NULL,
+    bits      INTEGER NOT NULL,
+    days      INTEGER NOT NULL,
+    PRIMARY KEY (type_name, machine, year, month, item)
+);
+CREATE INDEX IF NOT EXISTS ix_item_days_ym ON item_days(year, month);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# completion_counts の集計単位に使える列
+GROUP_COLUMNS = ("type_name", "machine", "item", "ymd", "year", "month")
+
+# 従来の1ファイル1か月の JSON（monthly_state_path の形式）
+_JSON_NAME = re.compile(r"^(?P<type>.+)_(?P<year>\d{4})-(?P<month>\d{2})_(?P<machine>.+)\.json$")
+
+def state_etag(data: Dict[str, Any]) -> str:
+    """内容から決まる版（保存時と同じ直列化の sha1）"""
+    return hashlib.sha1(_dump(data)).hexdigest()
+
+def _dump(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+class InspectionStore:
+    """
+    月次点検状態の保存先（SQLite 1ファイル）。
+    states に月次 JSON をそのまま持ち、集計用に 月 × 項目 ごとの実施日ビット列を item_days に持つ（年月で索引）。
+    書き込みは保存先のプロセス間ロック + BEGIN IMMEDIATE で直列化し、etag で楽観的に競合を検出する。
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT, isolation_level=None, check_same_thread=False)
+        # 共有フォルダ上では WAL が使えないため従来のロールバックジャーナルを使う
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        apply_sqlite_durability(self.conn)
+        self.conn.executescript(SCHEMA)
+        self._lock = storage_lock(db_path)
+        self._tlock = threading.RLock()   # 接続は GUI スレッドとワーカーで共有する
+
+    def location(self, type_name: str, year: int, month: int, machine: str) -> str:
+        return f"{self.db_path} [{type_name} {year}-{month:02d} {machine}]"
+
+    # --- 1か月分 ---
+    def load(self, type_name: str, year: int, month: int, machine: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """(内容, etag)。無ければ (None, None)"""
+        with self._tlock:
+            row = self.conn.execute(
+                "SELECT data, etag FROM states WHERE type_name=? AND year=? AND month=? AND machine=?",
+                (type_name, year, month, machine)).fetchone()
+        if row is None:
+            return None, None
+        add_io(read=len(row[0].encode("utf-8")))
+        return json.loads(row[0]), row[1]
+
+    def save(self, type_name: str, year: int, month: int, machine: str, data: Dict[str, Any],
+             expected_etag: Optional[str] = None, missing_etag: Optional[str] = None) -> str:
+        """
+        保存して新しい etag を返す。expected_etag が現在の版（未作成なら missing_etag）と違えば ConflictError。
+        expected_etag=None なら確認せず上書きする。
+        """
+        etag = state_etag(data)
+        with self._write() as cur:
+            if expected_etag is not None:
+                row = cur.execute(
+                    "SELECT data, etag FROM states WHERE type_name=? AND year=? AND month=? AND machine=?",
+                    (type_name, year, month, machine)).fetchone()
+                current = row[1] if row else missing_etag
+                if current != expected_etag:
+                    raise ConflictError(self.location(type_name, year, month, machine),
+                                        json.loads(row[0]) if row else None, current)
+            self._put(cur, type_name, year, month, machine, data, etag)
+        return etag
+
+    def save_many(self, states: Sequence[Tuple[Tuple[str, int, int, str], Dict[str, Any]]],
+                  overwrite: bool = True) -> List[Tuple[str, int, int, str]]:
+        """
+        [((type_name, year, month, machine), 内容), ...] を1トランザクションで保存する（一括取込用、etag は確認しない）。
+        overwrite=False なら既に保存先にある月は書かない。戻り値: 書かなかった月のキー
+        """
+        kept = []
+        with self._write() as cur:
+            for key, data in states:
+                if not overwrite and cur.execute(
+                        "SELECT 1 FROM states WHERE type_name=? AND year=? AND month=? AND machine=?", key).fetchone():
+                    kept.append(key)
+                    continue
+                self._put(cur, *key, data, state_etag(data))
+        return kept
+
+    def _put(self, cur, type_name, year, month, machine, data, etag) -> None:
+        blob = _dump(data)
+        cur.execute("INSERT OR REPLACE INTO states(type_name, year, month, machine, data, etag) VALUES (?,?,?,?,?,?)",
+                    (type_name, year, month, machine, blob.decode("utf-8"), etag))
+        add_io(written=len(blob))
+        cur.execute("DELETE FROM item_days WHERE type_name=? AND machine=? AND year=? AND month=?",
+                    (type_name, machine, year, month))
+        cur.executemany("INSERT INTO item_days(type_name, machine, year, month, item, bits, days) VALUES (?,?,?,?,?,?,?)",
+                        ((type_name, machine, year, month, item, _bits(row), len(row))
+                         for item, row in (data.get("items") or {}).items()))
+
+    # --- 集計 ---
+    def completion_counts(self, start: int, end: int, type_name: Optional[str] = None,
+                          machines: Optional[Sequence[str]] = None,
+                          by: Sequence[str] = ("type_name", "machine", "item")) -> "pd.DataFrame":
+        """
+        start〜end（YYYYMMDD、両端含む）の点検実施数を SQL で集計する（MonthlyState は作らない）。
+        by: GROUP_COLUMNS から選んだ集計単位
+        戻り値の列: by + [done（○の数）, total（セル数）, rate（done / total）]
+        保存されていない月・日は total に含まれない。
+        """
+        import numpy as np
+        import pandas as pd   # 集計するときだけ読み込む（起動時間のため）
+        bad = [c for c in by if c not in GROUP_COLUMNS]
+        if bad:
+            raise ValueError(f"Unknown group column: {bad}")
+        start, end = int(start), int(end)
+        # year の条件は索引を使わせるため（年月の絞り込みは次の式）
+        where = ["year BETWEEN ? AND ?", "year * 100 + month BETWEEN ? AND ?"]
+        params: list = [start // 10000, end // 10000, start // 100, end // 100]
+        if type_name is not None:
+            where.append("type_name = ?")
+            params.append(type_name)
+        if machines:
+            where.append(f"machine IN ({','.join('?' * len(machines))})")
+            params += list(machines)
+        with self._tlock:
+            fetched = self.conn.execute("SELECT type_name, machine, year, month, item, bits, days FROM item_days "
+                                        f"WHERE {' AND '.join(where)}", params).fetchall()
+        rows = pd.DataFrame(fetched, columns=["type_name", "machine", "year", "month", "item", "bits", "days"])
+
+        # 行 × 31日 の ○ / 対象日の行列（月の途中で切れる期間はここで日をしぼる）
+        day = np.arange(1, 32)
+        bits = rows["bits"].to_numpy(dtype=np.int64)
+        done = (bits[:, None] >> (day - 1)) & 1 == 1
+        ymd = (rows["year"].to_numpy() * 10000 + rows["month"].to_numpy() * 100)[:, None] + day
+        valid = (day <= rows["days"].to_numpy()[:, None]) & (ymd >= start) & (ymd <= end)
+        keys = [c for c in by if c != "ymd"]
+        if "ymd" in by:
+            r, d = np.nonzero(valid)
+            flat = rows.iloc[r][keys].reset_index(drop=True)
+            flat["ymd"] = ymd[r, d]
+            flat["done"] = done[r, d].astype(int)
+            flat["total"] = 1
+        else:
+            flat = rows[keys].copy()
+            flat["done"] = (done & valid).sum(axis=1)
+            flat["total"] = valid.sum(axis=1)
+        flat = flat[flat["total"] > 0]
+        if by:
+            df = flat.groupby(list(by), sort=True)[["done", "total"]].sum().reset_index()
+        else:
+            df = pd.DataFrame({"done": [int(flat["done"].sum())], "total": [int(flat["total"].sum())]})
+        df["done"] = df["done"].astype(int)
+        df["total"] = df["total"].astype(int)
+        df["rate"] = (df["done"] / df["total"]).where(df["total"] > 0, 0.0)
+        return df
+
+    # --- 取り込み ---
+    def import_json_dir(self, root: str) -> int:
+        """
+        従来の月次 JSON（root 直下の 種別_YYYY-MM_機械.json）を一度だけ取り込む。戻り値: 取り込んだ件数
+        既に保存先にある月は上書きしない。元の JSON は消さずに残す。
+        """
+        if self.get_meta("imported_json") is not None:
+            return 0
+        n = 0
+        with self._write() as cur:
+            for path in sorted(glob.glob(os.path.join(root, "*.json"))):
+                data = _read_state_json(path)
+                if data is None:
+                    continue
+                key = (data["type_name"], int(data["year"]), int(data["month"]), data["machine"])
+                exists = cur.execute("SELECT 1 FROM states WHERE type_name=? AND year=? AND month=? AND machine=?",
+                                     key).fetchone()
+                if not exists:
+                    self._put(cur, *key, data, state_etag(data))
+                    n += 1
+            cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('imported_json', ?)", (root,))
+        if n:
+            LOGGER.info(f"Imported {n} monthly state files into {self.db_path}")
+        return n
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._tlock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _write(self):
+        return _WriteTx(self)
+
+def _bits(row) -> int:
+    return DayBits.of(row).bits
+
+def _read_state_json(path: str) -> Optional[Dict[str, Any]]:
+    m = _JSON_NAME.match(os.path.basename(path))
+    if m is None:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            data = json.load(f)
+    except Exception as e:
+        LOGGER.warning(f"Skipped unreadable state file {path}: {e}")
+        return None
+    if not isinstance(data, dict) or "items" not in data:
+        return None
+    # 中身に無ければファイル名から補う（ファイル名では "/" が "_" になっているので中身を優先）
+    data.setdefault("type_name", m["type"])
+    data.setdefault("machine", m["machine"])
+    data.setdefault("year", int(m["year"]))
+    data.setdefault("month", int(m["month"]))
+    return data
+
+class _WriteTx:
+    """スレッド排他 + プロセス間ロック + BEGIN IMMEDIATE ... COMMIT / ROLLBACK"""
+
+    def __init__(self, store: InspectionStore) -> None:
+        self.store = store
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.store._tlock.acquire()
+        try:
+            self.store._lock.acquire()
+            try:
+                self.store.conn.execute("BEGIN IMMEDIATE")
+            except BaseException:
+                self.store._lock.release()
+                raise
+        except BaseException:
+            self.store._tlock.release()
+            raise
+        return self.store.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            try:
+                self.store.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+            finally:
+                self.store._lock.release()
+        finally:
+            self.store._tlock.release()
+        return False
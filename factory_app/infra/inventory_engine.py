@@ -0,0 +1,324 @@
+
+import bisect, itertools
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+import pandas as pd
+from .fifo import allocate, FIFO, FEFO
+
+INV_COLUMNS = ["product_code","exp_date","in_date","qty","updated_at"]
+
+# 行レイアウト（_rows の各要素）
+C_CODE, C_EXP, C_IN, C_QTY, C_UPD = range(5)
+
+Key = Tuple[str, str, str]   # (product_code, exp_date, in_date)
+Lot = Tuple[str, str]        # (product_code, exp_date)
+
+# 変更履歴（changes_since 用）を行数のこの倍まで溜めたら古い半分を捨てる
+CHANGE_LOG_FACTOR = 2
+# 表へ反映していない変更が行数のこの分の1を超えたら、書き換えずに作り直す
+REBUILD_FRACTION = 4
+# 入出庫で値が変わる列（入庫日の付け替えと行の追加はロットごと全列を書き直す）
+UPDATED_COLUMNS = ["qty", "updated_at"]
+_GENERATIONS = itertools.count(1)
+
+class InventoryEngine:
+    """
+    在庫のインメモリ索引。
+    - _rows: CSVと同じ並び順の行（行番号 = rid、削除はしない）
+    - _by_key: (product, exp, in_date) -> 最初に現れた rid
+    - _by_lot: (product, exp) -> [(in_date, rid), ...]（in_date昇順）
+    - _exps: product -> [exp_date, ...]（昇順、FEFO用）
+    1件の入出庫は辞書引き + bisect で済み、全行スキャンは発生しない。
+    画面の差分更新用に、変更した rid を版番号つきで記録する（generation はエンジンを作り直すと変わる）。
+    frame / sorted_frame は一度作ったら変わった行だけ書き換える（入出庫のたびに作り直さない）。
+    """
+
+    def __init__(self) -> None:
+        self.generation = next(_GENERATIONS)
+        self.version = 0
+        self._log: List[Tuple[int, int]] = []   # (version, rid)
+        self._rows: List[list] = []
+        self._by_key: Dict[Key, int] = {}
+        self._by_lot: Dict[Lot, List[Tuple[str, int]]] = {}
+        self._exps: Dict[str, List[str]] = {}
+        self._frame: Optional[pd.DataFrame] = None
+        self._sorted: Optional[pd.DataFrame] = None
+        # 作った表へまだ反映していない変更（表を作っていなければ記録しない）
+        self._stale_frame: Set[int] = set()      # rid
+        self._rekeyed: Set[int] = set()          # frame で入庫日を付け替えた rid
+        self._stale_sorted: Set[int] = set()     # rid
+        self._stale_lots: Set[Lot] = set()       # 並び順が変わったロット（入庫日の付け替え・行の追加）
+        self._order: Optional[List[Tuple[str, str, str, int]]] = None   # sorted_frame の並び (product, exp, in, rid)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "InventoryEngine":
+        eng = cls()
+        cols = df.reindex(columns=INV_COLUMNS)
+        for code, exp, ind, qty, upd in cols.itertuples(index=False, name=None):
+            eng._append([_s(code), _s(exp), _s(ind), _f(qty), _s(upd)])
+        return eng
+
+    # --- 参照 ---
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        CSVと同じ行順の DataFrame（保存用）。前回の表へ変わった行を書き込み、増えた行を足して返す。
+        返す表は次の入出庫で書き換わるので、持ち続ける・書き換える場合は copy() すること。
+        """
+        n = 0 if self._frame is None else len(self._frame)
+        if n == 0 or len(self._stale_frame) + len(self._rows) - n > n // REBUILD_FRACTION:
+            self._frame = _to_frame(self._rows)
+        else:
+            if len(self._rows) > n:
+                self._frame = pd.concat([self._frame, _to_frame(self._rows[n:])], ignore_index=True)
+            rids = sorted(r for r in self._stale_frame if r < n)
+            _write(self._frame, rids, [self._rows[r] for r in rids], UPDATED_COLUMNS)
+            rids = sorted(r for r in self._rekeyed if r < n)
+            _write(self._frame, rids, [self._rows[r] for r in rids], ["in_date"])
+        self._stale_frame.clear()
+        self._rekeyed.clear()
+        return self._frame
+
+    def sorted_frame(self) -> pd.DataFrame:
+        """
+        (product_code, exp_date, in_date) 順の DataFrame（画面表示用）。
+        値だけ変わった行はその行、入庫日の付け替え・行の追加はそのロットの範囲だけ書き直す。
+        返す表は frame と同じく次の入出庫で書き換わる。
+        """
+        n = 0 if self._sorted is None else len(self._sorted)
+        if n == 0 or len(self._stale_sorted) + len(self._rows) - n > n // REBUILD_FRACTION:
+            self._order = sorted(self._key(rid) for rid in range(len(self._rows)))
+            self._sorted = _to_frame([self._rows[k[3]] for k in self._order])
+        else:
+            order = self._order
+            if len(self._rows) > n:
+                # 追加した行を並び順の位置へ差し込む（並べ替えはしない）。ロットの中の順は下で書き直す
+                pos = sorted(bisect.bisect_left(order, self._key(rid)) for rid in range(n, len(self._rows)))
+                cuts = [0] + [p - k for k, p in enumerate(pos)] + [n]
+                parts = [self._sorted.iloc[cuts[0]:cuts[1]]]
+                for k, p in enumerate(pos):
+                    parts += [_to_frame([self._rows[order[p][3]]]), self._sorted.iloc[cuts[k + 1]:cuts[k + 2]]]
+                self._sorted = pd.concat(parts, ignore_index=True)
+                self._stale_lots.update(_lot_of(order[p]) for p in pos)
+            moved = set()
+            for lot in self._stale_lots:
+                lo = bisect.bisect_left(order, lot, key=_lot_of)
+                moved.update(range(lo, bisect.bisect_right(order, lot, key=_lot_of)))
+            moved = sorted(moved)
+            _write(self._sorted, moved, [self._rows[order[p][3]] for p in moved], INV_COLUMNS)
+            rids = [rid for rid in self._stale_sorted if _lot_of(self._rows[rid]) not in self._stale_lots]
+            positions = sorted(bisect.bisect_left(order, self._key(rid)) for rid in rids)
+            _write(self._sorted, positions, [self._rows[order[p][3]] for p in positions], UPDATED_COLUMNS)
+        self._stale_sorted.clear()
+        self._stale_lots.clear()
+        return self._sorted
+
+    def row(self, rid: int) -> list:
+        """rid の行の写し"""
+        return list(self._rows[rid])
+
+    def rows(self) -> List[Tuple[int, list]]:
+        """全行の写し [(rid, 行), ...]"""
+        return [(rid, list(row)) for rid, row in enumerate(self._rows)]
+
+    def changes_since(self, version: int) -> Optional[List[int]]:
+        """version より後に変わった rid（昇順）。履歴を捨てた後で分からなければ None。"""
+        if version >= self.version:
+            return []
+        if not self._log or self._log[0][0] > version + 1:
+            return None
+        i = bisect.bisect_right(self._log, (version, len(self._rows)))
+        return sorted({rid for _, rid in self._log[i:]})
+
+    def available(self, product_code: str, exp_date: str) -> float:
+        """(product, exp) の引当可能数量（qty>0 の合計）"""
+        total = 0.0
+        for _, rid in self._by_lot.get((product_code, exp_date), []):
+            q = self._rows[rid][C_QTY]
+            if q > 0:
+                total += q
+        return total
+
+    # --- 更新 ---
+    def inbound(self, product_code: str, exp_norm: str, in_norm: str, qty: float, now: str) -> None:
+        """入庫：同一(product, exp)があるなら加算。in_dateは最新に更新。"""
+        entries = self._by_lot.get((product_code, exp_norm))
+        if not entries:
+            self._changed(self._append([product_code, exp_norm, in_norm, qty, now]))
+            return
+        rid = self._by_key.get((product_code, exp_norm, in_norm))
+        if rid is None:
+            # 代表行（qty>0の行優先、無ければ最初）。「最初」はCSV上の並び順。
+            rids = [r for _, r in entries]
+            positive = [r for r in rids if self._rows[r][C_QTY] > 0]
+            rid = min(positive) if positive else min(rids)
+        row = self._rows[rid]
+        row[C_QTY] = float(row[C_QTY]) + qty
+        row[C_UPD] = now
+        new_in = max(row[C_IN], in_norm)
+        if new_in != row[C_IN]:
+            self._rekey(rid, new_in)
+        self._changed(rid)
+
+    def outbound(self, product_code: str, exp_norm: str, qty: float, now: str) -> List[Tuple[str, float]]:
+        """
+        出庫：FIFO（in_date昇順）で引き当てる。不足チェックは呼び出し側で available() を使うこと。
+        戻り値: [(in_date, 引当数量), ...]
+        """
+        _, _, alloc = self.outbound_many([(product_code, exp_norm, qty)], now)[0]
+        return [(ind, take) for _, ind, take in alloc]
+
+    def outbound_many(self, requests: Sequence[Tuple[str, str, float]], now: str, policy: str = FIFO
+                      ) -> List[Tuple[bool, float, List[Tuple[str, str, float]]]]:
+        """
+        複数の出庫要求 [(product, exp, qty), ...] を要求順にまとめて引き当てる（fifo.allocate）。
+        FEFO の場合 exp は無視し、product 内で賞味期限の早い順に引き当てる。
+        在庫不足の要求は反映しない。
+        戻り値: 要求ごとの (成功, 要求時点の在庫, [(exp_date, in_date, 引当数量), ...])
+        """
+        group_of: Dict[tuple, int] = {}
+        req_group = []
+        for code, exp, _ in requests:
+            g = (code,) if policy == FEFO else (code, exp)
+            req_group.append(group_of.setdefault(g, len(group_of)))
+        lot_group, rids = [], []
+        for g, gi in group_of.items():
+            lots = [(g[0], e) for e in self._exps.get(g[0], [])] if policy == FEFO else [g]
+            for lot in lots:
+                for _, rid in self._by_lot.get(lot, []):
+                    lot_group.append(gi)
+                    rids.append(rid)
+        qty = np.fromiter((self._rows[r][C_QTY] for r in rids), dtype=float, count=len(rids))
+        ok, avail, new_qty, a_req, a_lot, a_take = allocate(
+            np.asarray(lot_group, dtype=np.int64), qty,
+            np.asarray(req_group, dtype=np.int64), np.fromiter((q for _, _, q in requests), dtype=float))
+
+        results = [(bool(ok[i]), float(avail[i]), []) for i in range(len(requests))]
+        for i, li, take in zip(a_req.tolist(), a_lot.tolist(), a_take.tolist()):
+            row = self._rows[rids[li]]
+            row[C_QTY] = float(new_qty[li])
+            row[C_UPD] = now
+            self._changed(rids[li])
+            results[i][2].append((row[C_EXP], row[C_IN], take))
+        return results
+
+    def apply_alloc(self, product_code: str, exp_norm: str, alloc: Sequence[Sequence], now: str) -> None:
+        """記録済みの引当 [(in_date, 数量), ...] をそのまま再適用する（have - take で元の計算と一致）。"""
+        entries = self._by_lot.get((product_code, exp_norm), [])
+        for ind, take in alloc:
+            i = bisect.bisect_left(entries, (ind, -1))
+            while i < len(entries) and entries[i][0] == ind and self._rows[entries[i][1]][C_QTY] <= 0:
+                i += 1
+            if i >= len(entries) or entries[i][0] != ind:
+                raise ValueError(f"Allocation target not found: {product_code} {exp_norm} {ind}")
+            row = self._rows[entries[i][1]]
+            row[C_QTY] = float(row[C_QTY]) - float(take)
+            row[C_UPD] = now
+            self._changed(entries[i][1])
+
+    def return_in(self, product_code: str, exp_norm: str, in_norm: str, qty: float, now: str) -> None:
+        """戻し：数量加算。in_date は指定日付を保持（無ければ新規行）。"""
+        rid = self._by_key.get((product_code, exp_norm, in_norm))
+        if rid is None:
+            self._changed(self._append([product_code, exp_norm, in_norm, qty, now]))
+            return
+        row = self._rows[rid]
+        row[C_QTY] = float(row[C_QTY]) + qty
+        row[C_UPD] = now
+        self._changed(rid)
+
+    def apply(self, op: str, product_code: str, exp_norm: str, in_norm: str, qty: float, now: str,
+              alloc: Optional[Sequence[Sequence]] = None) -> None:
+        """ジャーナルの1レコードを再適用する（起動時のリプレイ用）。"""
+        if op == "inbound":
+            self.inbound(product_code, exp_norm, in_norm, qty, now)
+        elif op == "outbound" and alloc is not None:
+            self.apply_alloc(product_code, exp_norm, alloc, now)
+        elif op == "outbound":
+            self.outbound(product_code, exp_norm, qty, now)
+        elif op == "return_in":
+            self.return_in(product_code, exp_norm, in_norm, qty, now)
+        else:
+            raise ValueError(f"Unknown op: {op}")
+
+    # --- 内部 ---
+    def _append(self, row: list) -> int:
+        rid = len(self._rows)
+        self._rows.append(row)
+        key = (row[C_CODE], row[C_EXP], row[C_IN])
+        self._by_key.setdefault(key, rid)
+        lot = (row[C_CODE], row[C_EXP])
+        if lot not in self._by_lot:
+            bisect.insort(self._exps.setdefault(row[C_CODE], []), row[C_EXP])
+        bisect.insort(self._by_lot.setdefault(lot, []), (row[C_IN], rid))
+        if self._order is not None:
+            bisect.insort(self._order, self._key(rid))
+        return rid
+
+    def _rekey(self, rid: int, new_in: str) -> None:
+        row = self._rows[rid]
+        lot = (row[C_CODE], row[C_EXP])
+        old_key = (row[C_CODE], row[C_EXP], row[C_IN])
+        entries = self._by_lot[lot]
+        entries.pop(bisect.bisect_left(entries, (row[C_IN], rid)))
+        if self._by_key.get(old_key) == rid:
+            # 同一キーの重複行（手編集CSV等）が残っていればそちらへ付け替え
+            i = bisect.bisect_left(entries, (row[C_IN], -1))
+            if i < len(entries) and entries[i][0] == row[C_IN]:
+                self._by_key[old_key] = entries[i][1]
+            else:
+                del self._by_key[old_key]
+        if self._frame is not None:
+            self._rekeyed.add(rid)
+        if self._order is not None:
+            del self._order[bisect.bisect_left(self._order, self._key(rid))]
+            self._stale_lots.add(lot)
+        row[C_IN] = new_in
+        self._by_key.setdefault((row[C_CODE], row[C_EXP], new_in), rid)
+        bisect.insort(entries, (new_in, rid))
+        if self._order is not None:
+            bisect.insort(self._order, self._key(rid))
+
+    def _key(self, rid: int) -> Tuple[str, str, str, int]:
+        row = self._rows[rid]
+        return row[C_CODE], row[C_EXP], row[C_IN], rid
+
+    def _changed(self, rid: int) -> None:
+        if self._frame is not None:
+            self._stale_frame.add(rid)
+        if self._sorted is not None:
+            self._stale_sorted.add(rid)
+        self.version += 1
+        self._log.append((self.version, rid))
+        if len(self._log) > CHANGE_LOG_FACTOR * max(len(self._rows), 1000):
+            del self._log[:len(self._log) // 2]
+
+def _to_frame(rows: Sequence[list]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=INV_COLUMNS)
+    df["qty"] = df["qty"].astype(float)
+    return df
+
+def _write(df: pd.DataFrame, positions: Sequence[int], rows: Sequence[list], columns: Sequence[str]) -> None:
+    """df の positions 行目へ rows の columns 列を書き込む"""
+    if not len(positions):
+        return
+    for c in columns:
+        j = INV_COLUMNS.index(c)
+        df.iloc[positions, j] = [row[j] for row in rows]
+
+def _lot_of(key: tuple) -> Lot:
+    return key[0], key[1]
+
+def _s(v) -> str:
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    return str(v)
+
+def _f(v) -> float:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if f != f else f
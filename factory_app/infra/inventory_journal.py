@@ -0,0 +1,97 @@
+
+import os, json
+from typing import Any, Dict, List, Optional
+from .durability import GROUP, commit_append
+from .logging_conf import get_logger, add_io
+
+LOGGER = get_logger(__name__)
+
+class InventoryJournal:
+    """
+    在庫移動の追記専用ジャーナル（JSON Lines、1行 = 1移動）。
+    各レコードは連番 seq を持ち、スナップショット側は「どの seq まで畳み込み済みか」を記録する。
+    読み書きはすべて保存先のプロセス間ロック下で行う前提。
+    """
+
+    def __init__(self, path: str, start_seq: int = 0) -> None:
+        """start_seq: スナップショットに畳み込み済みの seq（ローテーション後も連番を続けるため）"""
+        self.path = path
+        self.last_seq = start_seq
+        self.pending = 0   # スナップショット未反映の件数
+        self.offset = 0    # 読み込み済みのバイト位置
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """
+        前回読んだ位置以降の完結したレコードのうち、未適用（seq > last_seq）のものを返す。
+        他端末が追記した分の取り込みにも使う。末尾の書きかけ行（電源断など）は切り詰める。
+        """
+        if not os.path.exists(self.path):
+            self.offset = 0
+            return []
+        recs = []
+        good = self.offset
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                self.pending += 1
+                if int(rec["seq"]) > self.last_seq:
+                    recs.append(rec)
+                    self.last_seq = int(rec["seq"])
+        if good != os.path.getsize(self.path):
+            LOGGER.warning(f"Journal tail truncated at byte {good} -> {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        add_io(read=good - self.offset)
+        self.offset = good
+        return recs
+
+    def append(self, op: str, ts: str, product_code: str, exp_date: str, in_date: str, qty: float,
+               alloc: Optional[List[List[Any]]] = None) -> Dict[str, Any]:
+        return self.extend([(op, ts, product_code, exp_date, in_date, qty, alloc)])[0]
+
+    def extend(self, moves: List[tuple]) -> List[Dict[str, Any]]:
+        """複数の移動をまとめて追記する（書き込みは1回。fsync は耐久性のモードに従う）。"""
+        recs = []
+        lines = []
+        seq = self.last_seq
+        for op, ts, product_code, exp_date, in_date, qty, alloc in moves:
+            seq += 1
+            rec: Dict[str, Any] = {
+                "seq": seq, "ts": ts, "op": op,
+                "product_code": product_code, "exp_date": exp_date, "in_date": in_date, "qty": qty,
+            }
+            if alloc is not None:
+                rec["alloc"] = alloc
+            recs.append(rec)
+            lines.append(json.dumps(rec, ensure_ascii=False) + "\n")
+        if not recs:
+            return recs
+        data = "".join(lines).encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            commit_append(self.path, f)
+        add_io(written=len(data))
+        self.last_seq = seq
+        self.pending += len(recs)
+        self.offset += len(data)
+        return recs
+
+    def rotate(self, archive_dir: str, stamp: str) -> Optional[str]:
+        """畳み込み済みのジャーナルを履歴として退避し、空のジャーナルから再開する。"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        os.makedirs(archive_dir, exist_ok=True)
+        GROUP.flush(self.path)   # まとめ待ちの fsync を退避前に済ませる
+        dest = os.path.join(archive_dir, f"inventory_journal_{stamp}_{self.last_seq:010d}.jsonl")
+        os.replace(self.path, dest)
+        self.pending = 0
+        self.offset = 0
+        return dest
@@ -1,22 +1,154 @@
 
 import os
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone, timedelta
+from .inventory_engine import INV_COLUMNS
+from .inventory_store import InventoryStore, CsvInventoryStore, PM_COLUMNS
+from .inventory_sqlite import SqliteInventoryStore, migrate_from_csv
+from .inventory_view import InventoryView, Page, ViewQuery, PAGE_SIZE
+from .expiry_index import ExpiryIndex, add_days
+from .ledger import MovementLedger
+from .settings import get_setting
+from .fifo import FIFO, FEFO, POLICIES
+from .locking import Timeout
+from .durability import atomic_write_text
+from .logging_conf import instrumented
+from ..domain.product_index import ProductIndex
 
 ENC = "utf-8-sig"
 ROOT = os.path.dirname(os.path.dirname(__file__))
-STOR = os.path.join(ROOT, "storage")
-os.makedirs(STOR, exist_ok=True)
 
-INVENTORY_CSV = os.path.join(STOR, "inventory.csv")
-PRODUCT_MASTER_CSV = os.path.join(STOR, "product_master.csv")
+# 拠点（倉庫・ライン）ごとの在庫の置き場所：<保存先>/sites/<拠点名>。拠点名が空なら保存先の直下（従来の単一在庫）。
+SITES_DIR = "sites"
 
-INV_COLUMNS = ["product_code","exp_date","in_date","qty","updated_at"]
-PM_COLUMNS = ["product_code","product_name"]
+def use_storage(root: str, backend: Optional[str] = None, site: Optional[str] = None) -> None:
+    """
+    在庫ファイルの置き場所を設定する（既定は factory_app/storage）。
+    複数端末で共有フォルダを使う場合や、検証用の一時フォルダに向ける場合に呼ぶ。
+    backend を渡すと settings.json の "inventory_backend" より優先する。
+    site を渡すとその拠点の在庫を使う（省略時は settings.json の "site"、未設定なら保存先の直下）。
+    """
+    global STOR_ROOT, PRODUCT_MASTER_CSV, _BACKEND, _SITE
+    STOR_ROOT = root
+    _BACKEND = backend
+    # 製品マスタは全拠点で共通
+    PRODUCT_MASTER_CSV = os.path.join(STOR_ROOT, "product_master.csv")
+    _SITE = site
+    _use_site_dir(site_dir(site or ""))
+
+def use_site(site: str) -> None:
+    """
+    これ以降の在庫の読み書きを拠点 site の在庫に向ける（空文字なら保存先の直下）。
+    入出庫はその拠点のファイル（SQLite ならその拠点の DB）だけを更新する。
+    """
+    global _SITE
+    _SITE = site
+    _use_site_dir(site_dir(site))
+
+def site_dir(site: str) -> str:
+    if not site:
+        return STOR_ROOT
+    if site in (".", "..") or any(ch in site for ch in '/\\:*?"<>|'):
+        raise ValueError(f"Invalid site name: {site}")
+    return os.path.join(STOR_ROOT, SITES_DIR, site)
+
+def current_site() -> str:
+    """使用中の拠点（settings.json の "site" を含めて決まったもの）"""
+    if _SITE is None:
+        use_site(str(get_setting("site", "") or ""))
+    return _SITE
+
+def sites() -> List[str]:
+    """
+    既知の拠点：settings.json の "sites" と、保存先の sites フォルダにある拠点。
+    保存先の直下に在庫があれば ""（直下の在庫）も含める。
+    """
+    names = {str(s) for s in get_setting("sites", None) or [] if str(s)}
+    folder = os.path.join(STOR_ROOT, SITES_DIR)
+    if os.path.isdir(folder):
+        names |= {d for d in os.listdir(folder) if os.path.isdir(os.path.join(folder, d))}
+    root_has_stock = any(os.path.exists(os.path.join(STOR_ROOT, f)) for f in ("inventory.csv", "inventory.sqlite3"))
+    return ([""] if root_has_stock else []) + sorted(names)
+
+def map_sites(fn: Callable, site_names: List[str], args: tuple = (), processes: Optional[int] = None) -> List[Any]:
+    """
+    拠点ごとに fn(*args) を実行する。拠点の在庫は互いに独立なのでプロセスプールで並列に読む。
+    fn はプロセスプールから呼べるようモジュール直下の関数にする。
+    processes=1 または拠点が1つなら同じプロセスで順に実行し、終わったら元の拠点へ戻す。戻り値は site_names と同じ順。
+    """
+    if not site_names:
+        return []
+    jobs = [(STOR_ROOT, _BACKEND, site, fn, args) for site in site_names]
+    workers = min(len(jobs), processes or os.cpu_count() or 1)
+    if workers <= 1:
+        saved = {name: globals()[name] for name in _SITE_STATE}
+        try:
+            return [_run_at_site(job) for job in jobs]
+        finally:
+            globals().update(saved)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_at_site, jobs))
+
+def _run_at_site(job: Tuple[str, Optional[str], str, Callable, tuple]) -> Any:
+    # プロセスプールから呼ぶためモジュール直下に置く
+    root, backend, site, fn, args = job
+    use_storage(root, backend, site)
+    return fn(*args)
+
+# map_sites を同じプロセスで順に実行したあと元へ戻す状態
+_SITE_STATE = ("STOR_ROOT", "PRODUCT_MASTER_CSV", "_BACKEND", "_SITE", "STOR", "INVENTORY_CSV", "JOURNAL_PATH",
+               "SNAPSHOT_META", "JOURNAL_ARCHIVE_DIR", "SQLITE_PATH", "LEDGER_DIR", "_STORE", "_INDEX", "_VIEW", "_EXPIRY")
+
+def _use_site_dir(folder: str) -> None:
+    global STOR, INVENTORY_CSV, JOURNAL_PATH, SNAPSHOT_META, JOURNAL_ARCHIVE_DIR, SQLITE_PATH, LEDGER_DIR
+    global _STORE, _INDEX, _VIEW, _EXPIRY
+    STOR = folder
+    INVENTORY_CSV = os.path.join(STOR, "inventory.csv")
+    # 追記専用の移動ジャーナルと、inventory.csv（スナップショット）がどこまで畳み込み済みかのメタ
+    JOURNAL_PATH = os.path.join(STOR, "inventory_journal.jsonl")
+    SNAPSHOT_META = os.path.join(STOR, "inventory.snapshot.json")
+    JOURNAL_ARCHIVE_DIR = os.path.join(STOR, "journal_archive")
+    # "inventory_backend": "sqlite" のときの保存先
+    SQLITE_PATH = os.path.join(STOR, "inventory.sqlite3")
+    # 締めた月の移動と月末在庫（Parquet、月ごと）
+    LEDGER_DIR = os.path.join(STOR, "ledger")
+    _STORE = None
+    _INDEX = None
+    _VIEW = None
+    _EXPIRY = None
+
+_STORE: Optional[InventoryStore] = None
+_BACKEND: Optional[str] = None
+# 使用中の拠点（None なら最初に在庫を使うときに settings.json の "site" を反映する）
+_SITE: Optional[str] = None
+# 製品検索の索引と、作ったときの製品マスタの版
+_INDEX: Optional[Tuple[Any, ProductIndex]] = None
+# 画面の在庫表（変更行だけ取り込む）
+_VIEW: Optional[InventoryView] = None
+# 賞味期限の索引（数量 > 0 のロットだけ、変更行だけ取り込む）
+_EXPIRY: Optional[ExpiryIndex] = None
+use_storage(os.path.join(ROOT, "storage"))
+
+# この件数たまったらスナップショットへ畳み込む
+COMPACT_EVERY = 1000
+
+# 期限間近とみなす日数の既定（settings.json の "expiry_alert_days" で変えられる）
+EXPIRY_ALERT_DAYS = 30
 
 JST = timezone(timedelta(hours=9))
 
+# 一括取込（スキャナの移動ファイル）の列と区分
+MOVEMENT_COLUMNS = ["op","product_code","exp_date","in_date","qty"]
+OP_ALIASES = {
+    "inbound": "inbound", "in": "inbound", "入庫": "inbound",
+    "outbound": "outbound", "out": "outbound", "出庫": "outbound",
+    "return_in": "return_in", "return": "return_in", "戻し": "return_in",
+}
+OP_LABELS = {"inbound": "入庫", "outbound": "出庫", "return_in": "戻し"}
+
 def _fmt_date(s: str) -> str:
     # accepts YYYY/MM/DD or YYYY-MM-DD; returns YYYY/MM/DD
     s = (s or "").strip()
@@ -29,138 +161,350 @@ def _fmt_date(s: str) -> str:
         return f"{int(y):04d}/{int(m):02d}/{int(d):02d}"
     raise ValueError(f"Invalid date: {s}")
 
+_DATE_RE = r"^\s*(\d{1,9})\s*/\s*(\d{1,9})\s*/\s*(\d{1,9})\s*$"
+
+def _fmt_dates(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    _fmt_date の一括版。戻り値: (YYYY/MM/DD に正規化した値, エラーメッセージ（正常行は ""）)
+    日付の種類は行数よりずっと少ないので異なる値だけを判定して行へ戻す。
+    大半の値は正規表現 + 整数変換でまとめて処理し、外れた値だけ _fmt_date で個別に判定する。
+    """
+    codes, uniques = pd.factorize(values.fillna("").astype(str).str.strip())
+    out, err = _fmt_unique_dates(pd.Series(uniques, dtype=object))
+    return (pd.Series(out.to_numpy()[codes], index=values.index, dtype=object),
+            pd.Series(err.to_numpy()[codes], index=values.index, dtype=object))
+
+def _fmt_unique_dates(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    out = pd.Series("", index=s.index, dtype=object)
+    err = pd.Series("", index=s.index, dtype=object)
+    empty = s == ""
+    out[empty] = datetime.now(JST).strftime("%Y/%m/%d")
+    parts = s.str.replace("-", "/", regex=False).str.extract(_DATE_RE)
+    simple = parts[0].notna() & ~empty
+    if simple.any():
+        ymd = parts[simple].astype("int64").astype(str)
+        out[simple] = ymd[0].str.zfill(4) + "/" + ymd[1].str.zfill(2) + "/" + ymd[2].str.zfill(2)
+    for i in s.index[~simple & ~empty]:
+        try:
+            out[i] = _fmt_date(s[i])
+        except Exception as e:
+            err[i] = str(e)
+    return out, err
+
+def _err_text(e: Exception) -> str:
+    if isinstance(e, Timeout):
+        return "他の端末が更新中です。もう一度実行してください。"
+    return str(e)
+
 def _now_str() -> str:
     return datetime.now(JST).strftime("%Y-%m-%d %H:%M:%S")
 
 def ensure_files():
+    current_site()
+    os.makedirs(STOR, exist_ok=True)
     if not os.path.exists(INVENTORY_CSV):
-        pd.DataFrame(columns=INV_COLUMNS).to_csv(INVENTORY_CSV, index=False, encoding=ENC)
+        atomic_write_text(INVENTORY_CSV, pd.DataFrame(columns=INV_COLUMNS).to_csv(index=False), ENC)
     if not os.path.exists(PRODUCT_MASTER_CSV):
-        pd.DataFrame(columns=PM_COLUMNS).to_csv(PRODUCT_MASTER_CSV, index=False, encoding=ENC)
+        atomic_write_text(PRODUCT_MASTER_CSV, pd.DataFrame(columns=PM_COLUMNS).to_csv(index=False), ENC)
 
-def load_inventory() -> pd.DataFrame:
+def _backend_name() -> str:
+    if _BACKEND:
+        return _BACKEND
+    return str(get_setting("inventory_backend", "csv")).lower()
+
+def get_store() -> InventoryStore:
+    """
+    設定 (config/settings.json の "inventory_backend": "csv" | "sqlite") に応じた保存先を返す。
+    sqlite へ切り替えた初回は既存の CSV を一度だけ取り込む。
+    """
+    global _STORE
+    current_site()
+    backend = _backend_name()
+    if _STORE is not None and _STORE.name == backend:
+        return _STORE
     ensure_files()
-    df = pd.read_csv(INVENTORY_CSV, encoding=ENC)
-    if len(df.columns) != len(INV_COLUMNS):
-        # try to coerce columns (for older files)
-        df = df.reindex(columns=INV_COLUMNS, fill_value="")
-    df["qty"] = pd.to_numeric(df["qty"], errors="coerce").fillna(0.0).astype(float)
-    return df
+    csv_store = CsvInventoryStore(INVENTORY_CSV, PRODUCT_MASTER_CSV, JOURNAL_PATH, SNAPSHOT_META,
+                                  JOURNAL_ARCHIVE_DIR, ENC, COMPACT_EVERY)
+    if backend == "sqlite":
+        store = SqliteInventoryStore(SQLITE_PATH, PRODUCT_MASTER_CSV, ENC)
+        migrate_from_csv(store, csv_store)
+        _STORE = store
+    else:
+        _STORE = csv_store
+    return _STORE
+
+def _reset_store() -> None:
+    """途中で失敗した場合はメモリ上の状態を捨て、次回ファイルから読み直す。"""
+    if _STORE is not None:
+        _STORE.reset()
+
+@instrumented("inventory.compact")
+def compact_inventory() -> None:
+    """ジャーナルをスナップショットへ畳み込む（CSV保存先のみ意味を持つ）。"""
+    get_store().compact()
+
+# 計測用：(ok, msg, 在庫表) の成否と在庫表の行数（table=False なら 0）
+_ok = lambda res: res[0]
+_table_rows = lambda res: 0 if res[-1] is None else len(res[-1])
+
+def _inventory_or_empty() -> pd.DataFrame:
+    """エラー応答用。ロック待ちなどで読めなければ空の表を返す。"""
+    try:
+        return load_inventory()
+    except Exception:
+        return pd.DataFrame(columns=INV_COLUMNS)
+
+def _table(store: Optional[InventoryStore], table: bool) -> Optional[pd.DataFrame]:
+    """
+    更新系の戻り値の在庫表。table=False（画面が差分で更新する・サービス等で表を使わない）なら
+    在庫表を用意する手間を省いて None を返す。
+    返す表はエンジンが変わった行だけ書き換えて使い回すので、持ち続ける・書き換える場合は copy() すること。
+    """
+    if not table:
+        return None
+    return store.sorted_frame() if store is not None else load_inventory()
+
+@instrumented("inventory.load", rows=len)
+def load_inventory() -> pd.DataFrame:
+    return get_store().frame().copy()
+
+@instrumented("inventory.load_typed", rows=len)
+def load_inventory_typed() -> pd.DataFrame:
+    """
+    集計用の型つき在庫表（製品コードは category、日付は datetime64、数量は float64。inventory_schema.TYPED_DTYPES）。
+    集計のたびに保存先の在庫表から作る（型つきの写しを持ち続けない）。
+    """
+    try:
+        return get_store().typed_frame()
+    except Exception:
+        _reset_store()
+        raise
 
+@instrumented("inventory.save")
 def save_inventory(df: pd.DataFrame) -> None:
-    df = df.reindex(columns=INV_COLUMNS)
-    df.to_csv(INVENTORY_CSV, index=False, encoding=ENC)
+    get_store().replace_all(df)
 
+@instrumented("inventory.product_master", rows=len)
 def load_product_master() -> pd.DataFrame:
-    ensure_files()
-    df = pd.read_csv(PRODUCT_MASTER_CSV, encoding=ENC)
-    if len(df.columns) != len(PM_COLUMNS):
-        df = df.reindex(columns=PM_COLUMNS, fill_value="")
-    return df
+    return get_store().product_master()
+
+def product_index() -> ProductIndex:
+    """製品マスタの検索索引。マスタが変わったとき（CSV は更新時刻・サイズで判定）だけ作り直す。"""
+    global _INDEX
+    store = get_store()
+    stamp = (store.name, store.product_master_stamp())
+    if _INDEX is None or stamp[1] is None or _INDEX[0] != stamp:
+        pm = load_product_master()
+        _INDEX = (stamp, ProductIndex(pm["product_code"], pm["product_name"]))
+    return _INDEX[1]
+
+@instrumented("inventory.table_page", rows=lambda page: len(page.rows))
+def table_page(query: Optional[ViewQuery] = None, offset: int = 0, limit: int = PAGE_SIZE) -> Page:
+    """
+    画面の在庫表の1ページ。前回からの変更行だけを取り込み、絞り込み・並べ替え済みの offset 行目から limit 行を返す。
+    query=None なら前回の条件のまま。賞味期限の範囲は YYYY/MM/DD・YYYY-MM-DD のどちらでもよい（空は制限なし）。
+    """
+    global _VIEW
+    current_site()   # 拠点を決めると表を作り直すので、表を作る前に決めておく
+    if _VIEW is None:
+        _VIEW = InventoryView()
+    if query is not None:
+        _VIEW.set_query(ViewQuery(
+            query.product.strip(),
+            _fmt_date(query.exp_from) if query.exp_from.strip() else "",
+            _fmt_date(query.exp_to) if query.exp_to.strip() else "",
+            query.hide_zero, query.sort_by, query.descending))
+    try:
+        changed = _VIEW.sync(get_store(), product_index())
+    except Exception:
+        _reset_store()
+        raise
+    page = _VIEW.page(offset, limit)
+    page.changed = changed
+    return page
 
-def inbound(product_code: str, exp_date: str, in_date: str, qty: float) -> Tuple[bool, str, pd.DataFrame]:
+def expiry_index() -> ExpiryIndex:
+    """賞味期限の索引（前回からの変更行だけ取り込んでから返す）"""
+    global _EXPIRY
+    current_site()   # 拠点を決めると索引を作り直すので、索引を作る前に決めておく
+    if _EXPIRY is None:
+        _EXPIRY = ExpiryIndex()
+    try:
+        _EXPIRY.sync(get_store())
+    except Exception:
+        _reset_store()
+        raise
+    return _EXPIRY
+
+@instrumented("inventory.expiry_alerts", rows=lambda res: len(res[2]) + len(res[3]))
+def expiry_basis(days: Optional[int] = None, today: Optional[str] = None) -> Tuple[str, int]:
+    """期限の判定の (基準日 YYYY/MM/DD, 日数)。省略時は今日・設定値（"expiry_alert_days"）"""
+    today = _fmt_date(today or "")
+    days = int(get_setting("expiry_alert_days", EXPIRY_ALERT_DAYS) if days is None else days)
+    return today, days
+
+def expiry_alerts(days: Optional[int] = None, today: Optional[str] = None
+                  ) -> Tuple[str, int, List[Tuple[str, str, str, float]], List[Tuple[str, str, str, float]]]:
+    """
+    期限切れ・期限間近のロット（数量 > 0 のみ、賞味期限順）。
+    today: 基準日（省略時は今日）、days: 期限間近とみなす日数（省略時は設定値）。賞味期限が today から days 日後までを期限間近とする。
+    戻り値: (基準日, 日数, 期限切れ [(product_code, exp_date, in_date, qty), ...], 期限間近 [...])
+    """
+    today, days = expiry_basis(days, today)
+    index = expiry_index()
+    return today, days, index.before(today), index.between(today, add_days(today, days))
+
+def ledger() -> MovementLedger:
+    current_site()
+    return MovementLedger(LEDGER_DIR)
+
+@instrumented("inventory.archive_ledger")
+def archive_ledger(current_month: Optional[str] = None) -> List[str]:
+    """今月（current_month: YYYY-MM）より前の移動を台帳へ退避する。戻り値: 退避した月"""
+    try:
+        return ledger().archive(get_store(), current_month or datetime.now(JST).strftime("%Y-%m"))
+    except Exception:
+        _reset_store()
+        raise
+
+@instrumented("inventory.stock_at", rows=len)
+def stock_at(day: str) -> pd.DataFrame:
+    """day（YYYY/MM/DD・YYYY-MM-DD）の終わり時点の在庫（product_code, exp_date, qty）"""
+    try:
+        return ledger().stock_at(get_store(), _fmt_date(day))
+    except Exception:
+        _reset_store()
+        raise
+
+@instrumented("inventory.movement_history", rows=len)
+def movement_history(start: str, end: str) -> pd.DataFrame:
+    """start〜end（両端を含む）の移動と出庫の引当の内訳"""
+    try:
+        return ledger().history(get_store(), _fmt_date(start), _fmt_date(end))
+    except Exception:
+        _reset_store()
+        raise
+
+@instrumented("inventory.inbound", rows=_table_rows, ok=_ok)
+def inbound(product_code: str, exp_date: str, in_date: str, qty: float, table: bool = True
+            ) -> Tuple[bool, str, Optional[pd.DataFrame]]:
     """入庫：同一(product, exp)があるなら加算。in_dateは最新に更新（戻しは別関数）。"""
     try:
         qty = float(qty)
         if qty <= 0:
-            return False, "数量は正の数で入力してください。", load_inventory()
+            return False, "数量は正の数で入力してください。", _table(None, table)
         exp_norm = _fmt_date(exp_date)
         in_norm = _fmt_date(in_date)
-        df = load_inventory()
-
-        # 既存候補（product+exp）
-        mask = (df["product_code"]==product_code) & (df["exp_date"]==exp_norm)
-        if mask.any():
-            # 同日行があれば加算、なければ代表行に加算して in_date を最新へ更新
-            sub = df[mask]
-            same_day = sub["in_date"] == in_norm
-            idxs = sub[same_day].index.tolist()
-            if idxs:
-                i = idxs[0]
-                df.at[i,"qty"] = float(df.at[i,"qty"]) + qty
-                df.at[i,"updated_at"] = _now_str()
-            else:
-                # 代表行（qty>0の行優先、無ければ最初）
-                rep_idx = sub[sub["qty"]>0].index.tolist() or sub.index.tolist()
-                i = rep_idx[0]
-                df.at[i,"qty"] = float(df.at[i,"qty"]) + qty
-                # 最新入庫日へ更新
-                cur_in = df.at[i,"in_date"]
-                df.at[i,"in_date"] = max(cur_in, in_norm)
-                df.at[i,"updated_at"] = _now_str()
-        else:
-            # 新規行
-            new = {
-                "product_code": product_code,
-                "exp_date": exp_norm,
-                "in_date": in_norm,
-                "qty": qty,
-                "updated_at": _now_str()
-            }
-            df = pd.concat([df, pd.DataFrame([new])], ignore_index=True)
-
-        save_inventory(df)
-        return True, "入庫を反映しました。", df.sort_values(["product_code","exp_date","in_date"]).reset_index(drop=True)
+        store = get_store()
+        store.inbound(product_code, exp_norm, in_norm, qty, _now_str())
+        return True, "入庫を反映しました。", _table(store, table)
     except Exception as e:
-        return False, f"入庫エラー: {e}", load_inventory()
+        _reset_store()
+        return False, f"入庫エラー: {_err_text(e)}", _inventory_or_empty() if table else None
 
-def outbound(product_code: str, exp_date: str, qty: float) -> Tuple[bool, str, pd.DataFrame]:
-    """出庫：FIFO（in_date昇順）。不足ならエラー。"""
+@instrumented("inventory.outbound", rows=_table_rows, ok=_ok)
+def outbound(product_code: str, exp_date: str, qty: float, policy: str = FIFO, table: bool = True
+             ) -> Tuple[bool, str, Optional[pd.DataFrame]]:
+    """出庫：FIFO（in_date昇順）。policy=FEFO なら exp_date を問わず賞味期限の早い順。不足ならエラー。"""
     try:
         qty = float(qty)
         if qty <= 0:
-            return False, "数量は正の数で入力してください。", load_inventory()
-        exp_norm = _fmt_date(exp_date)
-        df = load_inventory()
-        mask = (df["product_code"]==product_code) & (df["exp_date"]==exp_norm) & (df["qty"]>0)
-        sub = df[mask].sort_values("in_date")
-        total = float(sub["qty"].sum())
-        if total < qty:
-            return False, f"在庫不足：必要 {qty}、在庫 {total}", df
-
-        remain = qty
-        for i, row in sub.iterrows():
-            have = float(row["qty"])
-            if have >= remain:
-                df.at[i,"qty"] = have - remain
-                df.at[i,"updated_at"] = _now_str()
-                remain = 0.0
-                break
-            else:
-                df.at[i,"qty"] = 0.0
-                df.at[i,"updated_at"] = _now_str()
-                remain -= have
-
-        save_inventory(df)
-        return True, "出庫を反映しました。", df.sort_values(["product_code","exp_date","in_date"]).reset_index(drop=True)
+            return False, "数量は正の数で入力してください。", _table(None, table)
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        exp_norm = _fmt_date(exp_date) if policy == FIFO else ""
+        store = get_store()
+        ok, total, _ = store.outbound_many([(product_code, exp_norm, qty)], _now_str(), policy)[0]
+        if not ok:
+            return False, f"在庫不足：必要 {qty}、在庫 {total}", store.frame().copy() if table else None
+        return True, "出庫を反映しました。", _table(store, table)
     except Exception as e:
-        return False, f"出庫エラー: {e}", load_inventory()
+        _reset_store()
+        return False, f"出庫エラー: {_err_text(e)}", _inventory_or_empty() if table else None
 
-def return_in(product_code: str, exp_date: str, in_date: str, qty: float) -> Tuple[bool, str, pd.DataFrame]:
+@instrumented("inventory.return_in", rows=_table_rows, ok=_ok)
+def return_in(product_code: str, exp_date: str, in_date: str, qty: float, table: bool = True
+              ) -> Tuple[bool, str, Optional[pd.DataFrame]]:
     """戻し：数量加算。ただし in_date は更新しない（指定日付を保持）。"""
     try:
         qty = float(qty)
         if qty <= 0:
-            return False, "数量は正の数で入力してください。", load_inventory()
+            return False, "数量は正の数で入力してください。", _table(None, table)
         exp_norm = _fmt_date(exp_date)
         in_norm = _fmt_date(in_date)
-        df = load_inventory()
-        mask = (df["product_code"]==product_code) & (df["exp_date"]==exp_norm) & (df["in_date"]==in_norm)
-        if mask.any():
-            i = df[mask].index[0]
-            df.at[i,"qty"] = float(df.at[i,"qty"]) + qty
-            df.at[i,"updated_at"] = _now_str()
-        else:
-            new = {
-                "product_code": product_code,
-                "exp_date": exp_norm,
-                "in_date": in_norm,
-                "qty": qty,
-                "updated_at": _now_str()
-            }
-            df = pd.concat([df, pd.DataFrame([new])], ignore_index=True)
-
-        save_inventory(df)
-        return True, "戻しを反映しました。", df.sort_values(["product_code","exp_date","in_date"]).reset_index(drop=True)
+        store = get_store()
+        store.return_in(product_code, exp_norm, in_norm, qty, _now_str())
+        return True, "戻しを反映しました。", _table(store, table)
     except Exception as e:
-        return False, f"戻しエラー: {e}", load_inventory()
+        _reset_store()
+        return False, f"戻しエラー: {_err_text(e)}", _inventory_or_empty() if table else None
+
+@instrumented("inventory.apply_movements", rows=lambda res: len(res[2]), ok=_ok)
+def apply_movements(moves: pd.DataFrame, policy: str = FIFO, table: bool = True
+                    ) -> Tuple[bool, str, pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    移動の一括反映（列: op, product_code, exp_date, in_date, qty）。
+    - 数量・日付の検証は列単位でまとめて行う
+    - 入庫・戻しは (区分, product, exp, in_date) ごとに groupby で合算してから反映
+    - 出庫はその後、ファイル順に fifo.allocate でまとめて引き当てる（policy=FEFO も可）
+    - 永続化は最後に1回だけ
+    戻り値: (全行成功か, 概要メッセージ, 行ごとの結果, 在庫表（table=False なら None）)
+    メッセージは1件ずつの inbound / outbound / return_in と同じ文言を使う。
+    """
+    df = moves.reindex(columns=MOVEMENT_COLUMNS).reset_index(drop=True)
+    op = df["op"].fillna("").astype(str).str.strip().str.lower().map(OP_ALIASES)
+    code = df["product_code"].fillna("").astype(str).str.strip()
+    qty = pd.to_numeric(df["qty"], errors="coerce")
+    exp, exp_err = _fmt_dates(df["exp_date"])
+    ind, in_err = _fmt_dates(df["in_date"])
+    label = op.map(OP_LABELS).fillna("")
+
+    # 1件ずつの経路と同じ順で判定（最初に当たったものを採用）
+    msg = pd.Series(np.select(
+        [op.isna(),
+         code == "",
+         qty.isna(),
+         qty <= 0,
+         (exp_err != "") & ~((op == "outbound") & (policy == FEFO)),
+         (op != "outbound") & (in_err != "")],
+        ["不明な区分です: " + df["op"].fillna("").astype(str),
+         "製品コードを選択してください。",
+         "数量は数値で入力してください。",
+         "数量は正の数で入力してください。",
+         label + "エラー: " + exp_err,
+         label + "エラー: " + in_err],
+        default=""), index=df.index, dtype=object)
+    ok = pd.Series(False, index=df.index)
+
+    work = pd.DataFrame({"op": op, "product_code": code, "exp_date": exp, "in_date": ind, "qty": qty})[msg == ""]
+    store = get_store()
+    now = _now_str()
+    try:
+        with store.batch():
+            adds = work[work["op"] != "outbound"]
+            for (o, c, e, i), g in adds.groupby(["op","product_code","exp_date","in_date"], sort=False):
+                q = float(g["qty"].sum())
+                if o == "inbound":
+                    store.inbound(c, e, i, q, now)
+                else:
+                    store.return_in(c, e, i, q, now)
+                msg[g.index] = "入庫を反映しました。" if o == "inbound" else "戻しを反映しました。"
+                ok[g.index] = True
+            outs = work[work["op"] == "outbound"]
+            requests = list(zip(outs["product_code"], outs["exp_date"], outs["qty"].astype(float)))
+            results = store.outbound_many(requests, now, policy)
+            for idx, (_, _, q), (good, total, _) in zip(outs.index, requests, results):
+                msg[idx] = "出庫を反映しました。" if good else f"在庫不足：必要 {q}、在庫 {total}"
+                ok[idx] = good
+    except Exception as e:
+        _reset_store()
+        msg[work.index] = f"取込エラー: {_err_text(e)}"
+        ok[:] = False
+
+    report = pd.DataFrame({
+        "line": np.arange(1, len(df) + 1), "op": df["op"], "product_code": code,
+        "exp_date": exp, "in_date": ind, "qty": qty, "ok": ok, "message": msg,
+    })
+    n_ok = int(ok.sum())
+    summary = f"一括取込 {len(df)}行：成功 {n_ok}行、エラー {len(df) - n_ok}行"
+    return n_ok == len(df), summary, report, _table(store, table)
@@ -0,0 +1,69 @@
+from typing import Any, Dict
+import numpy as np
+import pandas as pd
+from .inventory_engine import INV_COLUMNS
+
+# inventory.csv を読むときの列の型（型の推測をさせない。数量は読んだあと数値へ変換する）
+CSV_DTYPES: Dict[str, Any] = {"product_code": str, "exp_date": str, "in_date": str, "updated_at": str}
+
+# 集計用の型つき在庫表の列の型
+TYPED_DTYPES: Dict[str, str] = {
+    "product_code": "category",        # 製品数は行数よりずっと少ない
+    "exp_date": "datetime64[s]",       # 日付として比較・並べ替え（無効・空は NaT）
+    "in_date": "datetime64[s]",
+    "qty": "float64",                  # 小数の数量の加減算を保存先と同じ精度で行う
+    "updated_at": "datetime64[s]",
+}
+
+DATE_FMT = "%Y/%m/%d"
+TS_FMT = "%Y-%m-%d %H:%M:%S"
+DATE_COLUMNS = ["exp_date", "in_date"]
+
+def parse_days(values: pd.Series, fmt: str = DATE_FMT) -> pd.Series:
+    """
+    YYYY/MM/DD（fmt）の列 → datetime64[s]。空・形式外は NaT。
+    日付の種類は行数よりずっと少ないので、異なる値だけを変換して行へ戻す。
+    """
+    cat = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    codes = cat.cat.codes.to_numpy()
+    days = pd.to_datetime(pd.Series(cat.cat.categories.astype(str)), format=fmt, errors="coerce")
+    # 末尾の NaT は欠損（code = -1）の行の分
+    table = np.append(days.to_numpy(dtype="datetime64[s]"), np.datetime64("NaT", "s"))
+    return pd.Series(table[codes], index=values.index, name=values.name)
+
+def format_days(values: pd.Series, fmt: str = DATE_FMT) -> pd.Series:
+    """datetime64 の列 → YYYY/MM/DD（fmt）の文字列。NaT は ""。異なる値だけを書式化して行へ戻す。"""
+    codes, uniques = pd.factorize(values)
+    table = np.append(pd.DatetimeIndex(uniques).strftime(fmt).to_numpy(dtype=object), "")
+    return pd.Series(table[codes], index=values.index, name=values.name, dtype=object)
+
+def to_typed(df: pd.DataFrame) -> pd.DataFrame:
+    """文字列の在庫表（INV_COLUMNS）→ 型つきの在庫表（TYPED_DTYPES）"""
+    df = df.reindex(columns=INV_COLUMNS)
+    code = df["product_code"]
+    if not isinstance(code.dtype, pd.CategoricalDtype):
+        code = code.fillna("").astype("category")
+    if not code.cat.categories.is_monotonic_increasing:
+        # 渡された category の順が文字列の順と違う場合。並べ替え・groupby を文字列の順と揃える
+        code = code.cat.reorder_categories(code.cat.categories.sort_values())
+    return pd.DataFrame({
+        "product_code": code,
+        "exp_date": parse_days(df["exp_date"]),
+        "in_date": parse_days(df["in_date"]),
+        "qty": pd.to_numeric(df["qty"], errors="coerce").fillna(0.0).astype("float64"),
+        "updated_at": pd.to_datetime(df["updated_at"], format=TS_FMT, errors="coerce").astype("datetime64[s]"),
+    }, index=df.index)
+
+def from_typed(df: pd.DataFrame) -> pd.DataFrame:
+    """型つきの在庫表 → 保存・画面用の文字列の在庫表（to_typed の逆）"""
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            out[col] = format_days(df[col])
+        elif col == "updated_at":
+            out[col] = format_days(df[col], TS_FMT)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            out[col] = df[col].astype(object)
+        else:
+            out[col] = df[col]
+    return out
@@ -0,0 +1,304 @@
+
+import json, sqlite3, threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .inventory_engine import INV_COLUMNS
+from .inventory_store import InventoryStore, MOVEMENT_LOG_COLUMNS, file_stamp, read_product_master_csv, split_by_exp
+from .fifo import allocate, FIFO, FEFO
+from .durability import apply_sqlite_durability
+from .locking import LOCK_TIMEOUT, storage_lock
+from .logging_conf import get_logger
+
+LOGGER = get_logger(__name__)
+
+# 変更記録（inventory_changes）の整理：この件数ごとに、直近 CHANGES_KEEP 件より古いものを消す
+CHANGES_PRUNE_EVERY = 1000
+CHANGES_KEEP = 20000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    rid          INTEGER PRIMARY KEY AUTOINCREMENT,  -- CSV時代の行順を保つ
+    product_code TEXT NOT NULL,
+    exp_date     TEXT NOT NULL,
+    in_date      TEXT NOT NULL,
+    qty          REAL NOT NULL DEFAULT 0,
+    updated_at   TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS ix_inventory_lot ON inventory(product_code, exp_date, in_date);
+CREATE INDEX IF NOT EXISTS ix_inventory_exp ON inventory(exp_date);
+CREATE TABLE IF NOT EXISTS movements (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts           TEXT NOT NULL,
+    op           TEXT NOT NULL,
+    product_code TEXT NOT NULL,
+    exp_date     TEXT NOT NULL,
+    in_date      TEXT NOT NULL,
+    qty          REAL NOT NULL,
+    alloc        TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+-- 画面の差分更新用：在庫の行が変わるたびに rid を記録する（他端末の更新も拾える）
+CREATE TABLE IF NOT EXISTS inventory_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    rid INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS tr_inventory_insert AFTER INSERT ON inventory
+BEGIN INSERT INTO inventory_changes(rid) VALUES (NEW.rid); END;
+CREATE TRIGGER IF NOT EXISTS tr_inventory_update AFTER UPDATE ON inventory
+BEGIN INSERT INTO inventory_changes(rid) VALUES (NEW.rid); END;
+CREATE TRIGGER IF NOT EXISTS tr_inventory_delete AFTER DELETE ON inventory
+BEGIN INSERT INTO inventory_changes(rid) VALUES (OLD.rid); END;
+"""
+
+class SqliteInventoryStore(InventoryStore):
+    """
+    組み込み SQLite の保存先。1移動 = 1トランザクション（BEGIN IMMEDIATE、複数端末の書き込みは直列化される）。
+    (product_code, exp_date, in_date) と exp_date に索引を張り、FIFO 引当は索引順の1クエリで取得する。
+    製品マスタは DB へ写さず、全拠点共通の product_master.csv を CSV の保存先と同じく直接読む。
+    接続はスレッド間で共有するので、参照も更新も _tlock を取ってから使う。
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path: str, product_master_path: str, enc: str) -> None:
+        self.db_path = db_path
+        self.product_master_path = product_master_path
+        self.enc = enc
+        self.conn = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT, isolation_level=None, check_same_thread=False)
+        # 共有フォルダ上では WAL（共有メモリ前提）が使えないため従来のロールバックジャーナルを使う
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        apply_sqlite_durability(self.conn)
+        self.conn.executescript(SCHEMA)
+        self._depth = 0
+        # SMB 等では SQLite 自身のロックが当てにならないことがあるので、書き込みは外側でも排他する
+        self._lock = storage_lock(db_path)
+        self._tlock = threading.RLock()   # 接続はスレッド間で共有するので入れ子判定もスレッド単位で守る
+
+    def _tx(self):
+        return _Transaction(self)
+
+    @contextmanager
+    def batch(self):
+        """ブロック全体を1トランザクションにまとめる（内側の _tx は入れ子として扱う）。"""
+        with self._tx():
+            yield
+
+    # --- 参照 ---
+    def frame(self) -> pd.DataFrame:
+        return self._query("SELECT product_code, exp_date, in_date, qty, updated_at FROM inventory ORDER BY rid")
+
+    def sorted_frame(self) -> pd.DataFrame:
+        return self._query("SELECT product_code, exp_date, in_date, qty, updated_at FROM inventory "
+                           "ORDER BY product_code, exp_date, in_date")
+
+    def _query(self, sql: str) -> pd.DataFrame:
+        with self._tlock:
+            df = pd.read_sql_query(sql, self.conn)
+        df["qty"] = df["qty"].astype(float)
+        return df.reindex(columns=INV_COLUMNS)
+
+    def product_master(self) -> pd.DataFrame:
+        return read_product_master_csv(self.product_master_path, self.enc)
+
+    def changes(self, token: Any = None) -> Tuple[Any, bool, List[Tuple[int, Optional[list]]]]:
+        """token は inventory_changes の seq。整理済みの範囲より古ければ全件。"""
+        with self._tlock:
+            cur = self.conn.cursor()
+            last = cur.execute("SELECT COALESCE(MAX(seq), 0) FROM inventory_changes").fetchone()[0]
+            floor = int(self.get_meta("changes_pruned") or 0)
+            if token is None or token < floor or token > last:
+                rows = cur.execute("SELECT rid, product_code, exp_date, in_date, qty, updated_at FROM inventory "
+                                   "ORDER BY rid").fetchall()
+                return last, True, [(r[0], [r[1], r[2], r[3], float(r[4]), r[5]]) for r in rows]
+            rids = [r[0] for r in cur.execute(
+                "SELECT DISTINCT rid FROM inventory_changes WHERE seq > ? AND seq <= ? ORDER BY rid", (token, last))]
+            found = {}
+            for i in range(0, len(rids), 500):
+                chunk = rids[i:i + 500]
+                for r in cur.execute("SELECT rid, product_code, exp_date, in_date, qty, updated_at FROM inventory "
+                                     f"WHERE rid IN ({','.join('?' * len(chunk))})", chunk):
+                    found[r[0]] = [r[1], r[2], r[3], float(r[4]), r[5]]
+            return last, False, [(rid, found.get(rid)) for rid in rids]
+
+    def _prune_changes(self, cur, keep: int = CHANGES_KEEP) -> None:
+        """古い変更記録を消し、消した位置を meta に残す（それより古い token は全件読み直しになる）。"""
+        last = cur.execute("SELECT COALESCE(MAX(seq), 0) FROM inventory_changes").fetchone()[0]
+        floor = max(last - keep, 0)
+        cur.execute("DELETE FROM inventory_changes WHERE seq <= ?", (floor,))
+        cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('changes_pruned', ?)", (str(floor),))
+
+    def movements(self, after_seq: int = 0) -> pd.DataFrame:
+        with self._tlock:
+            df = pd.read_sql_query("SELECT seq, ts, op, product_code, exp_date, in_date, qty, alloc FROM movements "
+                                   "WHERE seq > ? ORDER BY seq", self.conn, params=(int(after_seq),))
+        df["qty"] = df["qty"].astype(float)
+        return df.reindex(columns=MOVEMENT_LOG_COLUMNS)
+
+    def product_master_stamp(self):
+        return file_stamp(self.product_master_path)
+
+    def available(self, product_code: str, exp_date: str) -> float:
+        with self._tlock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(qty), 0) FROM inventory WHERE product_code=? AND exp_date=? AND qty>0",
+                (product_code, exp_date)).fetchone()
+        return float(row[0])
+
+    def is_empty(self) -> bool:
+        with self._tlock:
+            return self.conn.execute("SELECT 1 FROM inventory LIMIT 1").fetchone() is None
+
+    # --- 更新 ---
+    def inbound(self, product_code: str, exp_date: str, in_date: str, qty: float, now: str) -> None:
+        """入庫：同一(product, exp)があるなら加算。in_dateは最新に更新。"""
+        with self._tx() as cur:
+            rows = cur.execute(
+                "SELECT rid, in_date, qty FROM inventory WHERE product_code=? AND exp_date=? ORDER BY rid",
+                (product_code, exp_date)).fetchall()
+            if not rows:
+                cur.execute("INSERT INTO inventory(product_code, exp_date, in_date, qty, updated_at) VALUES (?,?,?,?,?)",
+                            (product_code, exp_date, in_date, qty, now))
+            else:
+                same_day = [r for r in rows if r[1] == in_date]
+                # 同日行があれば加算、なければ代表行（qty>0の行優先、無ければ最初）
+                rid, cur_in, _ = (same_day or [r for r in rows if r[2] > 0] or rows)[0]
+                cur.execute("UPDATE inventory SET qty=qty+?, in_date=?, updated_at=? WHERE rid=?",
+                            (qty, max(cur_in, in_date), now, rid))
+            self._log(cur, "inbound", now, product_code, exp_date, in_date, qty)
+
+    def outbound_many(self, requests: List[Tuple[str, str, float]], now: str, policy: str = FIFO
+                      ) -> List[Tuple[bool, float, List[Tuple[str, str, float]]]]:
+        """
+        出庫：対象製品のロットを ix_inventory_lot 順の1クエリで取得し、fifo.allocate でまとめて引き当てる。
+        """
+        group_of: Dict[tuple, int] = {}
+        req_group = [group_of.setdefault((c,) if policy == FEFO else (c, e), len(group_of)) for c, e, _ in requests]
+        with self._tx() as cur:
+            codes = sorted({c for c, _, _ in requests})
+            lots = []
+            for i in range(0, len(codes), 500):
+                chunk = codes[i:i + 500]
+                lots += cur.execute(
+                    "SELECT rid, product_code, exp_date, in_date, qty FROM inventory "
+                    f"WHERE product_code IN ({','.join('?' * len(chunk))}) AND qty>0 "
+                    "ORDER BY product_code, exp_date, in_date, rid", chunk).fetchall()
+            keyed = []
+            for rid, code, exp, ind, qty in lots:
+                g = group_of.get((code,) if policy == FEFO else (code, exp))
+                if g is not None:
+                    keyed.append((g, rid, exp, ind, float(qty)))
+            keyed.sort(key=lambda r: r[0])   # 安定ソート：グループ内は索引順のまま
+            ok, avail, new_qty, a_req, a_lot, a_take = allocate(
+                np.fromiter((r[0] for r in keyed), dtype=np.int64, count=len(keyed)),
+                np.fromiter((r[4] for r in keyed), dtype=float, count=len(keyed)),
+                np.asarray(req_group, dtype=np.int64),
+                np.fromiter((q for _, _, q in requests), dtype=float, count=len(requests)))
+
+            results = [(bool(ok[i]), float(avail[i]), []) for i in range(len(requests))]
+            updates = []
+            for i, li, take in zip(a_req.tolist(), a_lot.tolist(), a_take.tolist()):
+                _, rid, exp, ind, _ = keyed[li]
+                updates.append((float(new_qty[li]), now, rid))
+                results[i][2].append((exp, ind, take))
+            cur.executemany("UPDATE inventory SET qty=?, updated_at=? WHERE rid=?", updates)
+            for (code, _, qty), (good, _, alloc) in zip(requests, results):
+                if good:
+                    per_exp = split_by_exp(alloc)
+                    for exp, taken in per_exp:
+                        q = qty if len(per_exp) == 1 else sum(t for _, t in taken)
+                        self._log(cur, "outbound", now, code, exp, "", q, [list(a) for a in taken])
+        return results
+
+    def return_in(self, product_code: str, exp_date: str, in_date: str, qty: float, now: str) -> None:
+        """戻し：数量加算。in_date は指定日付を保持（無ければ新規行）。"""
+        with self._tx() as cur:
+            row = cur.execute(
+                "SELECT rid FROM inventory WHERE product_code=? AND exp_date=? AND in_date=? ORDER BY rid LIMIT 1",
+                (product_code, exp_date, in_date)).fetchone()
+            if row:
+                cur.execute("UPDATE inventory SET qty=qty+?, updated_at=? WHERE rid=?", (qty, now, row[0]))
+            else:
+                cur.execute("INSERT INTO inventory(product_code, exp_date, in_date, qty, updated_at) VALUES (?,?,?,?,?)",
+                            (product_code, exp_date, in_date, qty, now))
+            self._log(cur, "return_in", now, product_code, exp_date, in_date, qty)
+
+    def _log(self, cur, op, ts, product_code, exp_date, in_date, qty, alloc=None) -> None:
+        cur.execute("INSERT INTO movements(ts, op, product_code, exp_date, in_date, qty, alloc) VALUES (?,?,?,?,?,?,?)",
+                    (ts, op, product_code, exp_date, in_date, qty,
+                     json.dumps(alloc, ensure_ascii=False) if alloc is not None else None))
+        if cur.lastrowid % CHANGES_PRUNE_EVERY == 0:
+            self._prune_changes(cur)
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        df = df.reindex(columns=INV_COLUMNS)
+        with self._tx() as cur:
+            cur.execute("DELETE FROM inventory")
+            cur.executemany("INSERT INTO inventory(product_code, exp_date, in_date, qty, updated_at) VALUES (?,?,?,?,?)",
+                            _records(df))
+            self._prune_changes(cur, keep=0)
+
+    def get_meta(self, key: str):
+        with self._tlock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._tlock:
+            self.conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?,?)", (key, value))
+
+def _records(df: pd.DataFrame):
+    for code, exp, ind, qty, upd in df.itertuples(index=False, name=None):
+        yield (str(code), str(exp), str(ind), float(qty or 0.0), "" if pd.isna(upd) else str(upd))
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT / ROLLBACK（入れ子の場合は最外側だけが確定・取消を行う）"""
+
+    def __init__(self, store: SqliteInventoryStore) -> None:
+        self.store = store
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.store._tlock.acquire()
+        try:
+            if self.store._depth == 0:
+                self.store._lock.acquire()
+                try:
+                    self.store.conn.execute("BEGIN IMMEDIATE")
+                except BaseException:
+                    self.store._lock.release()
+                    raise
+        except BaseException:
+            self.store._tlock.release()
+            raise
+        self.store._depth += 1
+        return self.store.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            self.store._depth -= 1
+            if self.store._depth == 0:
+                try:
+                    self.store.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+                finally:
+                    self.store._lock.release()
+        finally:
+            self.store._tlock.release()
+        return False
+
+def migrate_from_csv(store: SqliteInventoryStore, source: InventoryStore) -> bool:
+    """
+    既存の CSV 在庫（スナップショット + ジャーナル）を取り込む。一度だけ実行される。
+    製品マスタは取り込まない（SQLite でも共通の product_master.csv を読むので、後の編集もそのまま反映される）。
+    戻り値: 取り込みを実行したら True
+    """
+    if store.get_meta("migrated_from") is not None:
+        return False
+    inv = source.frame()
+    if store.is_empty():
+        store.replace_all(inv)
+    store.set_meta("migrated_from", source.name)
+    LOGGER.info(f"Migrated {len(inv)} inventory rows into {store.db_path}")
+    return True
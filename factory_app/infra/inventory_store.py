@@ -0,0 +1,365 @@
+
+import os, json, hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from .inventory_engine import InventoryEngine, INV_COLUMNS
+from .inventory_schema import CSV_DTYPES, to_typed
+from .fifo import FIFO
+from .inventory_journal import InventoryJournal
+from .durability import fsync_dir
+from .locking import storage_lock
+from .logging_conf import get_logger, add_io
+
+LOGGER = get_logger(__name__)
+
+PM_COLUMNS = ["product_code","product_name"]
+# 移動の履歴（ジャーナル・movements テーブル）の列。alloc は出庫の引当 [[in_date, 数量], ...] の JSON（他は空）
+MOVEMENT_LOG_COLUMNS = ["seq","ts","op","product_code","exp_date","in_date","qty","alloc"]
+
+class InventoryStore:
+    """
+    在庫の保存先インターフェース。inventory_repo はこの API だけを使う。
+    日付は正規化済み（YYYY/MM/DD）、数量は検証済みの正の数で渡される前提。
+    """
+    name = "base"
+
+    def frame(self) -> pd.DataFrame:
+        """保存順の在庫表"""
+        raise NotImplementedError
+
+    def sorted_frame(self) -> pd.DataFrame:
+        """(product_code, exp_date, in_date) 順の在庫表"""
+        raise NotImplementedError
+
+    def typed_frame(self) -> pd.DataFrame:
+        """集計用の型つき在庫表（保存順、列の型は inventory_schema.TYPED_DTYPES）。呼ぶたびに frame から作る"""
+        return to_typed(self.frame())
+
+    def product_master(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def changes(self, token: Any = None) -> Tuple[Any, bool, List[Tuple[int, Optional[list]]]]:
+        """
+        画面の差分更新用。token（前回の戻り値）以降に変わった行を返す。
+        戻り値: (新しい token, 全件か, [(rid, [product_code, exp_date, in_date, qty, updated_at] または削除なら None), ...])
+        差分を追えない実装・token が古すぎる場合は全件（rid は保存順の行番号）。
+        """
+        rows = self.frame().reindex(columns=INV_COLUMNS).itertuples(index=False, name=None)
+        return None, True, [(rid, list(row)) for rid, row in enumerate(rows)]
+
+    def movements(self, after_seq: int = 0) -> pd.DataFrame:
+        """seq が after_seq より後の移動の履歴（MOVEMENT_LOG_COLUMNS、seq 順）。履歴を持たない実装は空。"""
+        return pd.DataFrame(columns=MOVEMENT_LOG_COLUMNS)
+
+    def product_master_stamp(self) -> Any:
+        """製品マスタの版（変わったら別の値）。判定できない実装は None（毎回読み直す）。"""
+        return None
+
+    def available(self, product_code: str, exp_date: str) -> float:
+        raise NotImplementedError
+
+    def inbound(self, product_code: str, exp_date: str, in_date: str, qty: float, now: str) -> None:
+        raise NotImplementedError
+
+    def outbound(self, product_code: str, exp_date: str, qty: float, now: str) -> List[Tuple[str, float]]:
+        """FIFO 出庫（在庫が足りることは呼び出し側で確認済み）。戻り値: [(in_date, 引当数量), ...]"""
+        _, _, alloc = self.outbound_many([(product_code, exp_date, qty)], now)[0]
+        return [(ind, take) for _, ind, take in alloc]
+
+    def outbound_many(self, requests: List[Tuple[str, str, float]], now: str, policy: str = FIFO
+                      ) -> List[Tuple[bool, float, List[Tuple[str, str, float]]]]:
+        """
+        複数の出庫要求を要求順に引き当てる。在庫不足の要求は反映しない。
+        戻り値: 要求ごとの (成功, 要求時点の在庫, [(exp_date, in_date, 引当数量), ...])
+        """
+        raise NotImplementedError
+
+    def return_in(self, product_code: str, exp_date: str, in_date: str, qty: float, now: str) -> None:
+        raise NotImplementedError
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        """在庫表をまるごと置き換える"""
+        raise NotImplementedError
+
+    @contextmanager
+    def batch(self):
+        """
+        ブロック内の移動をまとめて1回で永続化する。
+        途中で例外が出た場合はブロック内の移動をすべて取り消す。
+        """
+        yield
+
+    def compact(self) -> None:
+        """保存領域の整理（必要な実装のみ）"""
+
+    def reset(self) -> None:
+        """途中で失敗した場合に呼ばれる。キャッシュを持つ実装は破棄する。"""
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _fsync_write(path: str, text: str, encoding: str) -> None:
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        add_io(written=f.tell())
+
+def read_inventory_csv(path: str, enc: str) -> pd.DataFrame:
+    """inventory.csv を読む（ジャーナルは反映しないので、畳み込み済みのスナップショットを読む場合に使う）。"""
+    add_io(read=os.path.getsize(path))
+    df = pd.read_csv(path, encoding=enc, dtype=CSV_DTYPES, keep_default_na=False, float_precision="round_trip")
+    if len(df.columns) != len(INV_COLUMNS):
+        # try to coerce columns (for older files)
+        LOGGER.warning(f"Unexpected columns {list(df.columns)} in {path}; coerced to {INV_COLUMNS}")
+        df = df.reindex(columns=INV_COLUMNS, fill_value="")
+    df["qty"] = pd.to_numeric(df["qty"], errors="coerce").fillna(0.0).astype(float)
+    return df
+
+def read_product_master_csv(path: str, enc: str) -> pd.DataFrame:
+    add_io(read=os.path.getsize(path))
+    df = pd.read_csv(path, encoding=enc, dtype=str, keep_default_na=False)
+    if len(df.columns) != len(PM_COLUMNS):
+        df = df.reindex(columns=PM_COLUMNS, fill_value="")
+    return df
+
+def split_by_exp(alloc: List[Tuple[str, str, float]]) -> List[Tuple[str, List[Tuple[str, float]]]]:
+    """[(exp, in_date, 数量), ...] を賞味期限ごとの [(in_date, 数量), ...] に分ける（記録は期限単位）。"""
+    out: List[Tuple[str, List[Tuple[str, float]]]] = []
+    for exp, ind, take in alloc:
+        if not out or out[-1][0] != exp:
+            out.append((exp, []))
+        out[-1][1].append((ind, take))
+    return out
+
+class CsvInventoryStore(InventoryStore):
+    """
+    CSV 形式の保存先。
+    inventory.csv をスナップショット、inventory_journal.jsonl を追記専用の移動ジャーナルとして扱い、
+    メモリ上の InventoryEngine に対して移動を適用する。
+    更新はプロセス間ロック下で「他端末の追記分を取り込む → 反映 → 追記」の順に行うため、
+    ジャーナルの seq がそのまま版番号になり、同時更新でも取りこぼしは起きない。
+    """
+    name = "csv"
+
+    def __init__(self, csv_path: str, product_master_path: str, journal_path: str, meta_path: str,
+                 archive_dir: str, enc: str, compact_every: int = 1000) -> None:
+        self.csv_path = csv_path
+        self.product_master_path = product_master_path
+        self.journal_path = journal_path
+        self.meta_path = meta_path
+        self.archive_dir = archive_dir
+        self.enc = enc
+        self.compact_every = compact_every
+        self._engine: Optional[InventoryEngine] = None
+        self._journal: Optional[InventoryJournal] = None
+        self._csv_stamp: Optional[tuple] = None
+        self._journal_stamp: Optional[tuple] = None
+        self._batch: Optional[List[tuple]] = None
+        # 複数端末から同じ storage を使うためのプロセス間ロック
+        self._lock = storage_lock(csv_path)
+
+    # --- 読み込み ---
+    def engine(self) -> InventoryEngine:
+        """
+        常駐の在庫エンジンを返す（ロック下で最新化する）。
+        - スナップショットが差し替わっていれば（初回・他端末の畳み込み等）全体を読み直す
+        - ジャーナルだけ伸びていれば、他端末が追記した分だけをリプレイする
+        """
+        with self._lock:
+            csv_stamp = file_stamp(self.csv_path)
+            if self._engine is None or csv_stamp != self._csv_stamp:
+                meta = self._read_meta()
+                self._engine = InventoryEngine.from_frame(read_inventory_csv(self.csv_path, self.enc))
+                self._journal = InventoryJournal(self.journal_path, start_seq=int(meta.get("seq", 0)))
+                self._replay()
+            elif file_stamp(self.journal_path) != self._journal_stamp:
+                self._replay()
+            self._csv_stamp, self._journal_stamp = csv_stamp, file_stamp(self.journal_path)
+            return self._engine
+
+    def _replay(self) -> None:
+        n = 0
+        for rec in self._journal.read_new():
+            self._engine.apply(rec["op"], rec["product_code"], rec["exp_date"], rec["in_date"], float(rec["qty"]),
+                               rec["ts"], rec.get("alloc"))
+            n += 1
+        if n:
+            LOGGER.info(f"Replayed {n} journal records (seq={self._journal.last_seq})")
+
+    def _read_meta(self) -> Dict[str, Any]:
+        """
+        スナップショットが何番の seq まで畳み込み済みかを返す。
+        スナップショット差し替え直後に落ちた場合は、未確定メタ(.tmp)のハッシュが一致すれば昇格する。
+        """
+        meta: Dict[str, Any] = {"seq": 0, "sha1": None}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        pending_path = self.meta_path + ".tmp"
+        if os.path.exists(pending_path) or meta.get("sha1"):
+            sha = _sha1(self.csv_path)
+            if os.path.exists(pending_path):
+                with open(pending_path, "r", encoding="utf-8") as f:
+                    pending = json.load(f)
+                if pending.get("sha1") == sha:
+                    os.replace(pending_path, self.meta_path)
+                    return pending
+                os.remove(pending_path)
+            if meta.get("sha1") and meta["sha1"] != sha:
+                LOGGER.warning("inventory.csv changed outside the app; replaying journal on top of it")
+        return meta
+
+    def frame(self) -> pd.DataFrame:
+        return self.engine().frame()
+
+    def sorted_frame(self) -> pd.DataFrame:
+        return self.engine().sorted_frame()
+
+    def product_master(self) -> pd.DataFrame:
+        return read_product_master_csv(self.product_master_path, self.enc)
+
+    def changes(self, token: Any = None) -> Tuple[Any, bool, List[Tuple[int, Optional[list]]]]:
+        """token はエンジンの (generation, version)。エンジンを読み直していれば全件。"""
+        eng = self.engine()
+        new_token = (eng.generation, eng.version)
+        if token is not None and token[0] == eng.generation:
+            rids = eng.changes_since(token[1])
+            if rids is not None:
+                return new_token, False, [(rid, eng.row(rid)) for rid in rids]
+        return new_token, True, eng.rows()
+
+    def product_master_stamp(self) -> Any:
+        return file_stamp(self.product_master_path)
+
+    def movements(self, after_seq: int = 0) -> pd.DataFrame:
+        """退避済みのジャーナル（journal_archive、ファイル名の末尾が最後の seq）と現在のジャーナルから読む。"""
+        with self._lock:
+            paths = []
+            if os.path.isdir(self.archive_dir):
+                for name in sorted(os.listdir(self.archive_dir)):
+                    last = name.rsplit("_", 1)[-1].split(".", 1)[0]
+                    if name.endswith(".jsonl") and (not last.isdigit() or int(last) > after_seq):
+                        paths.append(os.path.join(self.archive_dir, name))
+            paths.append(self.journal_path)
+            recs = []
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                add_io(read=len(data))
+                for line in data.splitlines():
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue   # 書きかけの行
+                    if int(rec["seq"]) > after_seq:
+                        alloc = rec.get("alloc")
+                        recs.append((int(rec["seq"]), rec["ts"], rec["op"], rec["product_code"], rec["exp_date"],
+                                     rec["in_date"], float(rec["qty"]),
+                                     json.dumps(alloc, ensure_ascii=False) if alloc is not None else None))
+        df = pd.DataFrame(recs, columns=MOVEMENT_LOG_COLUMNS)
+        return df.sort_values("seq", kind="stable").drop_duplicates("seq").reset_index(drop=True)
+
+    def available(self, product_code: str, exp_date: str) -> float:
+        return self.engine().available(product_code, exp_date)
+
+    # --- 更新（最新化 → 反映 → 追記 をロック下で行う） ---
+    def inbound(self, product_code: str, exp_date: str, in_date: str, qty: float, now: str) -> None:
+        with self.batch():
+            self.engine().inbound(product_code, exp_date, in_date, qty, now)
+            self._record("inbound", now, product_code, exp_date, in_date, qty)
+
+    def outbound_many(self, requests: List[Tuple[str, str, float]], now: str, policy: str = FIFO
+                      ) -> List[Tuple[bool, float, List[Tuple[str, str, float]]]]:
+        with self.batch():
+            results = self.engine().outbound_many(requests, now, policy)
+            for (code, _, qty), (ok, _, alloc) in zip(requests, results):
+                if ok:
+                    per_exp = split_by_exp(alloc)
+                    for exp, taken in per_exp:
+                        q = qty if len(per_exp) == 1 else sum(t for _, t in taken)
+                        self._record("outbound", now, code, exp, "", q, [list(a) for a in taken])
+        return results
+
+    def return_in(self, product_code: str, exp_date: str, in_date: str, qty: float, now: str) -> None:
+        with self.batch():
+            self.engine().return_in(product_code, exp_date, in_date, qty, now)
+            self._record("return_in", now, product_code, exp_date, in_date, qty)
+
+    def _record(self, op: str, ts: str, product_code: str, exp_date: str, in_date: str, qty: float, alloc=None) -> None:
+        """移動を1行分ジャーナルへ積む（CSV全体は書き換えない）。追記は batch 終了時にまとめて行う。"""
+        self._batch.append((op, ts, product_code, exp_date, in_date, qty, alloc))
+
+    def _flush(self, moves: List[tuple]) -> None:
+        if not moves:
+            return
+        self._journal.extend(moves)
+        self._journal_stamp = file_stamp(self.journal_path)
+        if self._journal.pending >= self.compact_every:
+            self.compact()
+
+    @contextmanager
+    def batch(self):
+        """ロックを握ったまま最新化し、ブロック内の移動をまとめて1回で追記する。"""
+        if self._batch is not None:
+            yield
+            return
+        with self._lock:
+            self.engine()
+            self._batch = []
+            try:
+                yield
+                moves, self._batch = self._batch, None
+                self._flush(moves)
+            except BaseException:
+                self._batch = None
+                self.reset()
+                raise
+
+    def _write_snapshot(self, df: pd.DataFrame, seq: int) -> None:
+        """スナップショット(inventory.csv)とメタを一時ファイル経由で差し替える。"""
+        tmp = self.csv_path + ".tmp"
+        _fsync_write(tmp, df.reindex(columns=INV_COLUMNS).to_csv(index=False), self.enc)
+        meta_tmp = self.meta_path + ".tmp"
+        _fsync_write(meta_tmp, json.dumps({"seq": seq, "sha1": _sha1(tmp)}), "utf-8")
+        os.replace(tmp, self.csv_path)
+        os.replace(meta_tmp, self.meta_path)
+        # ジャーナルを退避する前に差し替えを確定させる（耐久性のモードによらない）
+        fsync_dir(os.path.dirname(os.path.abspath(self.csv_path)))
+
+    def compact(self) -> None:
+        """ジャーナルをスナップショットへ畳み込み、ジャーナル本体は履歴として退避する。"""
+        with self._lock:
+            eng = self.engine()
+            if self._journal.pending == 0:
+                return
+            self._write_snapshot(eng.frame(), self._journal.last_seq)
+            dest = self._journal.rotate(self.archive_dir, datetime.now().strftime("%Y%m%d%H%M%S"))
+            self._csv_stamp, self._journal_stamp = file_stamp(self.csv_path), file_stamp(self.journal_path)
+            LOGGER.info(f"Inventory compacted (seq={self._journal.last_seq}) journal -> {dest}")
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        """未畳み込みのジャーナルは破棄せず履歴へ退避してから置き換える。"""
+        with self._lock:
+            self.engine()
+            self._write_snapshot(df, self._journal.last_seq)
+            self._journal.rotate(self.archive_dir, datetime.now().strftime("%Y%m%d%H%M%S"))
+            self.reset()
+
+    def reset(self) -> None:
+        self._engine = None
@@ -0,0 +1,142 @@
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from .inventory_engine import INV_COLUMNS, C_CODE, C_EXP, C_IN, C_QTY, C_UPD
+from ..domain.product_index import ProductIndex, normalize
+
+# 並べ替えに使える列と、1ページの行数
+SORT_COLUMNS = ["product_code", "exp_date", "in_date", "qty", "updated_at"]
+PAGE_SIZE = 100
+
+# 画面に渡す1行の列（在庫の列に製品名を足したもの）
+PAGE_COLUMNS = ["product_code", "product_name", "exp_date", "in_date", "qty", "updated_at"]
+
+@dataclass(frozen=True)
+class ViewQuery:
+    """在庫表の絞り込み・並べ替えの条件。日付は YYYY/MM/DD（空なら制限なし）。"""
+    product: str = ""        # 製品コード・製品名の一部（かな／カナ・全角／半角を問わない）
+    exp_from: str = ""       # 賞味期限の下限（含む）
+    exp_to: str = ""         # 賞味期限の上限（含む）
+    hide_zero: bool = False  # 数量 0 以下の行を出さない
+    sort_by: str = "product_code"
+    descending: bool = False
+
+@dataclass
+class Page:
+    offset: int
+    total: int          # 条件に合う行数
+    rows: List[list] = field(default_factory=list)   # PAGE_COLUMNS の順
+    changed: int = 0    # 直前の sync で取り込んだ変更行数（全件読み直しなら -1）
+
+class InventoryView:
+    """
+    画面の在庫表の中身。全行（rid → 行）と、条件に合う行の並べ替え済みキーを持ち、
+    保存先の changes() で受け取った変更行だけを bisect で抜き差しする。
+    画面へは page() で見えている範囲の行だけを渡すので、1回の移動で全件の変換・並べ替えは起きない。
+    """
+
+    def __init__(self, query: Optional[ViewQuery] = None) -> None:
+        self.query = query or ViewQuery()
+        self._check(self.query)
+        self._source: Any = None
+        self._token: Any = None
+        self._rows: Dict[int, list] = {}
+        self._order: List[tuple] = []        # 条件に合う行の並べ替えキー（最後の要素が rid）
+        self._keys: Dict[int, tuple] = {}    # rid → _order 内のキー
+        self._index: Optional[ProductIndex] = None
+        self._names: Dict[str, str] = {}
+        self._match: Dict[str, bool] = {}    # 製品コード → 製品の条件に合うか
+        self._needle = normalize(self.query.product)
+        self._col = INV_COLUMNS.index(self.query.sort_by)
+
+    @staticmethod
+    def _check(query: ViewQuery) -> None:
+        if query.sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {query.sort_by}")
+
+    def set_query(self, query: ViewQuery) -> None:
+        """条件を変える（変わったときだけ並べ直す）"""
+        if query == self.query:
+            return
+        self._check(query)
+        self.query = query
+        self._needle = normalize(query.product)
+        self._col = INV_COLUMNS.index(query.sort_by)
+        self._match.clear()
+        self._rebuild()
+
+    def sync(self, store: Any, index: Optional[ProductIndex] = None) -> int:
+        """
+        保存先の変更を取り込む。index（製品検索の索引）は製品名の表示と絞り込みに使う。
+        戻り値: 取り込んだ変更行数（全件読み直しなら -1）
+        """
+        if index is not None and index is not self._index:
+            self._index = index
+            self._names = dict(zip(index.codes, index.names))
+            self._match.clear()
+            if self._needle:
+                self._rebuild()
+        token = self._token if store is self._source else None
+        self._token, full, changes = store.changes(token)
+        self._source = store
+        if full:
+            self._rows = {rid: row for rid, row in changes if row is not None}
+            self._rebuild()
+            return -1
+        for rid, row in changes:
+            old = self._keys.pop(rid, None)
+            if old is not None:
+                del self._order[bisect_left(self._order, old)]
+            if row is None:
+                self._rows.pop(rid, None)
+                continue
+            self._rows[rid] = row
+            if self._accept(row):
+                key = self._key(rid, row)
+                self._keys[rid] = key
+                insort(self._order, key)
+        return len(changes)
+
+    def page(self, offset: int = 0, limit: int = PAGE_SIZE) -> Page:
+        """並べ替え済みの offset 行目から limit 行（降順なら末尾から）"""
+        total = len(self._order)
+        offset = max(0, min(int(offset), max(total - 1, 0)))
+        if self.query.descending:
+            keys = self._order[max(total - offset - limit, 0):total - offset][::-1]
+        else:
+            keys = self._order[offset:offset + limit]
+        rows = []
+        for key in keys:
+            r = self._rows[key[-1]]
+            rows.append([r[C_CODE], self._names.get(r[C_CODE], ""), r[C_EXP], r[C_IN], r[C_QTY], r[C_UPD]])
+        return Page(offset, total, rows)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    # --- 内部 ---
+    def _rebuild(self) -> None:
+        keys = {rid: self._key(rid, row) for rid, row in self._rows.items() if self._accept(row)}
+        self._keys = keys
+        self._order = sorted(keys.values())
+
+    def _key(self, rid: int, row: list) -> tuple:
+        # 同じ値の行は (製品, 期限, 入庫日, rid) の順に並べ、キーを一意にする
+        return (row[self._col], row[C_CODE], row[C_EXP], row[C_IN], rid)
+
+    def _accept(self, row: list) -> bool:
+        q = self.query
+        if q.hide_zero and not float(row[C_QTY]) > 0:
+            return False
+        if q.exp_from and row[C_EXP] < q.exp_from:
+            return False
+        if q.exp_to and row[C_EXP] > q.exp_to:
+            return False
+        if self._needle:
+            code = row[C_CODE]
+            hit = self._match.get(code)
+            if hit is None:
+                hit = self._needle in normalize(code) or self._needle in normalize(self._names.get(code, ""))
+                self._match[code] = hit
+            return hit
+        return True
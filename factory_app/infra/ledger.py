@@ -0,0 +1,175 @@
+import calendar, io, json, os
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .durability import atomic_write_bytes, atomic_write_text
+from .inventory_store import InventoryStore, MOVEMENT_LOG_COLUMNS
+from .logging_conf import get_logger, add_io
+
+LOGGER = get_logger(__name__)
+
+# 時点在庫の列（製品 × 賞味期限の数量）
+POSITION_COLUMNS = ["product_code", "exp_date", "qty"]
+# 列指向の保存形式（pandas + pyarrow の Parquet）と圧縮
+COMPRESSION = "zstd"
+# 数量の丸め誤差とみなす大きさ（これ以下は 0 として時点在庫から外す）
+EPS = 1e-9
+
+def month_of(ts: pd.Series) -> pd.Series:
+    """移動時刻（YYYY-MM-DD HH:MM:SS）→ 月の区分 YYYY-MM"""
+    return ts.astype(str).str[:7]
+
+def _next_month(month: str) -> str:
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}"
+
+def deltas(moves: pd.DataFrame) -> pd.Series:
+    """移動をまとめて (product_code, exp_date) ごとの増減へ（入庫・戻しは +、出庫は -）"""
+    if moves.empty:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=POSITION_COLUMNS[:2]))
+    sign = np.where(moves["op"].to_numpy() == "outbound", -1.0, 1.0)
+    signed = pd.Series(moves["qty"].to_numpy(dtype=float) * sign, index=moves.index)
+    return signed.groupby([moves["product_code"], moves["exp_date"]], sort=False).sum()
+
+def position_of(frame: pd.DataFrame) -> pd.Series:
+    """在庫表 → (product_code, exp_date) ごとの数量"""
+    return frame.groupby(["product_code", "exp_date"], sort=False)["qty"].sum().astype(float)
+
+def _add(base: pd.Series, delta: pd.Series) -> pd.Series:
+    out = base.add(delta, fill_value=0.0)
+    return out[out.abs() > EPS]
+
+def _to_frame(pos: pd.Series) -> pd.DataFrame:
+    df = pos.rename("qty").reset_index()
+    df.columns = POSITION_COLUMNS
+    return df.sort_values(POSITION_COLUMNS[:2]).reset_index(drop=True)
+
+def _from_frame(df: pd.DataFrame) -> pd.Series:
+    return df.set_index(POSITION_COLUMNS[:2])["qty"].astype(float)
+
+class MovementLedger:
+    """
+    在庫移動の台帳。締めた月（今月より前）の移動を月ごとの Parquet へ退避し、月末の在庫（チェックポイント）も残す。
+        <root>/movements/YYYY-MM.parquet    その月の移動（引当の内訳 alloc を含む）
+        <root>/checkpoints/YYYY-MM.parquet  その月末の在庫（製品 × 賞味期限）
+        <root>/opening.parquet             台帳の最初の移動より前の在庫
+        <root>/ledger.json                 どの月・どの seq まで退避したか
+    ある日の在庫は「その月の前の直近のチェックポイント + その月の移動をその日まで」を列単位で足し合わせて求めるので、
+    読むのは2つのファイル（月末ならチェックポイントだけ、未締めの月なら保存先の未退避分）だけで済む。
+    保存先の外で在庫表を置き換えた場合（save_inventory 等）の差は台帳に現れない。
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.meta_path = os.path.join(root, "ledger.json")
+        self.last_reads: List[str] = []   # 直前の問い合わせで読んだファイル（確認用）
+
+    # --- 保存形式 ---
+    def _movements_path(self, month: str) -> str:
+        return os.path.join(self.root, "movements", f"{month}.parquet")
+
+    def _checkpoint_path(self, month: str) -> str:
+        return os.path.join(self.root, "checkpoints", f"{month}.parquet")
+
+    def _write(self, path: str, df: pd.DataFrame) -> None:
+        buf = io.BytesIO()
+        df.to_parquet(buf, index=False, compression=COMPRESSION)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_bytes(path, buf.getvalue())
+        add_io(written=buf.tell())
+
+    def _read(self, path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        self.last_reads.append(os.path.relpath(path, self.root))
+        add_io(read=os.path.getsize(path))
+        return pd.read_parquet(path, columns=columns)
+
+    def meta(self) -> Dict[str, Any]:
+        if not os.path.exists(self.meta_path):
+            return {"archived_through": None, "last_seq": 0, "months": []}
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _opening(self, store: InventoryStore, live: pd.DataFrame) -> pd.Series:
+        """台帳の最初の移動より前の在庫：現在の在庫から、これまでの移動をすべて差し引く"""
+        path = os.path.join(self.root, "opening.parquet")
+        if os.path.exists(path):
+            return _from_frame(self._read(path))
+        return _add(position_of(store.frame()), -deltas(live))
+
+    # --- 締め ---
+    def archive(self, store: InventoryStore, current_month: str) -> List[str]:
+        """
+        current_month（YYYY-MM）より前の未退避の移動を月ごとに退避し、月末の在庫を残す。
+        戻り値: 退避した月
+        """
+        meta = self.meta()
+        with store.batch():   # 在庫表と履歴を同じ時点で読む
+            live = store.movements(meta["last_seq"])
+            opening = None if meta["archived_through"] else self._opening(store, live)
+        months = month_of(live["ts"])
+        open_seq = live.loc[months >= current_month, "seq"]
+        closed = live[live["seq"] < open_seq.min()] if len(open_seq) else live
+        if closed.empty:
+            return []
+        months = months[closed.index]
+        if meta["archived_through"]:
+            # 時計のずれ等で締めた月より前の時刻が来たら、次の月へ入れる（退避済みの月は書き換えない）
+            months = months.where(months > meta["archived_through"], _next_month(meta["archived_through"]))
+            pos = _from_frame(self._read(self._checkpoint_path(meta["archived_through"])))
+        else:
+            self._write(os.path.join(self.root, "opening.parquet"), _to_frame(opening))
+            pos = opening
+        written = []
+        for month, part in closed.groupby(months, sort=True):
+            self._write(self._movements_path(month), part.reset_index(drop=True))
+            pos = _add(pos, deltas(part))
+            self._write(self._checkpoint_path(month), _to_frame(pos))
+            written.append(month)
+        meta.update(archived_through=written[-1], last_seq=int(closed["seq"].max()),
+                    months=sorted(set(meta["months"]) | set(written)))
+        atomic_write_text(self.meta_path, json.dumps(meta, ensure_ascii=False))
+        LOGGER.info(f"Ledger archived {len(closed)} movements ({written[0]}..{written[-1]})")
+        return written
+
+    # --- 問い合わせ ---
+    def stock_at(self, store: InventoryStore, day: str) -> pd.DataFrame:
+        """day（YYYY/MM/DD）の終わり時点の在庫（POSITION_COLUMNS、数量 0 は除く）"""
+        self.last_reads = []
+        end_ts = day.replace("/", "-") + " 23:59:59"
+        month = end_ts[:7]
+        meta = self.meta()
+        months = meta["months"]
+        if meta["archived_through"] and month <= meta["archived_through"]:
+            if month in months and day[8:] == f"{calendar.monthrange(int(day[:4]), int(day[5:7]))[1]:02d}":
+                return self._read(self._checkpoint_path(month))   # 月末はチェックポイントそのもの
+            before = [m for m in months if m < month]
+            if before:
+                pos = _from_frame(self._read(self._checkpoint_path(before[-1])))
+            else:
+                pos = self._opening(store, pd.DataFrame(columns=MOVEMENT_LOG_COLUMNS))
+            if month in months:
+                part = self._read(self._movements_path(month), ["ts", "op", "product_code", "exp_date", "qty"])
+                pos = _add(pos, deltas(part[part["ts"] <= end_ts]))
+            return _to_frame(pos)
+        # 未締めの期間：直近のチェックポイント + 保存先の未退避の移動
+        with store.batch():
+            live = store.movements(meta["last_seq"])
+            if meta["archived_through"]:
+                pos = _from_frame(self._read(self._checkpoint_path(meta["archived_through"])))
+            else:
+                pos = self._opening(store, live)
+        self.last_reads.append("live")
+        return _to_frame(_add(pos, deltas(live[live["ts"] <= end_ts])))
+
+    def history(self, store: InventoryStore, start: str, end: str) -> pd.DataFrame:
+        """start〜end（YYYY/MM/DD、両端を含む）の移動（MOVEMENT_LOG_COLUMNS、seq 順）。該当する月のファイルだけ読む。"""
+        self.last_reads = []
+        lo, hi = start.replace("/", "-"), end.replace("/", "-") + " 23:59:59"
+        meta = self.meta()
+        parts = [self._read(self._movements_path(m)) for m in meta["months"] if lo[:7] <= m <= hi[:7]]
+        if not meta["archived_through"] or hi[:7] > meta["archived_through"]:
+            parts.append(store.movements(meta["last_seq"]))
+            self.last_reads.append("live")
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=MOVEMENT_LOG_COLUMNS)
+        df = df[(df["ts"] >= lo) & (df["ts"] <= hi)]
+        return df.sort_values("seq").reset_index(drop=True).reindex(columns=MOVEMENT_LOG_COLUMNS)
@@ -0,0 +1,26 @@
+
+import os
+from typing import Any, Dict, Optional
+from filelock import FileLock, Timeout  # noqa: F401  (呼び出し側で捕捉する)
+
+# 共有フォルダを複数端末で使う前提。クリティカルセクションは短いので長くは待たない。
+LOCK_TIMEOUT = 10.0
+
+_LOCKS: Dict[str, FileLock] = {}
+
+def storage_lock(path: str) -> FileLock:
+    """path に対応するプロセス間ロック（path + ".lock"）。同一プロセス内では同じオブジェクトを返す。"""
+    lock_path = os.path.abspath(path) + ".lock"
+    lock = _LOCKS.get(lock_path)
+    if lock is None:
+        lock = _LOCKS[lock_path] = FileLock(lock_path, timeout=LOCK_TIMEOUT)
+    return lock
+
+class ConflictError(Exception):
+    """楽観的排他：読み込んだ後に他の端末が同じファイルを更新していた"""
+
+    def __init__(self, path: str, current: Optional[Dict[str, Any]], etag: Optional[str]) -> None:
+        super().__init__(f"Conflicting update: {path}")
+        self.path = path
+        self.current = current
+        self.etag = etag
@@ -1,6 +1,7 @@
-
-import logging
+import atexit, contextvars, functools, json, logging, os, re, threading, time
+from datetime import datetime
 from logging import Logger
+from typing import Any, Callable, Dict, Optional
 
 def get_logger(name: str = "factory_app") -> Logger:
     logger = logging.getLogger(name)
@@ -11,3 +12,277 @@ def get_logger(name: str = "factory_app") -> Logger:
         ch.setFormatter(fmt)
         logger.addHandler(ch)
     return logger
+
+LOGGER = get_logger(__name__)
+
+# --- 計測（config/settings.json の "metrics"） ---
+# 主要な処理（repo・usecase の関数）ごとに所要時間のヒストグラム・行数・読み書きしたバイト数を集計し、
+# 1回ごとに JSON 1行のログを出す。Prometheus のテキスト形式のファイルにも書き出せる。
+# 無効のとき（既定）は関数を直接呼ぶだけで、集計もログも行わない。
+#
+#   "metrics": {"enabled": true,
+#               "json_log": "D:/logs/metrics.jsonl",       # 省略時は標準エラー
+#               "prom_file": "D:/metrics/factory_app.prom", # 省略時は書き出さない
+#               "profile_op": "inventory.inbound",          # この処理の遅かった1回を cProfile で保存
+#               "profile_slow_ms": 500,
+#               "profile_dir": "D:/logs/profiles"}           # 省略時は storage/profiles
+
+# 所要時間のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Prometheus のファイルを書き直す最短の間隔（秒）
+PROM_INTERVAL = 10.0
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "storage", "profiles")
+
+class _Hist:
+    __slots__ = ("count", "sum", "buckets", "errors", "rows", "bytes_read", "bytes_written")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.errors = 0
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+class Metrics:
+    """処理名ごとの集計と出力先。use_metrics / configure_metrics で1つだけ作る。"""
+
+    def __init__(self, json_log: Optional[str] = None, prom_file: Optional[str] = None,
+                 profile_op: Optional[str] = None, profile_slow_ms: float = 0.0,
+                 profile_dir: Optional[str] = None) -> None:
+        self.prom_file = prom_file
+        self.profile_op = profile_op
+        self.profile_slow_ms = float(profile_slow_ms or 0)
+        self.profile_dir = profile_dir or PROFILE_DIR
+        self.profiled: Optional[str] = None   # 保存した cProfile のパス（1回だけ）
+        self._profiling = False
+        self._hist: Dict[str, _Hist] = {}
+        self._lock = threading.Lock()
+        self._prom_at = 0.0
+        self.log = logging.getLogger("factory_app.metrics")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        for h in list(self.log.handlers):
+            self.log.removeHandler(h)
+            h.close()
+        if json_log:
+            os.makedirs(os.path.dirname(os.path.abspath(json_log)), exist_ok=True)
+            handler: logging.Handler = logging.FileHandler(json_log, encoding="utf-8")
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.log.addHandler(handler)
+
+    def observe(self, op: "_Op", sec: float, ok: bool) -> None:
+        with self._lock:
+            h = self._hist.get(op.name)
+            if h is None:
+                h = self._hist[op.name] = _Hist()
+            h.count += 1
+            h.sum += sec
+            for i, le in enumerate(LATENCY_BUCKETS):
+                if sec <= le:
+                    h.buckets[i] += 1
+            h.errors += not ok
+            h.rows += op.rows
+            h.bytes_read += op.bytes_read
+            h.bytes_written += op.bytes_written
+            write_prom = self.prom_file is not None and time.monotonic() - self._prom_at >= PROM_INTERVAL
+            if write_prom:
+                self._prom_at = time.monotonic()
+        self.log.info(json.dumps({
+            "ts": datetime.now().isoformat(timespec="milliseconds"), "op": op.name, "ms": round(sec * 1000, 3),
+            "ok": ok, "rows": op.rows, "bytes_read": op.bytes_read, "bytes_written": op.bytes_written,
+            "thread": threading.current_thread().name,
+        }, ensure_ascii=False))
+        if write_prom:
+            self.write_prometheus()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """処理名ごとの集計（件数・合計秒・ヒストグラムなど）"""
+        with self._lock:
+            return {name: {"count": h.count, "sum_sec": h.sum, "errors": h.errors, "rows": h.rows,
+                           "bytes_read": h.bytes_read, "bytes_written": h.bytes_written,
+                           "buckets": dict(zip(LATENCY_BUCKETS, h.buckets))}
+                    for name, h in self._hist.items()}
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP factory_app_op_duration_seconds Operation latency.",
+            "# TYPE factory_app_op_duration_seconds histogram",
+        ]
+        snap = self.snapshot()
+        for name, s in sorted(snap.items()):
+            label = _label(name)
+            for le, n in s["buckets"].items():
+                lines.append(f'factory_app_op_duration_seconds_bucket{{op="{label}",le="{le}"}} {n}')
+            lines.append(f'factory_app_op_duration_seconds_bucket{{op="{label}",le="+Inf"}} {s["count"]}')
+            lines.append(f'factory_app_op_duration_seconds_sum{{op="{label}"}} {s["sum_sec"]:.6f}')
+            lines.append(f'factory_app_op_duration_seconds_count{{op="{label}"}} {s["count"]}')
+        for key, help_text in (("errors", "Operations that raised."), ("rows", "Rows processed."),
+                               ("bytes_read", "Bytes read from storage."),
+                               ("bytes_written", "Bytes written to storage.")):
+            lines.append(f"# HELP factory_app_op_{key}_total {help_text}")
+            lines.append(f"# TYPE factory_app_op_{key}_total counter")
+            for name, s in sorted(snap.items()):
+                lines.append(f'factory_app_op_{key}_total{{op="{_label(name)}"}} {s[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self) -> None:
+        if not self.prom_file:
+            return
+        from .durability import atomic_write_text   # durability もこのモジュールを使うため、ここで読む
+        try:
+            atomic_write_text(self.prom_file, self.prometheus_text(), durable=False)
+        except OSError as e:
+            LOGGER.warning(f"metrics file not written {self.prom_file}: {e}")
+
+    def close(self) -> None:
+        self.write_prometheus()
+        for h in list(self.log.handlers):
+            self.log.removeHandler(h)
+            h.close()
+
+def _label(name: str) -> str:
+    return name.replace("\\", "\\\\").replace('"', '\\"')
+
+_METRICS: Optional[Metrics] = None
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("factory_app_op", default=None)
+
+def use_metrics(enabled: bool = True, json_log: Optional[str] = None, prom_file: Optional[str] = None,
+                profile_op: Optional[str] = None, profile_slow_ms: float = 0.0,
+                profile_dir: Optional[str] = None) -> Optional[Metrics]:
+    """計測を有効／無効にする。通常は起動時に configure_metrics から呼ぶ（検証やベンチマークでは直接）。"""
+    global _METRICS
+    if _METRICS is not None:
+        _METRICS.close()
+    _METRICS = Metrics(json_log, prom_file, profile_op, profile_slow_ms, profile_dir) if enabled else None
+    return _METRICS
+
+def configure_metrics(config: Optional[Dict[str, Any]]) -> Optional[Metrics]:
+    """settings.json の "metrics" を反映する（起動時に1回）"""
+    config = config if isinstance(config, dict) else {}
+    keys = ("json_log", "prom_file", "profile_op", "profile_slow_ms", "profile_dir")
+    return use_metrics(bool(config.get("enabled") or config.get("profile_op")),
+                       **{k: config[k] for k in keys if config.get(k) is not None})
+
+def metrics() -> Optional[Metrics]:
+    return _METRICS
+
+def metrics_enabled() -> bool:
+    return _METRICS is not None
+
+@atexit.register
+def _flush_metrics() -> None:
+    if _METRICS is not None:
+        _METRICS.write_prometheus()
+
+class _Op:
+    """計測中の1回分。add_io はこれと呼出し元の処理（入れ子の外側）すべてに加算する。"""
+    __slots__ = ("name", "rows", "bytes_read", "bytes_written", "failed", "parent", "_m", "_t0", "_token", "_prof")
+
+    def __init__(self, m: Metrics, name: str) -> None:
+        self._m = m
+        self.name = name
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.failed = False   # 例外ではなく戻り値で失敗を返す関数用
+        self._prof = None
+
+    def add(self, rows: int = 0, read: int = 0, written: int = 0) -> None:
+        self.rows += rows
+        self.bytes_read += read
+        self.bytes_written += written
+
+    def __enter__(self) -> "_Op":
+        m = self._m
+        self.parent = _CURRENT.get()
+        self._token = _CURRENT.set(self)
+        if m.profile_op == self.name and m.profiled is None and not m._profiling:
+            import cProfile
+            m._profiling = True
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        sec = time.perf_counter() - self._t0
+        _CURRENT.reset(self._token)
+        p = self.parent
+        while p is not None:
+            p.bytes_read += self.bytes_read
+            p.bytes_written += self.bytes_written
+            p = p.parent
+        if self._prof is not None:
+            self._prof.disable()
+            self._dump_profile(sec)
+        self._m.observe(self, sec, exc_type is None and not self.failed)
+        return False
+
+    def _dump_profile(self, sec: float) -> None:
+        m = self._m
+        try:
+            if sec * 1000 >= m.profile_slow_ms:
+                os.makedirs(m.profile_dir, exist_ok=True)
+                safe = re.sub(r"[^\w.-]", "_", self.name)
+                path = os.path.join(m.profile_dir, f"{safe}_{datetime.now():%Y%m%d_%H%M%S}.prof")
+                self._prof.dump_stats(path)
+                m.profiled = path
+                LOGGER.info(f"Profiled {self.name} ({sec * 1000:.0f} ms) -> {path}")
+        except OSError as e:
+            LOGGER.warning(f"profile not written: {e}")
+        finally:
+            m._profiling = False
+
+class _NullOp:
+    __slots__ = ()
+
+    def add(self, rows: int = 0, read: int = 0, written: int = 0) -> None:
+        pass
+
+    def __enter__(self) -> "_NullOp":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+_NULL = _NullOp()
+
+def timed(name: str):
+    """
+    with timed("inventory.inbound") as op: ... のように処理を囲んで計測する。
+    op.add(rows=..., read=..., written=...) で行数・バイト数を記録できる。無効なら何もしない。
+    """
+    m = _METRICS
+    return _NULL if m is None else _Op(m, name)
+
+def instrumented(name: str, rows: Optional[Callable[[Any], int]] = None, ok: Optional[Callable[[Any], bool]] = None):
+    """
+    関数を timed(name) で囲むデコレータ。
+    rows は戻り値から行数を数える関数、ok は戻り値から成否を判定する関数（(ok, msg, df) を返す関数用）。
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            m = _METRICS
+            if m is None:
+                return fn(*args, **kwargs)
+            with _Op(m, name) as op:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    op.rows += rows(result)
+                if ok is not None:
+                    op.failed = not ok(result)
+                return result
+        return wrapper
+    return deco
+
+def add_io(read: int = 0, written: int = 0) -> None:
+    """実行中の処理（timed / instrumented の内側）に読み書きしたバイト数を加える"""
+    op = _CURRENT.get()
+    if op is not None:
+        op.bytes_read += read
+        op.bytes_written += written
@@ -1,64 +1,103 @@
 
-import os, json
-from typing import Optional, Dict, Any, Tuple, List
+import os
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple, List
+from .inspection_store import InspectionStore
+from .settings import SETTINGS_PATH, load_settings, save_settings, get_setting, update_settings, inspection_items  # noqa: F401
 from .logging_conf import get_logger
 
 LOGGER = get_logger(__name__)
 
-SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "settings.json")
+if TYPE_CHECKING:
+    import pandas as pd
 
-def load_settings() -> Dict[str, Any]:
-    if not os.path.exists(SETTINGS_PATH):
-        return {}
-    with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {}
+_STATE_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "storage")
 
-def save_settings(settings: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
-    with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
-        json.dump(settings, f, ensure_ascii=False, indent=2)
+def use_state_root(root: str) -> None:
+    """月次点検状態の置き場所を変える（既定は factory_app/storage）。検証用の一時フォルダに向ける場合などに呼ぶ。"""
+    global _STATE_ROOT, _INSPECTION_STORE
+    _STATE_ROOT = root
+    _INSPECTION_STORE = None
+
+def _state_root() -> str:
+    """月次点検状態の置き場所（作成は保存先を開くときに行う）"""
+    return _STATE_ROOT
 
 def monthly_state_path(type_name: str, year: int, month: int, machine: str) -> str:
     safe_type = type_name.replace("/", "_")
     safe_machine = machine.replace("/", "_")
-    root = os.path.join(os.path.dirname(os.path.dirname(__file__)), "storage")
-    os.makedirs(root, exist_ok=True)
+    root = _state_root()
     fname = f"{safe_type}_{year}-{month:02d}_{safe_machine}.json"
     return os.path.join(root, fname)
 
+# 新規作成を期待する場合の etag（「まだ保存されていないはず」）
+NEW_FILE_ETAG = ""
+
+_INSPECTION_STORE: Optional[InspectionStore] = None
+
+def get_inspection_store() -> InspectionStore:
+    """
+    月次点検状態の保存先（storage/inspection.sqlite3）。
+    初回に storage 直下の従来の月次 JSON を取り込む。
+    """
+    global _INSPECTION_STORE
+    if _INSPECTION_STORE is None:
+        root = _state_root()
+        os.makedirs(root, exist_ok=True)
+        store = InspectionStore(os.path.join(root, "inspection.sqlite3"))
+        store.import_json_dir(root)
+        _INSPECTION_STORE = store
+    return _INSPECTION_STORE
+
+def load_monthly_state_versioned(type_name: str, year: int, month: int, machine: str
+                                 ) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(内容, etag) を返す。未保存なら (None, NEW_FILE_ETAG)。"""
+    data, etag = get_inspection_store().load(type_name, year, month, machine)
+    return data, etag if etag is not None else NEW_FILE_ETAG
+
 def load_monthly_state(type_name: str, year: int, month: int, machine: str) -> Optional[Dict[str, Any]]:
-    path = monthly_state_path(type_name, year, month, machine)
-    if not os.path.exists(path):
-        return None
-    with open(path, "r", encoding="utf-8-sig") as f:
-        return json.load(f)
+    return load_monthly_state_versioned(type_name, year, month, machine)[0]
+
+def save_monthly_state_versioned(type_name: str, year: int, month: int, machine: str, data: Dict[str, Any],
+                                 expected_etag: Optional[str] = None) -> Tuple[str, str]:
+    """
+    保存して (保存先の表示名, 新しい etag) を返す。
+    expected_etag を渡した場合、保存済みの版が一致しなければ ConflictError（他端末が先に保存した）。
+    None なら確認せず上書きする。
+    """
+    store = get_inspection_store()
+    etag = store.save(type_name, year, month, machine, data, expected_etag, missing_etag=NEW_FILE_ETAG)
+    where = store.location(type_name, year, month, machine)
+    LOGGER.info(f"Saved monthly state -> {where}")
+    return where, etag
 
 def save_monthly_state(type_name: str, year: int, month: int, machine: str, data: Dict[str, Any]) -> str:
-    path = monthly_state_path(type_name, year, month, machine)
-    with open(path, "w", encoding="utf-8-sig") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    LOGGER.info(f"Saved monthly state -> {path}")
-    return path
+    return save_monthly_state_versioned(type_name, year, month, machine, data)[0]
+
+def save_monthly_states(states: List[Tuple[Tuple[str, int, int, str], Dict[str, Any]]], overwrite: bool = True
+                        ) -> List[Tuple[str, int, int, str]]:
+    """
+    save_monthly_state の一括版（過去分の取込用）。[((type_name, year, month, machine), 内容), ...] を1回の書き込みで保存する。
+    overwrite=False なら保存済みの月は残す。戻り値: 保存しなかった月のキー
+    """
+    kept = get_inspection_store().save_many(states, overwrite)
+    LOGGER.info(f"Saved {len(states) - len(kept)} monthly states ({len(kept)} kept)")
+    return kept
+
+def completion_counts(start: int, end: int, type_name: Optional[str] = None,
+                      machines: Optional[List[str]] = None,
+                      by: Tuple[str, ...] = ("type_name", "machine", "item")) -> "pd.DataFrame":
+    """期間（YYYYMMDD）の点検実施数。詳細は InspectionStore.completion_counts"""
+    return get_inspection_store().completion_counts(start, end, type_name, machines, by)
 
 def peek_excel_path_for_month(type_name: str, year: int, month: int) -> Optional[str]:
     """参照時に使用：未設定なら None を返す"""
-    settings = load_settings()
-    key = f"{type_name}_{year}_{month}"
-    return settings.get(key)
+    return get_setting(f"{type_name}_{year}_{month}")
 
 def set_excel_path_for_month(type_name: str, year: int, month: int, path: str) -> None:
-    settings = load_settings()
     key = f"{type_name}_{year}_{month}"
-    settings[key] = path
-    save_settings(settings)
+    update_settings({key: path})
     LOGGER.info(f"Excel path set: {key} -> {path}")
 
-def default_items(type_name: str) -> List[str]:
-    # 実運用に合わせて更新可。ここは最低限のデフォルト。
-    if "保全" in type_name:
-        return ["電源ランプ確認", "異音チェック", "清掃状態", "安全ガード", "油漏れ"]
-    # 始業前点検など
-    return ["非常停止スイッチ", "ローラー異物", "周囲安全", "表示警告", "動作試運転"]
+def default_items(type_name: str, machine: Optional[str] = None) -> List[str]:
+    """点検項目のマスタ（config/settings.json の "inspection_items"。未設定なら既定の項目）"""
+    return inspection_items(type_name, machine)
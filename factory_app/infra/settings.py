@@ -0,0 +1,145 @@
+
+import copy, json, os, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+from .durability import atomic_write_text
+from .locking import storage_lock
+from .logging_conf import get_logger
+
+LOGGER = get_logger(__name__)
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "settings.json")
+
+# 同じ設定を続けて参照するとき、この秒数の間はファイルの変更確認（stat）も省く
+CHECK_INTERVAL = 1.0
+
+# settings.json に無いときの既定値
+DEFAULT_MACHINES = ["1番充填", "2番充填", "3番充填"]
+DEFAULT_TYPE_NAMES = ["始業前点検", "保全点検"]
+DEFAULT_ITEMS = {
+    "保全点検": ["電源ランプ確認", "異音チェック", "清掃状態", "安全ガード", "油漏れ"],
+    "始業前点検": ["非常停止スイッチ", "ローラー異物", "周囲安全", "表示警告", "動作試運転"],
+}
+
+class SettingsCache:
+    """
+    settings.json を読んだ結果を保持する。ファイルの更新時刻・サイズ・inode が変わったときだけ読み直すので、
+    アプリを再起動せずに設定の変更が反映され、参照のたびにファイルを開くこともない。
+    書き込みは保存先のプロセス間ロックの中で読み直してから行い、一時ファイル + fsync + os.replace で置き換える。
+    """
+
+    def __init__(self, path: str, check_interval: float = CHECK_INTERVAL) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0   # 内容を読み直すたびに増える（画面側の更新判定用）
+        self._data: Dict[str, Any] = {}
+        self._sig: Optional[Tuple[int, int, int]] = (-1, -1, -1)   # 未読込
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict[str, Any]:
+        """現在の設定。共有しているので呼び出し側で書き換えないこと（変更は update）"""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return self._data
+        with self._lock:
+            self._checked = now
+            sig = _signature(self.path)
+            if sig != self._sig:
+                self._reload(sig)
+            return self._data
+
+    def update(self, changes: Dict[str, Any], replace: bool = False) -> Dict[str, Any]:
+        """changes を書き込む（replace=True なら全体を置き換える）。他端末の変更を読み直してから反映する。"""
+        with storage_lock(self.path), self._lock:
+            self._reload(_signature(self.path))
+            data = dict(changes) if replace else {**self._data, **changes}
+            _write_json_atomic(self.path, data)
+            self._data, self._sig = data, _signature(self.path)
+            self._checked = time.monotonic()
+            self.version += 1
+            return data
+
+    def invalidate(self) -> None:
+        """次の get で必ず変更を確認する"""
+        self._checked = float("-inf")
+
+    def _reload(self, sig: Optional[Tuple[int, int, int]]) -> None:
+        if sig is None:
+            data: Dict[str, Any] = {}
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("settings must be a JSON object")
+            except Exception as e:
+                # 手で編集している途中などで壊れている間は、前回読めた内容を使い続ける
+                LOGGER.warning(f"Ignored unreadable settings {self.path}: {e}")
+                self._sig = sig
+                return
+        if data != self._data:
+            self.version += 1
+        self._data, self._sig = data, sig
+
+def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+_CACHE = SettingsCache(SETTINGS_PATH)
+
+def use_settings(path: str) -> None:
+    """設定ファイルの場所を変える（既定は factory_app/config/settings.json）。検証用の一時フォルダに向ける場合などに呼ぶ。"""
+    global _CACHE
+    _CACHE = SettingsCache(path)
+
+def settings_version() -> int:
+    """設定を読み直すたびに変わる番号"""
+    _CACHE.get()
+    return _CACHE.version
+
+def get_setting(key: str, default: Any = None) -> Any:
+    return _CACHE.get().get(key, default)
+
+def load_settings() -> Dict[str, Any]:
+    """設定全体の写し（書き換えてから save_settings してよい）"""
+    return copy.deepcopy(_CACHE.get())
+
+def save_settings(settings: Dict[str, Any]) -> None:
+    _CACHE.update(settings, replace=True)
+
+def update_settings(changes: Dict[str, Any]) -> None:
+    """指定したキーだけ書き換える（他のキーはファイルの最新の内容を保つ）"""
+    _CACHE.update(changes)
+
+# --- 点検のマスタ ---
+# settings.json の例:
+#   "machines": ["1番充填", "2番充填"],
+#   "inspection_types": ["始業前点検", "保全点検"],
+#   "inspection_items": {
+#       "保全点検": ["電源ランプ確認", "異音チェック"],                  … 全機械共通
+#       "始業前点検": {"*": ["非常停止スイッチ"], "2番充填": ["周囲安全"]}  … 機械ごと（"*" は既定）
+#   }
+
+def machines() -> List[str]:
+    return list(get_setting("machines") or DEFAULT_MACHINES)
+
+def type_names() -> List[str]:
+    return list(get_setting("inspection_types") or DEFAULT_TYPE_NAMES)
+
+def inspection_items(type_name: str, machine: Optional[str] = None) -> List[str]:
+    """種別（・機械）ごとの点検項目"""
+    entry = (get_setting("inspection_items") or {}).get(type_name)
+    if isinstance(entry, dict):
+        entry = entry.get(machine) if machine in entry else entry.get("*")
+    if entry:
+        return list(entry)
+    if type_name in DEFAULT_ITEMS:
+        return list(DEFAULT_ITEMS[type_name])
+    # 未登録の種別は名前で決める（従来の既定）
+    return list(DEFAULT_ITEMS["保全点検" if "保全" in type_name else "始業前点検"])
@@ -0,0 +1,372 @@
+"""
+在庫・点検の操作を HTTP/JSON で受け付けるローカルサービス（ハンディスキャナ・各充填ラインのタブレット用）。
+
+    python -m factory_app serve --port 8765
+    python -m factory_app serve --host 192.168.0.10 --port 8765   （スキャナ・タブレットから使う場合）
+
+既定ではこの PC からだけ（127.0.0.1）受け付ける。他の端末から使う場合は --host にこの PC の LAN 側のアドレスを指定する。
+どの要求にも settings.json の "service_token" を Authorization: Bearer <token> で付ける（未設定なら起動しない）。
+保存先を持つ PC で1つだけ起動する。書き込み（入庫・出庫・戻し・点検のチェック・サイン）はキューに積み、
+1つの書き込みタスクがたまった分をまとめて反映する（在庫は apply_movements で1回、点検は月ごとに1回保存）。
+保存先の読み書きはすべて同じ1本のスレッドで行うので、端末が増えてもファイルの取り合いは起きない。
+
+    GET  /health
+    GET  /metrics                         Prometheus 形式（settings.json の "metrics" が有効なとき）
+    GET  /inventory?product_code=P001     在庫表と製品マスタ（load_tables）
+    POST /inventory/inbound               {"product_code", "exp_date", "in_date", "qty"}
+    POST /inventory/outbound              {"product_code", "exp_date", "qty", "policy"}
+    POST /inventory/return_in             {"product_code", "exp_date", "in_date", "qty"}
+    GET  /inspection/state?type_name=&year=&month=&machine=
+    POST /inspection/toggle               {"type_name", "year", "month", "machine", "item", "day", "checked"}
+    POST /inspection/sign                 {"type_name", "year", "month", "machine", "day", "text"}
+
+応答は JSON。業務上の成否は画面と同じく {"ok": true/false, "message": ...}（HTTP 200）で返し、
+要求の誤りは 400、トークンが無い・違う場合は 401、ロック待ちの時間切れは 503 を返す。
+同じまとまりの中でも在庫の移動は受け付けた順に反映する（出庫の後に届いた入庫をその出庫には使わない）。
+"""
+import asyncio, hmac, json, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+from .domain.state import MonthlyState
+from .infra.fifo import FIFO, POLICIES
+from .infra.locking import Timeout
+from .infra.logging_conf import get_logger, metrics, timed
+from .infra.settings import get_setting
+from .usecase import inspection as uc_insp
+from .usecase import inventory as uc_inv
+
+LOGGER = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 要求に付けるトークンの設定キー
+TOKEN_SETTING = "service_token"
+# 書き込みタスクが1回にまとめる要求の上限
+MAX_BATCH = 1000
+MAX_BODY = 1 << 20
+
+# 書き込み要求の区分
+INVENTORY_OPS = ("inbound", "outbound", "return_in")
+TOGGLE = "toggle"
+SIGN = "sign"
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+def _field(body: Dict[str, Any], name: str, kind: type = str, default: Any = ...) -> Any:
+    value = body.get(name)
+    if value is None or value == "":
+        if default is ...:
+            raise HttpError(400, f"missing field: {name}")
+        return default
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"invalid {name}: {value!r}")
+
+def _state_key(body: Dict[str, Any]) -> Tuple[str, int, int, str]:
+    return (_field(body, "type_name"), _field(body, "year", int), _field(body, "month", int), _field(body, "machine"))
+
+class Service:
+    """
+    HTTP の受付（イベントループ）と、保存先を専有する1本のスレッド。
+    書き込みは queue → _writer がまとめて取り出し → 専有スレッドで _apply_batch。読み込みも同じスレッドで行う。
+    """
+
+    def __init__(self, token: str, max_batch: int = MAX_BATCH) -> None:
+        if not token:
+            raise ValueError(f'settings.json の "{TOKEN_SETTING}" を設定してください。')
+        self.token = token
+        self.max_batch = max_batch
+        self.batches = 0    # 反映したまとまりの数（確認用）
+        self.writes = 0     # 反映した書き込み要求の数
+        self._owner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-owner")
+        self._queue: Optional[asyncio.Queue] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._routes: Dict[Tuple[str, str], Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Any]]] = {
+            ("GET", "/health"): self._health,
+            ("GET", "/inventory"): self._inventory,
+            ("POST", "/inventory/inbound"): lambda q, b: self._move("inbound", b),
+            ("POST", "/inventory/outbound"): lambda q, b: self._move("outbound", b),
+            ("POST", "/inventory/return_in"): lambda q, b: self._move("return_in", b),
+            ("GET", "/inspection/state"): self._state,
+            ("POST", "/inspection/toggle"): self._toggle,
+            ("POST", "/inspection/sign"): self._sign,
+        }
+
+    # --- 起動・停止 ---
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> int:
+        """待受けを始めて実際のポート番号を返す（port=0 なら空きポート）"""
+        self._queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer())
+        self._server = await asyncio.start_server(self._handle, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        LOGGER.info(f"Service listening on http://{host}:{port}")
+        return port
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self._owner.shutdown(wait=True)
+
+    async def _run_owned(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._owner, fn, *args)
+
+    # --- 書き込みのまとめ ---
+    async def _submit(self, kind: str, req: Dict[str, Any]) -> Dict[str, Any]:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((kind, req, fut))
+        return await fut
+
+    async def _writer(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await self._run_owned(_apply_batch, [(k, r) for k, r, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, _, fut), res in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+    # --- 各要求 ---
+    async def _health(self, query, body) -> Dict[str, Any]:
+        return {"ok": True, "batches": self.batches, "writes": self.writes, "queued": self._queue.qsize()}
+
+    async def _inventory(self, query, body) -> Dict[str, Any]:
+        code = query.get("product_code")
+        inv, pm = await self._run_owned(uc_inv.load_tables)
+        if code:
+            inv = inv[inv["product_code"] == code]
+            pm = pm[pm["product_code"] == code]
+        return {"inventory": inv.to_dict("records"), "product_master": pm.to_dict("records")}
+
+    async def _move(self, op: str, body) -> Dict[str, Any]:
+        req = {"op": op, "product_code": _field(body, "product_code"), "exp_date": _field(body, "exp_date", str, ""),
+               "in_date": _field(body, "in_date", str, ""), "qty": _field(body, "qty", float)}
+        req["policy"] = _field(body, "policy", str, FIFO) if op == "outbound" else FIFO
+        if req["policy"] not in POLICIES:
+            raise HttpError(400, f"invalid policy: {req['policy']}")
+        return await self._submit(op, req)
+
+    async def _state(self, query, body) -> Dict[str, Any]:
+        key = _state_key(query)
+        st = await self._run_owned(uc_insp.load_or_init_state, *key)
+        return {"state": st.to_dict(), "etag": st.etag}
+
+    async def _toggle(self, query, body) -> Dict[str, Any]:
+        checked = body.get("checked")
+        if checked is not None and not isinstance(checked, bool):
+            raise HttpError(400, f"invalid checked: {checked!r}")
+        req = {"key": _state_key(body), "item": _field(body, "item"), "day": _field(body, "day", int), "checked": checked}
+        return await self._submit(TOGGLE, req)
+
+    async def _sign(self, query, body) -> Dict[str, Any]:
+        req = {"key": _state_key(body), "day": _field(body, "day", int), "text": _field(body, "text", str, "")}
+        return await self._submit(SIGN, req)
+
+    # --- HTTP ---
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], raw: bytes) -> Tuple[int, bytes, str]:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            raise HttpError(401, "invalid or missing token")
+        url = urlsplit(target)
+        if (method, url.path) == ("GET", "/metrics"):
+            m = metrics()
+            return 200, (m.prometheus_text() if m else "").encode("utf-8"), "text/plain; version=0.0.4"
+        handler = self._routes.get((method, url.path))
+        if handler is None:
+            status = 405 if any(path == url.path for _, path in self._routes) else 404
+            raise HttpError(status, f"{method} {url.path}")
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            raise HttpError(400, "invalid JSON")
+        if not isinstance(body, dict):
+            raise HttpError(400, "JSON object expected")
+        with timed(f"service.{method} {url.path}"):
+            data = await handler(query, body)
+        return 200, json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"), "application/json"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode("latin-1").split()
+                headers: Dict[str, str] = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                keep = len(parts) == 3 and parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    if len(parts) != 3:
+                        raise HttpError(400, "bad request line")
+                    length = int(headers.get("content-length") or 0)
+                    if length > MAX_BODY:
+                        keep = False
+                        raise HttpError(413, f"body over {MAX_BODY} bytes")
+                    raw = await reader.readexactly(length) if length else b""
+                    status, payload, ctype = await self._dispatch(parts[0], parts[1], headers, raw)
+                except HttpError as e:
+                    status, payload, ctype = e.status, _error(str(e)), "application/json"
+                except Timeout:
+                    status, payload, ctype = 503, _error("他の端末が更新中です。もう一度実行してください。"), "application/json"
+                except ValueError as e:
+                    status, payload, ctype = 400, _error(str(e)), "application/json"
+                except Exception as e:
+                    LOGGER.exception(e)
+                    status, payload, ctype = 500, _error(str(e)), "application/json"
+                auth = "WWW-Authenticate: Bearer\r\n" if status == 401 else ""
+                head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {ctype}\r\n{auth}"
+                        f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep else 'close'}\r\n\r\n")
+                writer.write(head.encode("latin-1") + payload)
+                await writer.drain()
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def _error(message: str) -> bytes:
+    return json.dumps({"ok": False, "message": message}, ensure_ascii=False).encode("utf-8")
+
+# --- 専有スレッドで行う反映 ---
+def _apply_batch(batch: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+    """
+    まとめて取り出した書き込み要求を反映し、要求ごとの結果（dict か例外）を同じ順で返す。
+    在庫の移動は受け付けた順に、連続した区間ごとに apply_movements で1回ずつ反映する。apply_movements は
+    入庫・戻しを出庫より先に反映するので、出庫の後に入庫・戻しが来たら（または引当方式が変わったら）区間を分ける。
+    点検の編集は月ごとにまとめる（在庫とは独立で、同じ月の中の順は保つ）。
+    """
+    results: List[Any] = [None] * len(batch)
+    runs: List[Tuple[str, List[int]]] = []
+    states: Dict[Tuple[str, int, int, str], List[int]] = {}
+    after_out = False
+    for i, (kind, req) in enumerate(batch):
+        if kind in INVENTORY_OPS:
+            if not runs or runs[-1][0] != req["policy"] or (after_out and kind != "outbound"):
+                runs.append((req["policy"], []))
+                after_out = False
+            runs[-1][1].append(i)
+            after_out = after_out or kind == "outbound"
+        else:
+            states.setdefault(req["key"], []).append(i)
+    for policy, idx in runs:
+        _apply_moves(batch, idx, policy, results)
+    for key, idx in states.items():
+        _apply_state_edits(batch, idx, key, results)
+    return results
+
+def _apply_moves(batch, idx: List[int], policy: str, results: List[Any]) -> None:
+    rows = [batch[i][1] for i in idx]
+    moves = pd.DataFrame(rows, columns=["op", "product_code", "exp_date", "in_date", "qty"])
+    try:
+        _, _, report, _ = uc_inv.import_movements(moves, policy, table=False)
+    except Exception as e:
+        for i in idx:
+            results[i] = e
+        return
+    for i, ok, msg in zip(idx, report["ok"], report["message"]):
+        results[i] = {"ok": bool(ok), "message": msg}
+
+def _apply_state_edits(batch, idx: List[int], key: Tuple[str, int, int, str], results: List[Any]) -> None:
+    try:
+        st = uc_insp.load_or_init_state(*key)
+    except Exception as e:
+        for i in idx:
+            results[i] = e
+        return
+    changed = []
+    for i in idx:
+        kind, req = batch[i]
+        try:
+            _edit_state(st, kind, req)
+            changed.append(i)
+        except (KeyError, ValueError) as e:
+            results[i] = {"ok": False, "message": str(e).strip("'\"")}
+    if not changed:
+        return
+    try:
+        uc_insp.save_state(st)
+    except Exception as e:
+        for i in changed:
+            results[i] = e
+        return
+    for i in changed:
+        results[i] = {"ok": True, "message": "保存しました。", "etag": st.etag}
+
+def _edit_state(st: MonthlyState, kind: str, req: Dict[str, Any]) -> None:
+    day = req["day"]
+    if not 1 <= day <= st.num_days:
+        raise ValueError(f"Invalid day: {day}")
+    if kind == TOGGLE:
+        row = st.items.get(req["item"])
+        if row is None:
+            raise KeyError(f"Unknown item: {req['item']}")
+        if req["checked"] is None or row.checked(day) != req["checked"]:
+            uc_insp.toggle_item(st, req["item"], day)
+    else:
+        uc_insp.set_sign(st, day, req["text"])
+
+# --- 実行 ---
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, token: Optional[str] = None) -> None:
+    """Ctrl+C まで待ち受ける。token を省略すると settings.json の "service_token" を使う"""
+    token = token or str(get_setting(TOKEN_SETTING, "") or "")
+
+    async def run() -> None:
+        service = Service(token)
+        await service.start(host, port)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await service.stop()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        LOGGER.info("Service stopped.")
+
+class BackgroundService:
+    """別スレッドのイベントループで Service を動かす（負荷試験・検証用）"""
+
+    def __init__(self, token: str, host: str = DEFAULT_HOST, port: int = 0, max_batch: int = MAX_BATCH) -> None:
+        self.service = Service(token, max_batch)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="service-loop", daemon=True)
+        self._thread.start()
+        self.port = asyncio.run_coroutine_threadsafe(self.service.start(host, port), self.loop).result()
+
+    def close(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.service.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
@@ -0,0 +1,129 @@
+try:
+    import FreeSimpleGUI as sg
+except Exception:
+    import PySimpleGUI as sg
+from typing import Any, Dict, List, Tuple
+
+MAX_DAYS = 31
+EMPTY_LABEL = "　"
+
+# グリッドを載せる Column のキー（main_ui と共有）と、項目行を入れる内側の Column
+GRID_KEY = "-I-GRID-"
+ROWS_KEY = "-I-ROWS-"
+
+def check_key(row: int, day: int) -> str:
+    return f"-I-CHECK_{row}_{day}-"
+
+def sign_key(day: int) -> str:
+    return f"-I-SIGN_{day}-"
+
+def parse_check_key(key: str) -> Tuple[int, int]:
+    """check_key の逆変換 -> (行番号, 日)"""
+    row, day = key.replace("-I-CHECK_", "").rstrip("-").split("_")
+    return int(row), int(day)
+
+def _row_key(row: int) -> str:
+    return f"-I-ROW_{row}-"
+
+def _item_key(row: int) -> str:
+    return f"-I-ITEM_{row}-"
+
+def _day_keys(day: int, rows: int) -> List[str]:
+    # 日ごとに表示/非表示を切り替える要素（見出し・各行のボタン・サイン欄）
+    return [f"-I-DAY_{day}-"] + [check_key(r, day) for r in range(rows)] + [sign_key(day)]
+
+class InspectionGrid:
+    """
+    点検表のウィジェットを使い回すグリッド。
+    キーは点検項目名ではなく行番号で振り、読込のたびに作り直さず差分だけ更新する。
+    - ラベル・○：前回表示した値と違うものだけ update
+    - 28〜31日：29〜31日の列を表示/非表示
+    - 項目数：足りない行は extend_layout で追加、余った行は非表示
+    """
+
+    def __init__(self, font, rows: int = 0) -> None:
+        self.font = font
+        self.rows = rows              # 作成済みの行数
+        self.items: List[str] = []    # 行番号 -> 表示中の点検項目
+        self._shown: Dict[Tuple[str, str], Any] = {}   # (キー, 属性) -> 表示中の値
+
+    # --- レイアウト ---
+    def layout(self) -> List[list]:
+        header = [sg.Text("点検項目", size=(18,1), font=self.font)]
+        header += [sg.Text(str(d), size=(3,1), justification="center", font=self.font, key=f"-I-DAY_{d}-")
+                   for d in range(1, MAX_DAYS+1)]
+        sign_row = [sg.Text("サイン", size=(18,1), font=self.font)]
+        sign_row += [sg.Input("", key=sign_key(d), size=(4,1), pad=(1,1)) for d in range(1, MAX_DAYS+1)]
+        for d in range(1, MAX_DAYS+1):
+            self._seed(f"-I-DAY_{d}-", visible=True)
+            self._seed(sign_key(d), visible=True)
+        rows = sg.Column(self._row_layouts(0, self.rows), pad=(0,0), key=ROWS_KEY)
+        return [header, [rows], sign_row]
+
+    def _row_layouts(self, start: int, stop: int) -> List[list]:
+        rows = []
+        for r in range(start, stop):
+            line = [sg.Text("", size=(18,1), font=self.font, key=_item_key(r))]
+            line += [sg.Button(EMPTY_LABEL, key=check_key(r, d), size=(2,1), pad=(1,1)) for d in range(1, MAX_DAYS+1)]
+            rows.append([sg.pin(sg.Column([line], pad=(0,0), key=_row_key(r)))])
+            self._seed(_row_key(r), visible=True)
+            self._seed(_item_key(r), value="")
+            for d in range(1, MAX_DAYS+1):
+                self._seed(check_key(r, d), visible=True, text=EMPTY_LABEL)
+        return rows
+
+    def _seed(self, key: str, **kw) -> None:
+        # 作成時の値を「表示中」として記録しておき、初回表示でも差分だけ更新する
+        for k, v in kw.items():
+            self._shown[(key, k)] = v
+
+    # --- 差分 ---
+    def plan(self, state) -> Tuple[int, List[Tuple[str, Dict[str, Any]]]]:
+        """
+        state を表示するのに必要な (追加する行数, [(キー, update の引数), ...]) を返す（画面には触らない）。
+        表示/非表示は日の昇順に並べる（再表示した要素は行末に戻るため）。
+        """
+        items = list(state.items.keys())
+        num_days = state.num_days
+        rows = max(self.rows, len(items))
+        ups: List[Tuple[str, Dict[str, Any]]] = []
+
+        def put(key: str, **kw) -> None:
+            if any(self._shown.get((key, k)) != v for k, v in kw.items()):
+                ups.append((key, kw))
+
+        for r in range(rows):
+            put(_row_key(r), visible=r < len(items))
+        for d in range(1, MAX_DAYS+1):
+            for key in _day_keys(d, rows):
+                put(key, visible=d <= num_days)
+        for r, it in enumerate(items):
+            put(_item_key(r), value=it)
+            row = state.items[it]
+            for d in range(1, num_days+1):
+                put(check_key(r, d), text=row[d-1] or EMPTY_LABEL)
+        # サイン欄は利用者が入力して値が変わっているので毎回入れ直す
+        for d in range(1, num_days+1):
+            ups.append((sign_key(d), {"value": state.sign[d-1]}))
+        return rows - self.rows, ups
+
+    def show(self, window, state) -> int:
+        """state を表示する。戻り値: 実際に update した要素数"""
+        grow, ups = self.plan(state)
+        if grow:
+            window.extend_layout(window[ROWS_KEY], self._row_layouts(self.rows, self.rows + grow))
+            self.rows += grow
+            # 新しい行の日列も月の日数に合わせる
+            grow, ups = self.plan(state)
+        for key, kw in ups:
+            window[key].update(**kw)
+            for k, v in kw.items():
+                self._shown[(key, k)] = v
+        self.items = list(state.items.keys())
+        window[GRID_KEY].contents_changed()
+        return len(ups)
+
+    def refresh_cell(self, window, state, row: int, day: int) -> None:
+        label = state.items[self.items[row]][day-1] or EMPTY_LABEL
+        window[check_key(row, day)].update(label)
+        self._shown[(check_key(row, day), "text")] = label
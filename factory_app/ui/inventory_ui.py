@@ -4,13 +4,13 @@ try:
 except Exception:
     import PySimpleGUI as sg
 from datetime import datetime
-import pandas as pd
-from ..usecase import inventory as uc
-from ..infra.inventory_repo import ENC
+from ..infra.fifo import FIFO, FEFO
+from .workers import WORKER_DONE, WORKER_ERROR, WORKER_PROGRESS
 
 DATE_TODAY = datetime.now().strftime("%Y/%m/%d")
 
 TABLE_KEY = "-INV-TABLE-"
+PM_SEARCH = "-INV-PRODUCT-SEARCH-"
 PM_COMBO_KEY = "-INV-PRODUCT-"
 EXP_IN = "-INV-EXP-"
 IN_IN = "-INV-IN-"
@@ -18,37 +18,171 @@ QTY_IN = "-INV-QTY-"
 BTN_INBOUND = "-INV-INBOUND-"
 BTN_OUTBOUND = "-INV-OUTBOUND-"
 BTN_RETURN = "-INV-RETURN-"
+BTN_IMPORT = "-INV-IMPORT-"
 MSG_TXT = "-INV-MSG-"
+FEFO_CHK = "-INV-FEFO-"
+# 在庫表の絞り込み・並べ替え・ページ送り
+FILTER_PRODUCT = "-INV-FILTER-PRODUCT-"
+FILTER_EXP_FROM = "-INV-FILTER-EXP-FROM-"
+FILTER_EXP_TO = "-INV-FILTER-EXP-TO-"
+FILTER_HIDE_ZERO = "-INV-FILTER-HIDE-ZERO-"
+SORT_COMBO = "-INV-SORT-"
+SORT_DESC = "-INV-SORT-DESC-"
+BTN_FILTER = "-INV-FILTER-"
+BTN_PREV = "-INV-PREV-"
+BTN_NEXT = "-INV-NEXT-"
+PAGE_TXT = "-INV-PAGE-"
+# 期限切れ・期限間近の件数と一覧
+EXPIRY_TXT = "-INV-EXPIRY-"
+BTN_EXPIRY = "-INV-EXPIRY-LIST-"
+# バックグラウンド処理の tag と、在庫ファイルへの処理を直列化する target
+TAG_OP = "-INV-OP-"
+TAG_IMPORT = "-INV-IMPORT-"
+TAG_LOAD = "-INV-LOAD-"
+TAG_INDEX = "-INV-INDEX-"
+TAG_PAGE = "-INV-PAGE-"
+TAG_EXPIRY = "-INV-EXPIRY-"
+TAG_EXPIRY_LIST = "-INV-EXPIRY-LIST-"
+TARGET = "inventory"
 
-def _df_to_values(df: pd.DataFrame):
-    if df.empty:
-        return []
-    return df.values.tolist()
+# 並べ替えの選択肢（表示名 → 列）
+SORT_LABELS = {"製品": "product_code", "賞味期限": "exp_date", "入庫日": "in_date", "数量": "qty", "更新時刻": "updated_at"}
+# 1ページの行数（infra.inventory_view.PAGE_SIZE と同じ。ここで import すると起動時に pandas を読むため定数で持つ）
+PAGE_ROWS = 100
 
-def build_tab():
-    inv_df, pm_df = uc.load_tables()
-    pm_values = pm_df["product_code"].dropna().astype(str).tolist()
+# 製品の候補の表示（コード + 製品名）
+LABEL_SEP = "  "
+# 製品検索の索引（バックグラウンドで作ったものを受け取る。検索は画面のスレッドで行う）
+_INDEX = None
+# 表示中のページの先頭行と、条件に合う行数
+_OFFSET = 0
+_TOTAL = 0
+
+# usecase.inventory（pandas）は画面を出した後にバックグラウンドで読み込む。
+# 以降の処理はすべてその後に同じ TARGET の順で実行されるので、各関数の中で import しても待たない。
+
+def _load_first_page():
+    from ..usecase import inventory as uc
+    return uc.product_index(), uc.table_page(), uc.expiry_summary()
+
+def _product_index():
+    from ..usecase import inventory as uc
+    return uc.product_index()
+
+def _code_of(label: str) -> str:
+    return (label or "").split(LABEL_SEP, 1)[0].strip()
 
+def _show_matches(window, text: str) -> None:
+    """入力中の文字で製品を絞り込み、上位の候補だけを選択肢にする（選択中の製品が残っていれば維持）"""
+    if _INDEX is None:
+        return
+    labels = [f"{code}{LABEL_SEP}{name}" if name else code for code, name in _INDEX.search(text)]
+    current = window[PM_COMBO_KEY].get()
+    window[PM_COMBO_KEY].update(values=labels, value=current if current in labels else (labels[0] if labels else ""))
+
+def build_tab():
+    """在庫タブ（中身は空。start で読み込む）"""
     layout = [
-        [sg.Text("製品"), sg.Combo(pm_values, key=PM_COMBO_KEY, size=(20,1), enable_events=True),
+        [sg.Text("製品"), sg.Input("", key=PM_SEARCH, size=(12,1), enable_events=True,
+                                   tooltip="製品コード・製品名の一部（かな・カナ・全角・半角を問わない）"),
+         sg.Combo([], key=PM_COMBO_KEY, size=(32,1), readonly=True),
          sg.Text("賞味期限"), sg.Input(DATE_TODAY, key=EXP_IN, size=(12,1)),
          sg.Text("入庫日"), sg.Input(DATE_TODAY, key=IN_IN, size=(12,1)),
          sg.Text("数量"), sg.Input("0", key=QTY_IN, size=(8,1)),
          sg.Button("入庫", key=BTN_INBOUND),
          sg.Button("出庫", key=BTN_OUTBOUND),
-         sg.Button("戻し", key=BTN_RETURN)],
-        [sg.Text("", key=MSG_TXT, size=(80,1))],
-        [sg.Table(values=_df_to_values(inv_df),
-                  headings=["製品","賞味期限","入庫日","数量","更新時刻"],
+         sg.Button("戻し", key=BTN_RETURN),
+         sg.Button("一括取込", key=BTN_IMPORT),
+         sg.Checkbox("期限の早い順で出庫(FEFO)", key=FEFO_CHK, default=False)],
+        [sg.Text("在庫を読み込み中…", key=MSG_TXT, size=(80,1))],
+        [sg.Text("", key=EXPIRY_TXT, size=(64,1)), sg.Button("期限一覧", key=BTN_EXPIRY)],
+        [sg.Text("絞り込み 製品"), sg.Input("", key=FILTER_PRODUCT, size=(12,1)),
+         sg.Text("賞味期限"), sg.Input("", key=FILTER_EXP_FROM, size=(12,1)),
+         sg.Text("〜"), sg.Input("", key=FILTER_EXP_TO, size=(12,1)),
+         sg.Checkbox("数量0を隠す", key=FILTER_HIDE_ZERO, default=False, enable_events=True),
+         sg.Text("並び"), sg.Combo(list(SORT_LABELS), default_value="製品", key=SORT_COMBO, size=(10,1),
+                                   readonly=True, enable_events=True),
+         sg.Checkbox("降順", key=SORT_DESC, default=False, enable_events=True),
+         sg.Button("絞り込み", key=BTN_FILTER)],
+        [sg.Table(values=[],
+                  headings=["製品","製品名","賞味期限","入庫日","数量","更新時刻"],
                   key=TABLE_KEY, auto_size_columns=False,
-                  col_widths=[18,12,12,8,20],
-                  num_rows=12, enable_events=False, justification="left")]
+                  col_widths=[12,24,12,12,8,20],
+                  num_rows=12, enable_events=False, justification="left")],
+        [sg.Button("◀ 前へ", key=BTN_PREV), sg.Text("", key=PAGE_TXT, size=(24,1)), sg.Button("次へ ▶", key=BTN_NEXT)]
     ]
     return sg.Tab("在庫", layout, key="-INV-TAB-")
 
-def handle_event(ev, vals, window):
+def start(runner) -> None:
+    """画面を出した後に呼ぶ。製品マスタと在庫表の先頭ページをバックグラウンドで読み込む。"""
+    runner.submit(TARGET, TAG_LOAD, _load_first_page)
+
+def _query(vals):
+    from ..infra.inventory_view import ViewQuery
+    return ViewQuery(vals.get(FILTER_PRODUCT, ""), vals.get(FILTER_EXP_FROM, ""), vals.get(FILTER_EXP_TO, ""),
+                     bool(vals.get(FILTER_HIDE_ZERO)), SORT_LABELS.get(vals.get(SORT_COMBO), "product_code"),
+                     bool(vals.get(SORT_DESC)))
+
+def _show_page(window, page) -> None:
+    """表示中のページだけを表へ渡す（全件は渡さない）"""
+    global _OFFSET, _TOTAL
+    _OFFSET, _TOTAL = page.offset, page.total
+    window[TABLE_KEY].update(values=page.rows)
+    text = f"{page.offset + 1}〜{page.offset + len(page.rows)}行 / {page.total}行" if page.rows else f"0行 / {page.total}行"
+    window[PAGE_TXT].update(text)
+
+def _show_expiry(window, summary) -> None:
+    text = (f"期限切れ {summary['expired']}ロット（{summary['expired_qty']:g}）／ "
+            f"{summary['days']}日以内に期限 {summary['near']}ロット（{summary['near_qty']:g}）")
+    window[EXPIRY_TXT].update(text, text_color="red" if summary["expired"] else sg.theme_text_color())
+
+def _refresh(runner, uc) -> None:
+    """移動の後：変更行だけ取り込んで表示中のページと期限の件数を出し直す"""
+    runner.submit(TARGET, TAG_PAGE, uc.table_page, None, _OFFSET, PAGE_ROWS)
+    runner.submit(TARGET, TAG_EXPIRY, uc.expiry_summary)
+
+def handle_event(ev, vals, window, runner):
+    """在庫タブのイベント。ファイルを読み書きする処理は runner（TaskRunner）で実行し、結果は _on_result で反映する。"""
+    if ev in (WORKER_DONE, WORKER_ERROR, WORKER_PROGRESS):
+        tag, value = vals[ev]
+        if ev == WORKER_DONE:
+            _on_result(tag, value, window, runner)
+        else:
+            window[MSG_TXT].update(value if ev == WORKER_PROGRESS else f"エラー: {value}")
+        return
+    if ev == PM_SEARCH:
+        _show_matches(window, vals.get(PM_SEARCH, ""))
+        return
+
+    policy = FEFO if vals and vals.get(FEFO_CHK) else FIFO
+    if ev not in (BTN_IMPORT, BTN_INBOUND, BTN_OUTBOUND, BTN_RETURN, BTN_EXPIRY,
+                  BTN_FILTER, FILTER_HIDE_ZERO, SORT_COMBO, SORT_DESC, BTN_PREV, BTN_NEXT):
+        return
+    from ..usecase import inventory as uc
+    if ev == BTN_EXPIRY:
+        runner.submit(TARGET, TAG_EXPIRY_LIST, uc.expiry_report)
+        return
+    if ev in (BTN_FILTER, FILTER_HIDE_ZERO, SORT_COMBO, SORT_DESC):
+        runner.submit(TARGET, TAG_PAGE, uc.table_page, _query(vals), 0, PAGE_ROWS)
+        return
+    if ev in (BTN_PREV, BTN_NEXT):
+        if ev == BTN_PREV and _OFFSET > 0:
+            runner.submit(TARGET, TAG_PAGE, uc.table_page, None, max(_OFFSET - PAGE_ROWS, 0), PAGE_ROWS)
+        elif ev == BTN_NEXT and _OFFSET + PAGE_ROWS < _TOTAL:
+            runner.submit(TARGET, TAG_PAGE, uc.table_page, None, _OFFSET + PAGE_ROWS, PAGE_ROWS)
+        return
+    if ev == BTN_IMPORT:
+        path = sg.popup_get_file("移動ファイル（CSV: op, product_code, exp_date, in_date, qty）を選択",
+                                 file_types=(("CSV", "*.csv"),))
+        if not path:
+            return
+        window[MSG_TXT].update("一括取込を受け付けました。")
+        runner.submit(TARGET, TAG_IMPORT, uc.import_movements, path, policy, progress=True, table=False)
+        _refresh(runner, uc)
+        return
+
     if ev in (BTN_INBOUND, BTN_OUTBOUND, BTN_RETURN):
-        code = vals.get(PM_COMBO_KEY, "")
+        code = _code_of(vals.get(PM_COMBO_KEY, ""))
         exp = vals.get(EXP_IN, "")
         ind = vals.get(IN_IN, "")
         qty = vals.get(QTY_IN, "")
@@ -57,12 +191,54 @@ def handle_event(ev, vals, window):
             return
 
         if ev == BTN_INBOUND:
-            ok, msg, df = uc.inbound(code, exp, ind, qty)
+            runner.submit(TARGET, TAG_OP, uc.inbound, code, exp, ind, qty, table=False)
         elif ev == BTN_OUTBOUND:
-            ok, msg, df = uc.outbound(code, exp, qty)
+            runner.submit(TARGET, TAG_OP, uc.outbound, code, exp, qty, policy, table=False)
         else:
-            ok, msg, df = uc.return_in(code, exp, ind, qty)
+            runner.submit(TARGET, TAG_OP, uc.return_in, code, exp, ind, qty, table=False)
+        _refresh(runner, uc)
 
+def _on_result(tag, result, window, runner=None):
+    global _INDEX
+    if tag == TAG_PAGE:
+        _show_page(window, result)
+        return
+    if tag == TAG_EXPIRY:
+        _show_expiry(window, result)
+        return
+    if tag == TAG_EXPIRY_LIST:
+        labels = {"expired": "期限切れ", "near": "期限間近"}
+        lines = [f"{labels[r.status]}  {r.product_code} {r.product_name}  期限 {r.exp_date}（残り{r.days_left}日）"
+                 f"  入庫 {r.in_date}  数量 {r.qty:g}" for r in result.itertuples(index=False)]
+        sg.popup_scrolled("\n".join(lines) or "期限切れ・期限間近の在庫はありません。",
+                          title=f"賞味期限 {result.attrs['date']} 基準（{result.attrs['days']}日以内）", non_blocking=True)
+        return
+    if tag in (TAG_LOAD, TAG_INDEX):
+        index = result[0] if tag == TAG_LOAD else result
+        if index is not _INDEX:   # 製品マスタが変わったときだけ作り直されて別の索引になる
+            _INDEX = index
+            _show_matches(window, window[PM_SEARCH].get())
+        if tag == TAG_LOAD:
+            _show_page(window, result[1])
+            _show_expiry(window, result[2])
+            window[MSG_TXT].update("")
+        return
+    if runner is not None:
+        # 製品マスタの変更を取り込む（変わっていなければ索引はそのまま）
+        runner.submit(TARGET, TAG_INDEX, _product_index)
+    if tag == TAG_IMPORT:
+        ok, msg, report, _ = result
         window[MSG_TXT].update(msg)
-        # テーブル更新（headingsは作成時のみ指定、updateは値だけ）
-        window[TABLE_KEY].update(values=_df_to_values(df))
+        if not ok and not report.empty:
+            errs = report[~report["ok"]]
+            lines = [f"{r.line}行目: {r.message}" for r in errs.itertuples(index=False)]
+            sg.popup_scrolled("\n".join(lines), title="取込エラー", non_blocking=True)
+        return
+    ok, msg, _ = result
+    # 表は続けて実行される TAG_PAGE（変更行だけ取り込んだページ）で更新する
+    window[MSG_TXT].update(msg)
+
+def on_close():
+    # 終了時に移動ジャーナルを inventory.csv へ畳み込んでおく
+    from ..usecase import inventory as uc
+    uc.compact()
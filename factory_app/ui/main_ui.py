@@ -1,5 +1,6 @@
 
 # NOTE: FreeSimpleGUIのAPIに合わせています（PySimpleGUIでも多くは互換）。
+import copy
 import os
 from datetime import datetime
 try:
@@ -7,10 +8,13 @@ try:
 except Exception:
     import PySimpleGUI as sg
 
-from ..infra.logging_conf import get_logger
+from ..infra.logging_conf import get_logger, configure_metrics
 from ..usecase import inspection as uc
-from ..infra import repo
-from .inventory_ui import build_tab as build_inv_tab, handle_event as handle_inv_event
+from ..infra import repo, settings
+from .inspection_grid import InspectionGrid, GRID_KEY, parse_check_key, sign_key
+from .workers import TaskRunner, WORKER_DONE, WORKER_ERROR, WORKER_PROGRESS
+from .inventory_ui import build_tab as build_inv_tab, handle_event as handle_inv_event, on_close as on_inv_close, \
+    start as start_inv
 
 LOGGER = get_logger(__name__)
 
@@ -18,39 +22,15 @@ LOGGER = get_logger(__name__)
 I_LOAD = "-I-LOAD-"
 I_SAVE = "-I-SAVE-"
 I_EXPORT = "-I-EXPORT-"
+I_EXPORT_MONTH = "-I-EXPORT-MONTH-"
 I_SET_EXCEL = "-I-SET-EXCEL-"
 I_YEAR = "-I-YEAR-"
 I_MONTH = "-I-MONTH-"
 I_MACHINE = "-I-MACHINE-"
 I_TYPE = "-I-TYPE-"
-I_GRID = "-I-GRID-"
+I_GRID = GRID_KEY
 I_EXCEL_TXT = "-I-EXCEL-PATH-TXT-"
-
-def _grid_layout(state, font):
-    items = list(state.items.keys())
-    num_days = state.num_days
-    header = [sg.Text("点検項目", size=(18,1), font=font)]
-    header += [sg.Text(str(d), size=(3,1), justification="center", font=font) for d in range(1, num_days+1)]
-
-    rows = []
-    rows.append(header)
-    for it in items:
-        line = [sg.Text(it, size=(18,1), font=font)]
-        row = state.items[it]
-        for d in range(1, num_days+1):
-            key = f"-I-CHECK_{it}_{d}-"
-            label = row[d-1] if row[d-1] else "　"
-            line.append(sg.Button(label, key=key, size=(2,1), pad=(1,1)))
-        rows.append(line)
-
-    # サイン行
-    sign_row = [sg.Text("サイン", size=(18,1), font=font)]
-    for d in range(1, num_days+1):
-        key = f"-I-SIGN_{d}-"
-        sign_row.append(sg.Input(state.sign[d-1], key=key, size=(4,1), pad=(1,1)))
-    rows.append(sign_row)
-
-    return rows
+BUSY_TXT = "-BUSY-"
 
 def build_inspection_tab():
     sg.theme("DarkBlue3")
@@ -59,82 +39,144 @@ def build_inspection_tab():
     now = datetime.now()
     year_spin = sg.Spin(values=list(range(now.year-1, now.year+3)), initial_value=now.year, key=I_YEAR)
     month_spin = sg.Spin(values=list(range(1,13)), initial_value=now.month, key=I_MONTH)
-    machine_combo = sg.Combo(values=["1番充填","2番充填","3番充填"], default_value="1番充填", key=I_MACHINE, readonly=True, size=(12,1))
-    type_combo = sg.Combo(values=["始業前点検","保全点検"], default_value="始業前点検", key=I_TYPE, readonly=True, size=(12,1))
+    machines, type_names = uc.machines(), uc.type_names()
+    machine_combo = sg.Combo(values=machines, default_value=machines[0], key=I_MACHINE, readonly=True, size=(12,1))
+    type_combo = sg.Combo(values=type_names, default_value=type_names[0], key=I_TYPE, readonly=True, size=(12,1))
 
     top = [
         [sg.Text("年"), year_spin, sg.Text("月"), month_spin, sg.Text("機械"), machine_combo, sg.Text("種別"), type_combo,
-         sg.Button("読込/新規", key=I_LOAD), sg.Button("保存", key=I_SAVE), sg.Button("Excel出力", key=I_EXPORT)]
+         sg.Button("読込/新規", key=I_LOAD), sg.Button("保存", key=I_SAVE), sg.Button("Excel出力", key=I_EXPORT),
+         sg.Button("月末一括出力", key=I_EXPORT_MONTH)]
     ]
 
-    st = uc.load_or_init_state(type_combo.DefaultValue, int(year_spin.DefaultValue), int(month_spin.DefaultValue), machine_combo.DefaultValue)
-    grid_container = sg.Column(_grid_layout(st, font), key=I_GRID, scrollable=True, vertical_scroll_only=True, expand_x=True, expand_y=True, pad=(0,0))
+    # 最初の月は画面を出してから TaskRunner で読み込む（初回の旧 JSON の取り込みも画面を止めない）。
+    # ウィジェットは使い回す（読込のたびに作り直さない）。行数はマスタの項目数で作っておき、値は読込後に grid.show で入れる。
+    grid = InspectionGrid(font, rows=len(repo.default_items(type_names[0], machines[0])))
+    grid_container = sg.Column(grid.layout(), key=I_GRID, scrollable=True, vertical_scroll_only=True, expand_x=True, expand_y=True, pad=(0,0))
 
-    peek_path = repo.peek_excel_path_for_month(st.type_name, st.year, st.month) or "（未設定）"
+    peek_path = repo.peek_excel_path_for_month(type_names[0], now.year, now.month) or "（未設定）"
     bottom = [
         [sg.Text("Excel保存先（参照時は未設定でもOK）："), sg.Text(peek_path, key=I_EXCEL_TXT),
          sg.Button("この年月のExcel保存先を設定", key=I_SET_EXCEL)]
     ]
 
     layout = top + [[grid_container]] + bottom
-    return sg.Tab("点検", layout, key="-I-TAB-"), st, font
-
-def rerender_grid(window, state, font):
-    cont = window[I_GRID]
-    if hasattr(cont, "Widget"):
-        for child in cont.Widget.winfo_children():
-            try:
-                child.destroy()
-            except Exception:
-                pass
-    cont.Widget.update()
-    cont.Layout(_grid_layout(state, font))
-    cont.Widget.update()
+    return sg.Tab("点検", layout, key="-I-TAB-"), grid
 
 def build_window():
     # 点検タブ
-    i_tab, i_state, i_font = build_inspection_tab()
+    i_tab, i_grid = build_inspection_tab()
     # 在庫タブ
     v_tab = build_inv_tab()
 
     tabs = sg.TabGroup([[i_tab, v_tab]], expand_x=True, expand_y=True, key="-TABGROUP-")
-    win = sg.Window("工場アプリ（点検・在庫 統合版）", [[tabs]], resizable=True, finalize=True)
-    return win, i_state, i_font
+    layout = [[tabs], [sg.Text("", key=BUSY_TXT, size=(40,1))]]
+    win = sg.Window("工場アプリ（点検・在庫 統合版）", layout, resizable=True, finalize=True)
+    return win, i_grid
+
+def _state_target(type_name, year, month, machine) -> str:
+    # 同じ月次ファイルへの読込・保存は投入順に実行する
+    return repo.monthly_state_path(type_name, year, month, machine)
+
+def _submit_load(runner, vals) -> None:
+    """画面で選んだ年月・機械・種別の点検状態をバックグラウンドで読み込む（結果は I_LOAD）"""
+    year = int(vals[I_YEAR]); month = int(vals[I_MONTH]); machine = vals[I_MACHINE]; type_name = vals[I_TYPE]
+    runner.submit(_state_target(type_name, year, month, machine), I_LOAD,
+                  uc.load_or_init_state, type_name, year, month, machine)
+
+def _read_signs(state, vals) -> None:
+    for d in range(1, state.num_days+1):
+        uc.set_sign(state, d, vals.get(sign_key(d), ""))
+
+def _save_copy(snap):
+    """保存に出した時点の内容・保存先・保存後の写しを返す（画面側の state は GUI スレッドで更新する）"""
+    submitted = snap.to_dict()
+    path = uc.save_state(snap)
+    return path, submitted, snap
+
+def _refresh_masters(window, vals, seen: int) -> int:
+    """settings.json が変わっていたら機械・種別の選択肢を入れ直す。戻り値: 反映済みの設定の版"""
+    version = settings.settings_version()
+    if version != seen:
+        for key, values in ((I_MACHINE, uc.machines()), (I_TYPE, uc.type_names())):
+            current = vals.get(key) if vals else None
+            window[key].update(value=current if current in values else values[0], values=values)
+    return version
+
+def _same_doc(a, b) -> bool:
+    return (a.type_name, a.year, a.month, a.machine) == (b.type_name, b.year, b.month, b.machine)
 
 def main_loop():
-    window, i_state, i_font = build_window()
+    configure_metrics(settings.get_setting("metrics"))
+    window, i_grid = build_window()
+    runner = TaskRunner(window)
+    # 点検の当月と在庫は画面を出してから読み込む
+    i_state = None
+    _submit_load(runner, {k: window[k].get() for k in (I_YEAR, I_MONTH, I_MACHINE, I_TYPE)})
+    start_inv(runner)
+    masters_seen = settings.settings_version()
     while True:
         ev, vals = window.read(timeout=100)
         if ev in (sg.WIN_CLOSED, None):
             break
+        if ev == sg.TIMEOUT_EVENT:
+            masters_seen = _refresh_masters(window, vals, masters_seen)
+
+        # --- バックグラウンド処理の結果 ---
+        if ev in (WORKER_DONE, WORKER_ERROR, WORKER_PROGRESS) and not vals[ev][0].startswith("-I-"):
+            handle_inv_event(ev, vals, window, runner)
+
+        elif ev == WORKER_ERROR:
+            tag, msg = vals[ev]
+            sg.popup_no_wait(f"エラー：\n{msg}")
+
+        elif ev == WORKER_DONE:
+            tag, result = vals[ev]
+            if tag == I_LOAD:
+                i_state = result
+                i_grid.show(window, i_state)
+                peek = repo.peek_excel_path_for_month(i_state.type_name, i_state.year, i_state.month) or "（未設定）"
+                window[I_EXCEL_TXT].update(peek)
+            elif tag == I_SAVE:
+                path, submitted, saved = result
+                if _same_doc(i_state, saved):
+                    # 保存中に画面で入力した分は残し、他端末とのマージ結果と版を取り込む
+                    _read_signs(i_state, vals)
+                    uc.adopt_saved(i_state, submitted, saved)
+                    i_grid.show(window, i_state)
+                sg.popup_no_wait(f"保存しました：\n{path}")
+            elif tag == I_EXPORT:
+                sg.popup_no_wait(f"Excel出力完了：\n{result}")
+            elif tag == I_EXPORT_MONTH:
+                sg.popup_no_wait("一括出力完了：\n" + "\n".join(result))
 
         # --- 点検 ---
-        if ev == I_LOAD:
-            year = int(vals[I_YEAR]); month = int(vals[I_MONTH]); machine = vals[I_MACHINE]; type_name = vals[I_TYPE]
-            i_state = uc.load_or_init_state(type_name, year, month, machine)
-            rerender_grid(window, i_state, i_font)
-            peek = repo.peek_excel_path_for_month(type_name, year, month) or "（未設定）"
-            window[I_EXCEL_TXT].update(peek)
+        elif ev == I_LOAD:
+            _submit_load(runner, vals)
+
+        elif i_state is None and (ev in (I_SAVE, I_EXPORT, I_SET_EXCEL) or str(ev).startswith("-I-CHECK_")):
+            pass   # 最初の月を読み込むまでは編集・保存しない
 
         elif ev == I_SAVE:
-            for d in range(1, i_state.num_days+1):
-                s = vals.get(f"-I-SIGN_{d}-", "")
-                uc.set_sign(i_state, d, s)
-            path = uc.save_state(i_state)
-            sg.popup_no_wait(f"保存しました：\n{path}")
+            _read_signs(i_state, vals)
+            runner.submit(_state_target(i_state.type_name, i_state.year, i_state.month, i_state.machine), I_SAVE,
+                          _save_copy, copy.deepcopy(i_state))
 
         elif ev == I_EXPORT:
-            for d in range(1, i_state.num_days+1):
-                s = vals.get(f"-I-SIGN_{d}-", "")
-                uc.set_sign(i_state, d, s)
+            _read_signs(i_state, vals)
             peek = repo.peek_excel_path_for_month(i_state.type_name, i_state.year, i_state.month)
             if peek and os.path.isdir(os.path.dirname(peek)):
                 save_path = peek
             else:
-                fname = f"{i_state.type_name}_{i_state.year}-{i_state.month:02d}_{i_state.machine}.xlsx".replace("/", "_")
-                save_path = os.path.join(os.getcwd(), fname)
-            out = uc.export_excel(i_state, save_path)
-            sg.popup_no_wait(f"Excel出力完了：\n{out}")
+                save_path = os.path.join(os.getcwd(), uc.sheet_file_name(i_state))
+            runner.submit(save_path, I_EXPORT, uc.export_excel, copy.deepcopy(i_state), save_path)
+
+        elif ev == I_EXPORT_MONTH:
+            # 選択中の年月について 機械 × 種別 をすべて1ブックへ（未保存の画面の変更は含まない）
+            out_dir = sg.popup_get_folder("出力先フォルダを選択", default_path=os.getcwd())
+            if out_dir:
+                year = int(vals[I_YEAR]); month = int(vals[I_MONTH])
+                runner.submit(out_dir, I_EXPORT_MONTH, uc.export_excel_batch, year, [month], out_dir)
 
         elif ev == I_SET_EXCEL:
             try:
@@ -147,16 +189,20 @@ def main_loop():
 
         elif isinstance(ev, str) and ev.startswith("-I-CHECK_"):
             try:
-                _, item, day = ev.replace("-I-CHECK_", "").rstrip("-").split("_", 2)
-                day = int(day)
-                uc.toggle_item(i_state, item, day)
-                label = i_state.items[item][day-1] if i_state.items[item][day-1] else "　"
-                window[ev].update(label)
+                row, day = parse_check_key(ev)
+                uc.toggle_item(i_state, i_grid.items[row], day)
+                i_grid.refresh_cell(window, i_state, row, day)
             except Exception as e:
                 LOGGER.error(e)
 
         # --- 在庫 ---
         else:
-            handle_inv_event(ev, vals, window)
+            handle_inv_event(ev, vals, window, runner)
+
+        if ev != sg.TIMEOUT_EVENT:
+            window[BUSY_TXT].update(f"処理中…（{runner.pending}件）" if runner.pending else "")
 
     window.close()
+    # 保存待ちを書き切ってから在庫を畳み込む
+    runner.shutdown()
+    on_inv_close()
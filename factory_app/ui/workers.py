@@ -0,0 +1,80 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import Any, Callable, Deque, Dict, Tuple
+from ..infra.logging_conf import get_logger
+
+LOGGER = get_logger(__name__)
+
+# window.read() に返るイベント。値は (tag, 結果 / エラーメッセージ / 進捗メッセージ)
+WORKER_DONE = "-WORKER-DONE-"
+WORKER_ERROR = "-WORKER-ERROR-"
+WORKER_PROGRESS = "-WORKER-PROGRESS-"
+
+class TaskRunner:
+    """
+    ファイル入出力（保存・Excel出力・在庫更新）をスレッドプールで実行し、結果を window イベントで返す。
+    - 同じ target（保存先ファイルなど）への処理は投入順に1件ずつ実行する
+    - 別の target 同士は並行に実行する
+    GUI スレッドからは submit と pending だけを呼ぶ。window へは write_event_value のみで触る。
+    """
+
+    def __init__(self, window, max_workers: int = 4) -> None:
+        self.window = window
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="factory-io")
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[Tuple[str, Callable, tuple, dict]]] = {}
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """実行中 + 待ちの件数（処理中表示用）"""
+        return self._pending
+
+    def submit(self, target: str, tag: str, fn: Callable, *args, progress: bool = False, **kwargs) -> None:
+        """
+        fn(*args, **kwargs) を実行し、終わったら WORKER_DONE (tag, 戻り値) を送る。例外なら WORKER_ERROR (tag, 文言)。
+        progress=True なら fn に progress=callable(msg) を渡し、WORKER_PROGRESS (tag, msg) として送る。
+        """
+        if progress:
+            kwargs["progress"] = lambda msg: self._post(WORKER_PROGRESS, (tag, msg))
+        with self._lock:
+            self._pending += 1
+            q = self._queues.get(target)
+            if q is not None:
+                q.append((tag, fn, args, kwargs))   # 同じ対象の前の処理が終わってから実行
+                return
+            self._queues[target] = deque()
+        self._pool.submit(self._run, target, tag, fn, args, kwargs)
+
+    def _run(self, target: str, tag: str, fn: Callable, args: tuple, kwargs: dict) -> None:
+        while True:
+            try:
+                result: Any = fn(*args, **kwargs)
+            except Exception as e:
+                LOGGER.exception(f"Background task failed: {tag}")
+                self._finish(WORKER_ERROR, (tag, str(e)))
+            else:
+                self._finish(WORKER_DONE, (tag, result))
+            with self._lock:
+                q = self._queues[target]
+                if not q:
+                    del self._queues[target]
+                    return
+                tag, fn, args, kwargs = q.popleft()
+
+    def _finish(self, event: str, value: tuple) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._post(event, value)
+
+    def _post(self, event: str, value: tuple) -> None:
+        try:
+            self.window.write_event_value(event, value)
+        except Exception:
+            # 終了処理中で window が閉じている
+            LOGGER.debug(f"Window closed; dropped {event} {value[0]}")
+
+    def shutdown(self) -> None:
+        """待ちの処理をすべて終えてから止める（終了時の保存を取りこぼさない）。"""
+        self._pool.shutdown(wait=True)
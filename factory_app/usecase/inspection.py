@@ -1,42 +1,212 @@
 
-from typing import List, Dict, Any
-from dataclasses import asdict
-from ..domain.state import MonthlyState, CIRCLE
-from ..infra import repo
-from ..infra.excel_export import export_monthly_check_sheet
-from ..infra.logging_conf import get_logger
+import calendar, os
+from datetime import date
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
+from ..domain.state import MonthlyState, merge_states
+from ..infra import repo, settings
+from ..infra.locking import ConflictError
+from ..infra.logging_conf import get_logger, instrumented
 
 LOGGER = get_logger(__name__)
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 他端末との保存競合をマージして再試行する回数
+SAVE_RETRIES = 3
+
+def machines() -> List[str]:
+    """機械の一覧（config/settings.json の "machines"）"""
+    return settings.machines()
+
+def type_names() -> List[str]:
+    """点検種別の一覧（config/settings.json の "inspection_types"）"""
+    return settings.type_names()
+
+# 一括出力のファイルの分け方
+PER_SHEET = "sheet"   # 機械 × 種別 × 月 ごとに1ファイル（単票出力と同じ名前）
+PER_MONTH = "month"   # 月ごとに1ファイル（機械 × 種別 のシート）
+PER_YEAR = "year"     # 1ファイルに全シート
+
+# 過去の点検表の取込で、まとめて保存する月数（1回の書き込み = 1トランザクション）
+IMPORT_BATCH = 500
+
+@instrumented("inspection.load_state")
 def load_or_init_state(type_name: str, year: int, month: int, machine: str) -> MonthlyState:
-    data = repo.load_monthly_state(type_name, year, month, machine)
-    items_master = repo.default_items(type_name)
+    data, etag = repo.load_monthly_state_versioned(type_name, year, month, machine)
+    items_master = repo.default_items(type_name, machine)
     if data is None:
         st = MonthlyState(year=year, month=month, machine=machine, type_name=type_name)
-        st.ensure_shapes(items_master)
-        return st
-    st = MonthlyState(**data)
+    else:
+        st = MonthlyState(**data)
     st.ensure_shapes(items_master)
+    st.etag = etag
+    st.base = st.to_dict()
     return st
 
+@instrumented("inspection.save_state")
 def save_state(state: MonthlyState) -> str:
-    return repo.save_monthly_state(state.type_name, state.year, state.month, state.machine, asdict(state))
+    """
+    読み込んだ版のまま保存する。その間に他端末が保存していた場合は、
+    自分が変更したセルを優先して相手の内容とマージし、相手の版に対して保存し直す。
+    """
+    for _ in range(SAVE_RETRIES):
+        try:
+            path, etag = repo.save_monthly_state_versioned(
+                state.type_name, state.year, state.month, state.machine, state.to_dict(), state.etag)
+        except ConflictError as c:
+            theirs = MonthlyState(**c.current) if c.current else MonthlyState(
+                year=state.year, month=state.month, machine=state.machine, type_name=state.type_name)
+            theirs.ensure_shapes(list(state.items.keys()))
+            merge_states(state, state.base or {}, theirs)
+            state.etag = c.etag
+            state.base = theirs.to_dict()
+            LOGGER.warning(f"Merged concurrent edits into {c.path}")
+            continue
+        state.etag = etag
+        state.base = state.to_dict()
+        return path
+    raise ConflictError(repo.monthly_state_path(state.type_name, state.year, state.month, state.machine), None, None)
+
+def adopt_saved(state: MonthlyState, submitted: Dict[str, Any], saved: MonthlyState) -> None:
+    """
+    別スレッドで保存した写し（saved）の結果を画面側の state に取り込む。
+    submitted は保存に出した時点の内容。その後に画面で変えたセルは残し、
+    それ以外は保存結果（他端末とのマージ後の値）に合わせ、版も引き継ぐ。
+    """
+    merge_states(state, submitted, saved)
+    state.etag = saved.etag
+    state.base = saved.base
+
+@instrumented("inspection.completion_counts", rows=len)
+def completion_counts(start: date, end: date, type_name: Optional[str] = None, machines: Optional[List[str]] = None,
+                      by: Tuple[str, ...] = ("type_name", "machine", "item")) -> "pd.DataFrame":
+    """
+    期間内の点検実施数（done / total / rate）。例：今年の 2番充填 の始業前点検の実施率
+        completion_counts(date(2026,1,1), date(2026,12,31), "始業前点検", ["2番充填"], by=("machine",))
+    """
+    to_ymd = lambda d: d.year * 10000 + d.month * 100 + d.day
+    return repo.completion_counts(to_ymd(start), to_ymd(end), type_name, machines, by)
 
 def toggle_item(state: MonthlyState, item: str, day: int) -> None:
     if item not in state.items:
         raise KeyError(f"Unknown item: {item}")
-    idx = day - 1
-    row = state.items[item]
-    row[idx] = CIRCLE if row[idx] != CIRCLE else ""
-    state.items[item] = row
+    state.items[item].toggle(day)
 
 def set_sign(state: MonthlyState, day: int, text: str) -> None:
     idx = day - 1
     state.sign[idx] = text
 
+def _sheet(state: MonthlyState) -> Dict[str, Any]:
+    return dict(year=state.year, month=state.month, machine=state.machine, type_name=state.type_name,
+                items=list(state.items.keys()), matrix=state.items, signs=state.sign)
+
+def sheet_file_name(state: MonthlyState) -> str:
+    return f"{state.type_name}_{state.year}-{state.month:02d}_{state.machine}.xlsx".replace("/", "_")
+
+@instrumented("inspection.export_excel")
 def export_excel(state: MonthlyState, save_path: str) -> str:
-    items = list(state.items.keys())
-    return export_monthly_check_sheet(
-        year=state.year, month=state.month, machine=state.machine, type_name=state.type_name,
-        items=items, matrix=state.items, signs=state.sign, save_path=save_path
-    )
+    from ..infra.excel_export import export_monthly_check_sheet   # openpyxl は出力するときだけ読み込む
+    return export_monthly_check_sheet(**_sheet(state), save_path=save_path)
+
+@instrumented("inspection.export_excel_batch", rows=len)
+def export_excel_batch(year: int, months: List[int], out_dir: str, machines: Optional[List[str]] = None,
+                       type_names: Optional[List[str]] = None, per: str = PER_MONTH,
+                       processes: Optional[int] = None) -> List[str]:
+    """
+    月末・監査用の一括出力。指定月の 機械 × 種別 をすべて書き出す（未作成の月は空の表）。
+    per: PER_SHEET / PER_MONTH / PER_YEAR。複数ファイルになる場合はプロセスプールで並列に作る。
+    戻り値: 書き出したファイルのパス
+    """
+    from ..infra.excel_export import export_check_books
+    if per not in (PER_SHEET, PER_MONTH, PER_YEAR):
+        raise ValueError(f"Unknown per: {per}")
+    os.makedirs(out_dir, exist_ok=True)
+    books: Dict[str, List[Dict[str, Any]]] = {}
+    for month in months:
+        for type_name in type_names or settings.type_names():
+            for machine in machines or settings.machines():
+                st = load_or_init_state(type_name, year, month, machine)
+                if per == PER_SHEET:
+                    name = sheet_file_name(st)
+                elif per == PER_MONTH:
+                    name = f"点検表_{year}-{month:02d}.xlsx"
+                else:
+                    name = f"点検表_{year}.xlsx"
+                books.setdefault(os.path.join(out_dir, name), []).append(_sheet(st))
+    return export_check_books(list(books.items()), processes)
+
+@instrumented("inspection.import_excel_history", rows=lambda res: res["imported"])
+def import_excel_history(src: Union[str, List[str]], processes: Optional[int] = None, batch_size: int = IMPORT_BATCH,
+                         overwrite: bool = False, strict: bool = False) -> Dict[str, Any]:
+    """
+    export_monthly_check_sheet と同じレイアウトの過去の点検表（.xlsx）を月次状態として取り込む。
+    src: フォルダ（サブフォルダを含む）・ファイル、またはその list。ブックはプロセスプールで並列に読み、batch_size か月ずつ保存する。
+    項目は repo.default_items と照合し、マスタに無い項目・足りない項目があるシートは mismatched に記録する
+    （マスタに無い項目も残して保存する。strict=True なら取り込まない）。保存済みの月は overwrite=True のときだけ上書きする。
+    戻り値: {"files", "sheets", "imported", "skipped": [{file, sheet, reason}], "mismatched": [{file, sheet, missing, unknown}]}
+    """
+    from ..infra.excel_import import iter_check_books   # openpyxl は取り込むときだけ読み込む
+    paths = _xlsx_files(src)
+    summary: Dict[str, Any] = {"files": len(paths), "sheets": 0, "imported": 0, "skipped": [], "mismatched": []}
+    skip = lambda path, sheet, reason: summary["skipped"].append({"file": path, "sheet": sheet, "reason": reason})
+    seen: Dict[Tuple[str, int, int, str], str] = {}
+    batch: List[Tuple[Tuple[str, int, int, str], Dict[str, Any], str, str]] = []
+
+    def flush() -> None:
+        kept = set(repo.save_monthly_states([(key, data) for key, data, _, _ in batch], overwrite))
+        for key, _, path, sheet in batch:
+            if key in kept:
+                skip(path, sheet, "already saved (use overwrite)")
+        summary["imported"] += len(batch) - len(kept)
+        batch.clear()
+
+    for path, sheets, errors in iter_check_books(paths, processes):
+        summary["sheets"] += len(sheets) + len([e for e in errors if e[0]])
+        for sheet, reason in errors:
+            skip(path, sheet, reason)
+        for sheet, sh in sheets:
+            key = (sh["type_name"], sh["year"], sh["month"], sh["machine"])
+            if not 1 <= sh["month"] <= 12:
+                skip(path, sheet, f"invalid month: {sh['month']}")
+                continue
+            nd = calendar.monthrange(sh["year"], sh["month"])[1]
+            if len(sh["signs"]) != nd:
+                skip(path, sheet, f"{len(sh['signs'])} day columns for a {nd}-day month")
+                continue
+            if key in seen:
+                skip(path, sheet, f"duplicate of {seen[key]}")
+                continue
+            seen[key] = f"{path} [{sheet}]"
+            master = repo.default_items(sh["type_name"], sh["machine"])
+            missing = [it for it in master if it not in sh["matrix"]]
+            unknown = [it for it in sh["items"] if it not in master]
+            if missing or unknown:
+                summary["mismatched"].append({"file": path, "sheet": sheet, "missing": missing, "unknown": unknown})
+                if strict:
+                    skip(path, sheet, "items do not match the master")
+                    continue
+            st = MonthlyState(year=sh["year"], month=sh["month"], machine=sh["machine"], type_name=sh["type_name"],
+                              items=sh["matrix"], sign=sh["signs"])
+            st.ensure_shapes(master + unknown)   # マスタの順、足りない項目は未実施。マスタに無い項目は末尾に残す
+            batch.append((key, st.to_dict(), path, sheet))
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    LOGGER.info(f"Imported {summary['imported']} monthly states from {len(paths)} workbooks "
+                f"({len(summary['skipped'])} skipped, {len(summary['mismatched'])} mismatched)")
+    return summary
+
+def _xlsx_files(src: Union[str, List[str]]) -> List[str]:
+    out = []
+    for path in [src] if isinstance(src, str) else src:
+        if not os.path.isdir(path):
+            out.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            # "~$" で始まるのは Excel が開いている間の一時ファイル
+            out += [os.path.join(dirpath, f) for f in sorted(filenames)
+                    if f.lower().endswith(".xlsx") and not f.startswith("~$")]
+    return out
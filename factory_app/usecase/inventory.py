@@ -1,30 +1,213 @@
 
-from typing import Tuple, List
+import os
+from typing import Callable, Optional, Tuple, List, Union
 import pandas as pd
 from ..infra import inventory_repo as repo
+from ..infra.fifo import FIFO
+from ..infra.logging_conf import add_io, instrumented
+from ..infra.inventory_view import Page, ViewQuery, PAGE_SIZE
+from ..infra.inventory_schema import from_typed
+from ..domain.product_index import ProductIndex, SEARCH_LIMIT
 
 def load_tables() -> Tuple[pd.DataFrame, pd.DataFrame]:
     inv = repo.load_inventory()
     pm = repo.load_product_master()
     return inv, pm
 
-def inbound(product_code: str, exp_date: str, in_date: str, qty: str):
+def product_index() -> ProductIndex:
+    """製品検索の索引（製品マスタが変わったときだけ作り直す）"""
+    return repo.product_index()
+
+def search_products(query: str, limit: int = SEARCH_LIMIT) -> List[Tuple[str, str]]:
+    """コード・製品名（かな／カナ・全角／半角を問わない）の前方一致・部分一致で上位 limit 件"""
+    return repo.product_index().search(query, limit)
+
+def table_page(query: Optional[ViewQuery] = None, offset: int = 0, limit: int = PAGE_SIZE) -> Page:
+    """画面の在庫表の1ページ（絞り込み・並べ替えは条件 query、None なら前回の条件）"""
+    return repo.table_page(query, offset, limit)
+
+def inbound(product_code: str, exp_date: str, in_date: str, qty: str, table: bool = True):
     try:
         q = float(qty)
     except Exception:
-        return False, "数量は数値で入力してください。", repo.load_inventory()
-    return repo.inbound(product_code, exp_date, in_date, q)
+        return False, "数量は数値で入力してください。", repo.load_inventory() if table else None
+    return repo.inbound(product_code, exp_date, in_date, q, table=table)
 
-def outbound(product_code: str, exp_date: str, qty: str):
+def outbound(product_code: str, exp_date: str, qty: str, policy: str = FIFO, table: bool = True):
     try:
         q = float(qty)
     except Exception:
-        return False, "数量は数値で入力してください。", repo.load_inventory()
-    return repo.outbound(product_code, exp_date, q)
+        return False, "数量は数値で入力してください。", repo.load_inventory() if table else None
+    return repo.outbound(product_code, exp_date, q, policy, table=table)
 
-def return_in(product_code: str, exp_date: str, in_date: str, qty: str):
+def return_in(product_code: str, exp_date: str, in_date: str, qty: str, table: bool = True):
     try:
         q = float(qty)
     except Exception:
-        return False, "数量は数値で入力してください。", repo.load_inventory()
-    return repo.return_in(product_code, exp_date, in_date, q)
+        return False, "数量は数値で入力してください。", repo.load_inventory() if table else None
+    return repo.return_in(product_code, exp_date, in_date, q, table=table)
+
+@instrumented("inventory.import_movements", rows=lambda res: len(res[2]), ok=lambda res: res[0])
+def import_movements(src: Union[str, pd.DataFrame], policy: str = FIFO,
+                     progress: Optional[Callable[[str], None]] = None, table: bool = True):
+    """
+    スキャナの移動ファイル（CSV パス）または DataFrame を一括反映する。
+    progress: 進捗メッセージの通知先（バックグラウンド実行時に画面へ出す）
+    戻り値: (全行成功か, 概要メッセージ, 行ごとの結果, 在庫表（table=False なら None）)
+    """
+    report = progress or (lambda msg: None)
+    if isinstance(src, pd.DataFrame):
+        moves = src
+    else:
+        report("ファイル読込中…")
+        try:
+            moves = pd.read_csv(src, encoding=repo.ENC, dtype=str, keep_default_na=False)
+            add_io(read=os.path.getsize(src))
+        except Exception as e:
+            return False, f"ファイル読込エラー: {e}", pd.DataFrame(), repo.load_inventory() if table else None
+    report(f"{len(moves)}行を反映中…")
+    return repo.apply_movements(moves, policy, table=table)
+
+def compact() -> None:
+    """ジャーナルをスナップショット(inventory.csv)へ畳み込む。"""
+    repo.compact_inventory()
+
+# stock_summary の集計単位
+BY_LOT = "lot"           # 1行 = 1ロット（製品・期限・入庫日）
+BY_EXP = "exp"           # 製品 × 賞味期限
+BY_PRODUCT = "product"   # 製品ごと
+SUMMARY_KEYS = {BY_LOT: ["product_code", "exp_date", "in_date"], BY_EXP: ["product_code", "exp_date"],
+                BY_PRODUCT: ["product_code"]}
+
+def stock_summary(by: str = BY_PRODUCT, product_codes: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    在庫数量の集計（数量 0 の行は除く）。製品名は製品マスタから付ける。
+    型つきの在庫表（製品コードは category、日付は datetime64）で絞り込み・集計し、結果だけ文字列へ戻す。
+    列: product_code, product_name, [exp_date, [in_date]], qty
+    """
+    keys = SUMMARY_KEYS.get(by)
+    if keys is None:
+        raise ValueError(f"Unknown by: {by}")
+    inv = repo.load_inventory_typed()
+    inv = inv[inv["qty"].to_numpy() > 0]
+    if product_codes:
+        inv = inv[inv["product_code"].isin(product_codes)]
+    df = from_typed(inv.groupby(keys, sort=True, observed=True, dropna=False)["qty"].sum().reset_index())
+    pm = repo.load_product_master()
+    names = pm.drop_duplicates("product_code").set_index("product_code")["product_name"]
+    df.insert(1, "product_name", df["product_code"].map(names).fillna(""))
+    return df
+
+def stock_at(day: str, by: str = BY_EXP, product_codes: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    day の終わり時点の在庫（棚卸の照合用）。移動の台帳から求めるので、単位は製品 × 賞味期限まで（by=BY_LOT は不可）。
+    列: product_code, product_name, [exp_date], qty
+    """
+    keys = {BY_EXP: ["product_code", "exp_date"], BY_PRODUCT: ["product_code"]}.get(by)
+    if keys is None:
+        raise ValueError(f"Unknown by for stock_at: {by}")
+    inv = repo.stock_at(day)
+    inv = inv[inv["qty"] > 0]
+    if product_codes:
+        inv = inv[inv["product_code"].isin(product_codes)]
+    df = inv.groupby(keys, sort=True)["qty"].sum().reset_index()
+    index = repo.product_index()
+    df.insert(1, "product_name", df["product_code"].map(dict(zip(index.codes, index.names))).fillna(""))
+    return df
+
+def movement_history(start: str, end: str) -> pd.DataFrame:
+    """期間内の移動（入庫・出庫・戻しと出庫の引当の内訳）"""
+    return repo.movement_history(start, end)
+
+def archive_ledger() -> List[str]:
+    """締めた月の移動を台帳（月ごとの Parquet）へ退避する。戻り値: 退避した月"""
+    return repo.archive_ledger()
+
+# expiry_report の区分
+EXPIRED = "expired"   # 期限切れ
+NEAR = "near"         # 期限間近
+EXPIRY_COLUMNS = ["status", "product_code", "product_name", "exp_date", "in_date", "qty", "days_left"]
+
+def expiry_summary(days: Optional[int] = None, today: Optional[str] = None) -> dict:
+    """在庫タブに出す件数と数量（期限切れ・期限間近）"""
+    today, days, expired, near = repo.expiry_alerts(days, today)
+    return {"date": today, "days": days,
+            "expired": len(expired), "expired_qty": sum(q for *_, q in expired),
+            "near": len(near), "near_qty": sum(q for *_, q in near)}
+
+def expiry_report(days: Optional[int] = None, today: Optional[str] = None) -> pd.DataFrame:
+    """
+    期限切れ・期限間近のロットの一覧（日次の報告用、期限切れ → 期限間近、それぞれ賞味期限順）。
+    days_left は基準日から賞味期限までの日数（期限切れは負）。基準日・日数は attrs["date"], attrs["days"]。
+    """
+    today, days, expired, near = repo.expiry_alerts(days, today)
+    rows = [(EXPIRED,) + lot for lot in expired] + [(NEAR,) + lot for lot in near]
+    df = pd.DataFrame(rows, columns=["status", "product_code", "exp_date", "in_date", "qty"])
+    index = repo.product_index()
+    names = dict(zip(index.codes, index.names))
+    df.insert(2, "product_name", df["product_code"].map(names).fillna(""))
+    base = pd.Timestamp(today.replace("/", "-"))
+    df["days_left"] = (pd.to_datetime(df["exp_date"], format="%Y/%m/%d") - base).dt.days.astype("int64")
+    df = df.reindex(columns=EXPIRY_COLUMNS)
+    df.attrs.update(date=today, days=days)
+    return df
+
+# --- 拠点をまたぐ集計（本社向け） ---
+def sites() -> List[str]:
+    """既知の拠点（"" は保存先の直下の在庫）"""
+    return repo.sites()
+
+def use_site(site: str) -> None:
+    """これ以降の入出庫・集計を拠点 site の在庫で行う"""
+    repo.use_site(site)
+
+def site_stock_summary(by: str = BY_PRODUCT, product_codes: Optional[List[str]] = None,
+                       sites: Optional[List[str]] = None, processes: Optional[int] = None,
+                       combined: bool = False) -> pd.DataFrame:
+    """
+    拠点ごとの stock_summary をプロセスプールで並列に求めてつなげる（先頭に site 列）。
+    sites: 対象の拠点（省略時は既知の全拠点）。combined=True なら拠点を合算した1つの表（site 列なし）。
+    """
+    keys = SUMMARY_KEYS.get(by)
+    if keys is None:
+        raise ValueError(f"Unknown by: {by}")
+    names = sites if sites is not None else repo.sites()
+    frames = repo.map_sites(stock_summary, names, (by, product_codes), processes)
+    columns = ([] if combined else ["site"]) + keys[:1] + ["product_name"] + keys[1:] + ["qty"]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat([f.assign(site=s) for s, f in zip(names, frames)], ignore_index=True)
+    if combined:
+        names_of = df.drop_duplicates("product_code").set_index("product_code")["product_name"]
+        df = df.groupby(keys, sort=True)["qty"].sum().reset_index()
+        df.insert(1, "product_name", df["product_code"].map(names_of).fillna(""))
+    return df[columns]
+
+def site_expiry_summary(days: Optional[int] = None, today: Optional[str] = None,
+                        sites: Optional[List[str]] = None, processes: Optional[int] = None) -> pd.DataFrame:
+    """拠点ごとの expiry_summary（期限切れ・期限間近の件数と数量）を並列に求めた表（1行 = 1拠点）"""
+    names = sites if sites is not None else repo.sites()
+    rows = repo.map_sites(expiry_summary, names, (days, today), processes)
+    return pd.DataFrame([dict(site=s, **r) for s, r in zip(names, rows)],
+                        columns=["site", "date", "days", "expired", "expired_qty", "near", "near_qty"])
+
+def site_expiry_report(days: Optional[int] = None, today: Optional[str] = None,
+                       sites: Optional[List[str]] = None, processes: Optional[int] = None) -> pd.DataFrame:
+    """
+    全拠点の期限切れ・期限間近のロット（先頭に site 列、期限切れ → 期限間近、それぞれ賞味期限順）。
+    各拠点の expiry_report を並列に求めてまとめる。基準日・日数は attrs["date"], attrs["days"]。
+    """
+    names = sites if sites is not None else repo.sites()
+    frames = repo.map_sites(expiry_report, names, (days, today), processes)
+    if not frames:
+        df = pd.DataFrame(columns=["site"] + EXPIRY_COLUMNS)
+        # 拠点が無くても基準日・日数は拠点ごとの expiry_report と同じく決めて返す（CLI のファイル名に使う）
+        today, days = repo.expiry_basis(days, today)
+        df.attrs.update(date=today, days=days)
+        return df
+    df = pd.concat([f.assign(site=s) for s, f in zip(names, frames)], ignore_index=True)
+    # "expired" < "near" なので区分の文字列順で期限切れが先になる（同じ期限は拠点の順、拠点内は元の順）
+    df = df.sort_values(["status", "exp_date"], kind="stable").reset_index(drop=True)
+    df = df.reindex(columns=["site"] + EXPIRY_COLUMNS)
+    df.attrs.update(frames[0].attrs)
+    return df
@@ -0,0 +1,25 @@
+import os
+import pytest
+from factory_app.infra import inventory_repo, repo, settings
+from factory_app.infra.durability import RELAXED, use_durability
+
+DEFAULT_STORAGE = os.path.join(inventory_repo.ROOT, "storage")
+
+@pytest.fixture
+def storage(tmp_path):
+    """在庫・月次点検・設定をすべて一時フォルダへ向ける（終わったら既定の置き場所へ戻す）"""
+    settings.use_settings(str(tmp_path / "config" / "settings.json"))
+    inventory_repo.use_storage(str(tmp_path / "storage"), "csv")
+    repo.use_state_root(str(tmp_path / "storage"))
+    use_durability(RELAXED)
+    yield tmp_path / "storage"
+    use_durability(None)
+    settings.use_settings(settings.SETTINGS_PATH)
+    inventory_repo.use_storage(DEFAULT_STORAGE)
+    repo.use_state_root(DEFAULT_STORAGE)
+
+@pytest.fixture(params=["csv", "sqlite"])
+def backend(request, storage):
+    """CSV・SQLite の両方の保存先で同じ検証を行う"""
+    inventory_repo.use_storage(str(storage), request.param)
+    return request.param
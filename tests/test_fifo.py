@@ -0,0 +1,149 @@
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from factory_app.infra import inventory_repo
+from factory_app.infra.fifo import FIFO, FEFO
+from factory_app.infra.inventory_engine import InventoryEngine, INV_COLUMNS
+
+# --- 変更前の inventory_repo.outbound の引当部分（ファイルの読み書きと戻り値の表を除き、手を加えていない）---
+def legacy_outbound(df: pd.DataFrame, product_code: str, exp_norm: str, qty: float):
+    mask = (df["product_code"]==product_code) & (df["exp_date"]==exp_norm) & (df["qty"]>0)
+    sub = df[mask].sort_values("in_date")
+    total = float(sub["qty"].sum())
+    if total < qty:
+        return False, total
+
+    remain = qty
+    for i, row in sub.iterrows():
+        have = float(row["qty"])
+        if have >= remain:
+            df.at[i,"qty"] = have - remain
+            remain = 0.0
+            break
+        else:
+            df.at[i,"qty"] = 0.0
+            remain -= have
+    return True, total
+
+def legacy_fefo(df: pd.DataFrame, product_code: str, qty: float):
+    """同じループを、製品内の賞味期限 → 入庫日の順に並べたロットへ適用したもの"""
+    mask = (df["product_code"]==product_code) & (df["qty"]>0)
+    sub = df[mask].sort_values(["exp_date", "in_date"])
+    total = float(sub["qty"].sum())
+    if total < qty:
+        return False, total
+
+    remain = qty
+    for i, row in sub.iterrows():
+        have = float(row["qty"])
+        if have >= remain:
+            df.at[i,"qty"] = have - remain
+            remain = 0.0
+            break
+        else:
+            df.at[i,"qty"] = 0.0
+            remain -= have
+    return True, total
+
+def lots(*rows) -> pd.DataFrame:
+    return pd.DataFrame([[c, e, i, float(q), ""] for c, e, i, q in rows], columns=INV_COLUMNS)
+
+def expected(df: pd.DataFrame, requests, policy: str):
+    df = df.copy()
+    if policy == FIFO:
+        results = [legacy_outbound(df, c, e, q) for c, e, q in requests]
+    else:
+        results = [legacy_fefo(df, c, q) for c, _, q in requests]
+    return results, df["qty"].to_numpy()
+
+def engine_result(df: pd.DataFrame, requests, policy: str):
+    eng = InventoryEngine.from_frame(df)
+    results = eng.outbound_many(requests, "T", policy)
+    return [(ok, total) for ok, total, _ in results], eng.frame()["qty"].to_numpy()
+
+BASE = lots(
+    ("A", "2026/12/01", "2026/01/10", 3.0),
+    ("A", "2026/12/01", "2026/01/05", 2.0),
+    ("A", "2026/11/01", "2026/02/01", 4.0),
+    ("B", "2026/12/01", "2026/01/01", 0.3),
+    ("B", "2026/12/01", "2026/01/02", 0.1),
+    ("B", "2026/12/01", "2026/01/03", 0.2),
+    ("C", "2026/12/01", "2026/01/01", 0.0),
+)
+
+CASES = {
+    # 1ロットの一部だけ・複数ロットにまたがる・ちょうど使い切る
+    "partial_lot": [("A", "2026/12/01", 1.0)],
+    "across_lots": [("A", "2026/12/01", 4.0)],
+    "exact_total": [("A", "2026/12/01", 5.0), ("A", "2026/12/01", 0.5)],
+    # 在庫合計を超える要求は何も引かない（後続の要求には影響しない）
+    "more_than_total": [("A", "2026/12/01", 5.5), ("A", "2026/12/01", 2.5)],
+    # 途中まで引き当ててから不足する（前の要求で減った後の在庫で判定）
+    "partial_shortfall": [("B", "2026/12/01", 0.25), ("B", "2026/12/01", 0.4), ("B", "2026/12/01", 0.35)],
+    # 数量 0 のロット・存在しないロット
+    "zero_stock": [("C", "2026/12/01", 1.0), ("Z", "2026/12/01", 1.0)],
+    # 浮動小数点の端数（0.1 + 0.2 の合計と比較）
+    "float_rounding": [("B", "2026/12/01", 0.6), ("B", "2026/12/01", 0.30000000000000004)],
+}
+
+@pytest.mark.parametrize("policy", [FIFO, FEFO])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_allocation_matches_legacy(case, policy):
+    requests = CASES[case]
+    want, want_qty = expected(BASE, requests, policy)
+    got, got_qty = engine_result(BASE, requests, policy)
+    assert got == want
+    assert np.array_equal(got_qty, want_qty)
+
+@pytest.mark.parametrize("policy", [FIFO, FEFO])
+def test_ties_on_in_date_follow_row_order(policy):
+    # 手で編集した CSV の同じ (製品, 期限, 入庫日) の重複行・期限違いで入庫日が同じ行
+    df = lots(
+        ("A", "2026/12/01", "2026/01/05", 1.0),
+        ("A", "2026/12/01", "2026/01/05", 2.0),
+        ("A", "2026/12/01", "2026/01/01", 0.5),
+        ("A", "2026/11/01", "2026/01/05", 1.5),
+        ("A", "2026/11/01", "2026/01/05", 0.5),
+    )
+    requests = [("A", "2026/12/01", 1.2), ("A", "2026/12/01", 1.0), ("A", "2026/11/01", 0.7)]
+    want, want_qty = expected(df, requests, policy)
+    got, got_qty = engine_result(df, requests, policy)
+    assert got == want
+    assert np.array_equal(got_qty, want_qty)
+
+@pytest.mark.parametrize("policy", [FIFO, FEFO])
+def test_total_of_many_lots_matches_pandas_sum(policy):
+    # 0.1 × 10 ロット：1件ずつ足すと 0.9999999999999999、従来の合計（pandas の sum）は 1.0
+    df = lots(*[("A", "2026/12/01", f"2026/01/{d:02d}", 0.1) for d in range(1, 11)])
+    requests = [("A", "2026/12/01", 1.0), ("A", "2026/12/01", 0.1)]
+    want, want_qty = expected(df, requests, policy)
+    got, got_qty = engine_result(df, requests, policy)
+    assert want[0] == (True, 1.0)
+    assert got == want
+    assert np.array_equal(got_qty, want_qty)
+
+@pytest.mark.parametrize("policy", [FIFO, FEFO])
+@pytest.mark.parametrize("seed", range(5))
+def test_random_batches_match_legacy(policy, seed):
+    rng = random.Random(seed)
+    rows = [(f"P{rng.randrange(8)}", f"2026/{rng.randint(10, 12):02d}/01", f"2026/01/{rng.randint(1, 6):02d}",
+             rng.choice([0.0, 0.1, 0.2, 0.3, 1.0, 2.5, 7.7])) for _ in range(60)]
+    df = lots(*rows)
+    requests = [(f"P{rng.randrange(9)}", f"2026/{rng.randint(10, 12):02d}/01", rng.choice([0.1, 0.3, 1.0, 3.3, 20.0]))
+                for _ in range(80)]
+    want, want_qty = expected(df, requests, policy)
+    got, got_qty = engine_result(df, requests, policy)
+    assert got == want
+    assert np.array_equal(got_qty, want_qty)
+
+def test_repo_outbound_matches_legacy(backend):
+    inventory_repo.save_inventory(BASE)
+    requests = CASES["partial_shortfall"] + CASES["across_lots"] + CASES["zero_stock"]
+    want, want_qty = expected(BASE, requests, FIFO)
+    for (code, exp, qty), (ok, total) in zip(requests, want):
+        res = inventory_repo.outbound(code, exp, qty, table=False)
+        assert res[0] == ok
+        if not ok:
+            assert res[1] == f"在庫不足：必要 {qty}、在庫 {total}"
+    assert np.array_equal(inventory_repo.load_inventory()["qty"].to_numpy(), want_qty)
@@ -0,0 +1,78 @@
+import json
+from factory_app.domain.state import CIRCLE, MonthlyState
+from factory_app.infra import repo
+from factory_app.usecase import inspection as uc
+
+TYPE, MACHINE = "始業前点検", "1番充填"
+
+def test_new_month_has_master_shape(storage):
+    st = uc.load_or_init_state(TYPE, 2026, 2, MACHINE)
+    assert list(st.items) == repo.default_items(TYPE, MACHINE)
+    assert all(len(row) == 28 for row in st.items.values()) and st.sign == [""] * 28
+
+def test_save_and_reload_round_trip(storage):
+    st = uc.load_or_init_state(TYPE, 2026, 4, MACHINE)
+    first = next(iter(st.items))
+    uc.toggle_item(st, first, 1)
+    uc.toggle_item(st, first, 30)
+    uc.set_sign(st, 30, "山田")
+    uc.save_state(st)
+    again = uc.load_or_init_state(TYPE, 2026, 4, MACHINE)
+    assert again.to_dict() == st.to_dict()
+    assert again.items[first].to_list()[0] == CIRCLE and again.items[first].to_list()[29] == CIRCLE
+
+def test_concurrent_saves_merge_both_edits(storage):
+    items = repo.default_items(TYPE, MACHINE)
+    a = uc.load_or_init_state(TYPE, 2026, 5, MACHINE)
+    b = uc.load_or_init_state(TYPE, 2026, 5, MACHINE)
+    uc.toggle_item(a, items[0], 3)
+    uc.set_sign(a, 3, "山田")
+    uc.save_state(a)
+    # b は a の保存より前の版から編集している：自分が変えたセルは b、それ以外は a の値になる
+    uc.toggle_item(b, items[1], 4)
+    uc.set_sign(b, 4, "佐藤")
+    uc.save_state(b)
+    saved = uc.load_or_init_state(TYPE, 2026, 5, MACHINE)
+    assert saved.items[items[0]].to_list()[2] == CIRCLE
+    assert saved.items[items[1]].to_list()[3] == CIRCLE
+    assert saved.sign[2:4] == ["山田", "佐藤"]
+    # a がもう一度保存しても b の変更は消えない
+    uc.toggle_item(a, items[2], 5)
+    uc.save_state(a)
+    saved = uc.load_or_init_state(TYPE, 2026, 5, MACHINE)
+    assert saved.items[items[1]].to_list()[3] == CIRCLE and saved.items[items[2]].to_list()[4] == CIRCLE
+
+def test_legacy_json_is_imported_once(storage):
+    storage.mkdir(parents=True, exist_ok=True)
+    data = {"year": 2025, "month": 6, "machine": MACHINE, "type_name": TYPE,
+            "items": {"古い項目": [CIRCLE] + [""] * 29}, "sign": ["佐藤"] + [""] * 29}
+    with open(repo.monthly_state_path(TYPE, 2025, 6, MACHINE), "w", encoding="utf-8-sig") as f:
+        json.dump(data, f, ensure_ascii=False)
+    assert repo.load_monthly_state(TYPE, 2025, 6, MACHINE) == data
+    st = uc.load_or_init_state(TYPE, 2025, 6, MACHINE)
+    # 点検項目はマスタに合わせる（マスタに無い項目は表示しない）
+    assert list(st.items) == repo.default_items(TYPE, MACHINE) and st.sign[0] == "佐藤"
+
+def test_excel_history_round_trip(storage, tmp_path):
+    states = []
+    for month in (1, 2):
+        st = uc.load_or_init_state(TYPE, 2024, month, MACHINE)
+        for k, it in enumerate(st.items):
+            uc.toggle_item(st, it, k + month)
+        uc.set_sign(st, 1, "山田")
+        uc.export_excel(st, str(tmp_path / "xlsx" / uc.sheet_file_name(st)))
+        states.append(st)
+    res = uc.import_excel_history(str(tmp_path / "xlsx"), processes=1)
+    assert res["imported"] == 2 and not res["skipped"] and not res["mismatched"]
+    for st in states:
+        assert repo.load_monthly_state(TYPE, 2024, st.month, MACHINE) == st.to_dict()
+    # 保存済みの月は上書きしない
+    again = uc.import_excel_history(str(tmp_path / "xlsx"), processes=1)
+    assert again["imported"] == 0 and len(again["skipped"]) == 2
+
+def test_bitset_matches_string_lists():
+    st = MonthlyState(2026, 3, MACHINE, TYPE, items={"a": [CIRCLE, "", CIRCLE], "b": []}, sign=["x"])
+    st.ensure_shapes(["b", "a", "c"])
+    assert list(st.items) == ["b", "a", "c"]
+    assert st.to_dict()["items"]["a"] == [CIRCLE, "", CIRCLE] + [""] * 28
+    assert st.done_counts() == {"b": 0, "a": 2, "c": 0} and st.sign == ["x"] + [""] * 30
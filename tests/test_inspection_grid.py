@@ -0,0 +1,148 @@
+import random
+import pytest
+# 要素の作成に FreeSimpleGUI（または PySimpleGUI）を使う。画面（DISPLAY）は不要
+inspection_grid = pytest.importorskip("factory_app.ui.inspection_grid")
+from factory_app.domain.state import MonthlyState, CIRCLE
+from factory_app.ui.inspection_grid import InspectionGrid, GRID_KEY, ROWS_KEY, EMPTY_LABEL, MAX_DAYS, check_key, sign_key
+
+# 画面を開かずに検証する：要素はレイアウトから集めたキーごとの記録に置き換え、update された値だけを持つ
+class FakeElement:
+    def __init__(self) -> None:
+        self.props = {}
+        self.updates = 0
+
+    def update(self, *args, **kw) -> None:
+        if args:
+            kw["text"] = args[0]
+        self.props.update(kw)
+        self.updates += 1
+
+    def contents_changed(self) -> None:
+        pass
+
+class FakeWindow:
+    def __init__(self, layout) -> None:
+        self.elements = {GRID_KEY: FakeElement()}
+        self.extended = 0
+        self._collect(layout)
+
+    def __getitem__(self, key):
+        return self.elements[key]
+
+    def extend_layout(self, container, rows) -> None:
+        assert container is self.elements[ROWS_KEY]
+        self.extended += 1
+        self._collect(rows)
+
+    def updates(self) -> int:
+        return sum(e.updates for e in self.elements.values())
+
+    def _collect(self, rows) -> None:
+        for row in rows:
+            for elem in row:
+                if elem.Key is not None:
+                    assert elem.Key not in self.elements, f"duplicate key {elem.Key}"
+                    self.elements[elem.Key] = FakeElement()
+                self._collect(getattr(elem, "Rows", None) or [])
+
+    def shown(self, key: str, prop: str, default=None):
+        return self.elements[key].props.get(prop, default)
+
+@pytest.fixture
+def created(monkeypatch):
+    """作成した要素の数（レイアウトの部品を数えるラッパーに差し替える）"""
+    count = {"n": 0}
+    for name in ("Text", "Button", "Input", "Column"):
+        cls = getattr(inspection_grid.sg, name)
+        def make(*args, _cls=cls, **kw):
+            count["n"] += 1
+            return _cls(*args, **kw)
+        monkeypatch.setattr(inspection_grid.sg, name, make)
+    return count
+
+def make_state(machine: str, year: int, month: int, items, seed: int) -> MonthlyState:
+    rng = random.Random(seed)
+    st = MonthlyState(year=year, month=month, machine=machine, type_name="始業前点検")
+    st.ensure_shapes(items)
+    for row in st.items.values():
+        for d in range(len(row)):
+            row[d] = CIRCLE if rng.random() < 0.6 else ""
+    st.sign = [rng.choice(["", "山田", "佐藤"]) for _ in st.sign]
+    return st
+
+def assert_displays(window: FakeWindow, grid: InspectionGrid, state: MonthlyState) -> None:
+    """画面の値（作成時の値 + update された値）が state と一致する"""
+    items = list(state.items)
+    assert grid.items == items
+    for r in range(grid.rows):
+        assert window.shown(f"-I-ROW_{r}-", "visible", True) == (r < len(items))
+    for d in range(1, MAX_DAYS + 1):
+        visible = d <= state.num_days
+        assert window.shown(f"-I-DAY_{d}-", "visible", True) == visible
+        assert window.shown(sign_key(d), "visible", True) == visible
+        for r in range(len(items)):
+            assert window.shown(check_key(r, d), "visible", True) == visible
+    for r, it in enumerate(items):
+        assert window.shown(f"-I-ITEM_{r}-", "value") == it
+        for d in range(1, state.num_days + 1):
+            assert window.shown(check_key(r, d), "text", EMPTY_LABEL) == (state.items[it][d-1] or EMPTY_LABEL)
+    for d in range(1, state.num_days + 1):
+        assert window.shown(sign_key(d), "value") == state.sign[d-1]
+
+ITEMS = [f"点検項目{i:02d}" for i in range(30)]
+
+def test_switching_machine_and_month_reuses_widgets(created):
+    grid = InspectionGrid(("Meiryo UI", 10), rows=len(ITEMS))
+    window = FakeWindow(grid.layout())
+    built = created["n"]
+    states = [make_state(m, 2026, month, ITEMS, seed)
+              for seed, (m, month) in enumerate((m, mo) for m in ("1番充填", "2番充填", "3番充填") for mo in (2, 4, 5))]
+    for st in states + states[::-1]:
+        grid.show(window, st)
+        assert_displays(window, grid, st)
+    assert created["n"] == built   # 切り替えで要素を作らない
+    assert window.extended == 0
+
+def test_show_updates_only_changed_elements():
+    grid = InspectionGrid(("Meiryo UI", 10), rows=len(ITEMS))
+    window = FakeWindow(grid.layout())
+    st = make_state("1番充填", 2026, 5, ITEMS, 0)
+    grid.show(window, st)
+    # 同じ内容をもう一度表示：利用者が書き換え得るサイン欄だけ入れ直す
+    before = window.updates()
+    assert grid.show(window, st) == st.num_days
+    assert window.updates() - before == st.num_days
+    # 別の機械で1マスだけ違う：そのマスとサイン欄だけ
+    other = MonthlyState(**st.to_dict())
+    other.machine = "2番充填"
+    other.items[ITEMS[3]][9] = "" if other.items[ITEMS[3]][9] else CIRCLE
+    assert grid.show(window, other) == 1 + st.num_days
+    assert_displays(window, grid, other)
+
+def test_item_count_changes_add_or_hide_rows(created):
+    grid = InspectionGrid(("Meiryo UI", 10), rows=5)
+    window = FakeWindow(grid.layout())
+    grid.show(window, make_state("1番充填", 2026, 4, ITEMS[:5], 0))
+    st = make_state("1番充填", 2026, 2, ITEMS[:8], 1)
+    grid.show(window, st)
+    assert window.extended == 1 and grid.rows == 8   # 足りない3行だけ追加
+    assert_displays(window, grid, st)
+    built = created["n"]
+    for items in (ITEMS[:3], ITEMS[:8], ITEMS[2:7]):
+        st = make_state("2番充填", 2026, 1, items, 2)
+        grid.show(window, st)
+        assert_displays(window, grid, st)
+    assert created["n"] == built and window.extended == 1
+
+def test_refresh_cell_updates_one_button():
+    grid = InspectionGrid(("Meiryo UI", 10), rows=len(ITEMS))
+    window = FakeWindow(grid.layout())
+    st = make_state("1番充填", 2026, 5, ITEMS, 0)
+    grid.show(window, st)
+    before = window.updates()
+    st.items[ITEMS[2]][4] = "" if st.items[ITEMS[2]][4] else CIRCLE
+    grid.refresh_cell(window, st, 2, 5)
+    assert window.updates() - before == 1
+    assert_displays(window, grid, st)
+    # 次の表示では同じ値を送り直さない
+    assert grid.show(window, st) == st.num_days
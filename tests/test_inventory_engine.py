@@ -0,0 +1,49 @@
+import random
+import pandas as pd
+import pytest
+from factory_app.infra.inventory_engine import InventoryEngine, INV_COLUMNS
+
+def rebuilt(eng: InventoryEngine):
+    """全行から作り直した表（CSVの行順, 画面の並び順）"""
+    df = pd.DataFrame([row for _, row in eng.rows()], columns=INV_COLUMNS)
+    df["qty"] = df["qty"].astype(float)
+    return df, df.sort_values(["product_code", "exp_date", "in_date"]).reset_index(drop=True)
+
+def move(eng: InventoryEngine, rng: random.Random, k: int) -> None:
+    code, exp = f"P{rng.randrange(6)}", f"2026/0{rng.randint(1, 4)}/01"
+    ind, qty = f"2026/01/{rng.randint(1, 20):02d}", float(rng.randint(1, 5))
+    op = rng.random()
+    if op < 0.4:
+        eng.inbound(code, exp, ind, qty, f"t{k}")      # 既存ロットへの加算・入庫日の付け替え・新しい行
+    elif op < 0.6:
+        eng.return_in(code, exp, ind, qty, f"t{k}")
+    elif eng.available(code, exp) >= qty:
+        eng.outbound(code, exp, qty, f"t{k}")
+
+@pytest.mark.parametrize("seed", range(10))
+def test_cached_frames_follow_movements(seed):
+    rng = random.Random(seed)
+    # 手編集のCSVで同じキーの行が重なっている場合も含める
+    eng = InventoryEngine.from_frame(pd.DataFrame([("P0", "2026/01/01", "2026/01/05", 1.0, ""),
+                                                   ("P0", "2026/01/01", "2026/01/05", 2.0, "")], columns=INV_COLUMNS))
+    for k in range(300):
+        move(eng, rng, k)
+        if rng.random() < 0.3:
+            pd.testing.assert_frame_equal(eng.frame(), rebuilt(eng)[0])
+        if rng.random() < 0.3:
+            pd.testing.assert_frame_equal(eng.sorted_frame(), rebuilt(eng)[1])
+
+def test_one_movement_updates_frames_in_place():
+    eng = InventoryEngine.from_frame(pd.DataFrame(
+        [(f"P{i:03d}", "2026/12/01", "2026/01/01", 5.0, "") for i in range(200)], columns=INV_COLUMNS))
+    frame, table = eng.frame(), eng.sorted_frame()
+    eng.outbound("P010", "2026/12/01", 2.0, "t1")
+    eng.inbound("P020", "2026/12/01", "2026/02/01", 1.0, "t2")   # 入庫日の付け替え
+    assert eng.frame() is frame and eng.sorted_frame() is table   # 作り直さない
+    pd.testing.assert_frame_equal(table, rebuilt(eng)[1])
+    assert table.loc[10, "qty"] == 3.0 and table.loc[20, "in_date"] == "2026/02/01"
+    # 新しい行は並び順の位置へ差し込む
+    eng.inbound("P010", "2027/01/01", "2026/03/01", 1.0, "t3")
+    table = eng.sorted_frame()
+    pd.testing.assert_frame_equal(table, rebuilt(eng)[1])
+    assert table.loc[11, ["product_code", "exp_date"]].tolist() == ["P010", "2027/01/01"]
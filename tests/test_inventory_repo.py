@@ -0,0 +1,153 @@
+import random, threading
+from collections import defaultdict
+from multiprocessing import get_context
+import pandas as pd
+import pytest
+from factory_app.infra import inventory_repo
+
+EXP = "2026/12/01"
+
+def rows(df: pd.DataFrame):
+    return sorted(map(tuple, df[["product_code", "exp_date", "in_date", "qty"]].to_numpy().tolist()))
+
+def stock(df: pd.DataFrame):
+    return df.groupby(["product_code", "exp_date"])["qty"].sum().to_dict()
+
+def test_inbound_merges_into_existing_lot(backend):
+    assert inventory_repo.inbound("A", "2026-12-01", "2026/01/05", 2.0)[0]
+    # 同じ (製品, 期限) の別の入庫日：既存の行へ加算し、入庫日を新しい方へ
+    assert inventory_repo.inbound("A", EXP, "2026/01/09", 3.0)[0]
+    # 古い入庫日なら入庫日はそのまま
+    ok, msg, table = inventory_repo.inbound("A", EXP, "2026/01/01", 1.0)
+    assert (ok, msg) == (True, "入庫を反映しました。")
+    assert rows(table) == [("A", EXP, "2026/01/09", 6.0)]
+    # 期限が違えば別の行
+    inventory_repo.inbound("A", "2027/01/01", "2026/01/01", 1.0)
+    assert rows(inventory_repo.load_inventory()) == [("A", EXP, "2026/01/09", 6.0), ("A", "2027/01/01", "2026/01/01", 1.0)]
+
+def test_return_in_keeps_in_date(backend):
+    inventory_repo.inbound("A", EXP, "2026/01/09", 1.0)
+    assert inventory_repo.return_in("A", EXP, "2026/01/02", 2.0)[:2] == (True, "戻しを反映しました。")
+    assert inventory_repo.return_in("A", EXP, "2026/01/09", 0.5)[0]
+    assert rows(inventory_repo.load_inventory()) == [("A", EXP, "2026/01/02", 2.0), ("A", EXP, "2026/01/09", 1.5)]
+
+def test_outbound_fifo_and_shortfall(backend):
+    inventory_repo.return_in("A", EXP, "2026/01/09", 2.0)
+    inventory_repo.return_in("A", EXP, "2026/01/02", 1.0)
+    ok, msg, table = inventory_repo.outbound("A", EXP, 5.0)
+    assert (ok, msg) == (False, "在庫不足：必要 5.0、在庫 3.0")
+    assert inventory_repo.outbound("A", EXP, 1.5)[:2] == (True, "出庫を反映しました。")
+    assert rows(inventory_repo.load_inventory()) == [("A", EXP, "2026/01/02", 0.0), ("A", EXP, "2026/01/09", 1.5)]
+
+@pytest.mark.parametrize("bad, message", [
+    ({"qty": 0}, "数量は正の数で入力してください。"),
+    ({"qty": -1}, "数量は正の数で入力してください。"),
+    ({"exp_date": "2026/13"}, "入庫エラー: Invalid date: 2026/13"),
+])
+def test_inbound_rejects_invalid_input(storage, bad, message):
+    args = {"product_code": "A", "exp_date": EXP, "in_date": "2026/01/01", "qty": 1.0, **bad}
+    ok, msg, _ = inventory_repo.inbound(**args)
+    assert (ok, msg) == (False, message)
+    assert inventory_repo.load_inventory().empty
+
+def test_apply_movements_matches_single_calls(backend, storage):
+    rng = random.Random(0)
+    moves = pd.DataFrame([(rng.choice(["入庫", "out", "戻し", "outbound", "bad"]), f"P{rng.randrange(4)}",
+                           rng.choice([EXP, "2026-12-01", "2027/01/01", "x"]), f"2026/01/{rng.randint(1, 9):02d}",
+                           rng.choice([1.0, 2.5, 0.0, 4.0])) for _ in range(120)],
+                         columns=inventory_repo.MOVEMENT_COLUMNS)
+    ok, summary, report, _ = inventory_repo.apply_movements(moves, table=False)
+    assert not ok and summary.startswith("一括取込 120行")
+    bulk = rows(inventory_repo.load_inventory())
+
+    # 同じ移動を1件ずつ：入庫・戻しを先に（一括取込は入庫・戻しを先に反映する）、出庫はファイル順
+    inventory_repo.use_storage(str(storage / "single"), backend)
+    single_ok = {}
+    for line, (op, code, exp, ind, qty) in enumerate(moves.itertuples(index=False, name=None)):
+        if op in ("入庫", "戻し"):
+            fn = inventory_repo.inbound if op == "入庫" else inventory_repo.return_in
+            single_ok[line] = fn(code, exp, ind, qty, table=False)[0]
+    for line, (op, code, exp, ind, qty) in enumerate(moves.itertuples(index=False, name=None)):
+        if op in ("out", "outbound"):
+            single_ok[line] = inventory_repo.outbound(code, exp, qty, table=False)[0]
+    assert rows(inventory_repo.load_inventory()) == bulk
+    assert {i: bool(v) for i, v in report["ok"].items() if i in single_ok} == single_ok
+    assert not report.loc[moves["op"] == "bad", "ok"].any()
+
+def test_reopen_replays_and_compacts(backend, storage):
+    rng = random.Random(1)
+    for _ in range(60):
+        code, qty = f"P{rng.randrange(3)}", float(rng.randint(1, 4))
+        if rng.random() < 0.6:
+            inventory_repo.inbound(code, EXP, f"2026/01/{rng.randint(1, 9):02d}", qty, table=False)
+        else:
+            inventory_repo.outbound(code, EXP, qty, table=False)
+    before = rows(inventory_repo.load_inventory())
+    inventory_repo.use_storage(str(storage), backend)   # メモリ上の状態を捨ててファイルから読む
+    assert rows(inventory_repo.load_inventory()) == before
+    inventory_repo.compact_inventory()
+    inventory_repo.use_storage(str(storage), backend)
+    assert rows(inventory_repo.load_inventory()) == before
+
+def _terminal(args):
+    # 別の端末（プロセス）として同じ保存先へ入出庫する
+    root, backend, wid, n_ops = args
+    inventory_repo.use_storage(root, backend)
+    rng = random.Random(wid)
+    moved = defaultdict(float)
+    for k in range(n_ops):
+        code, qty = rng.choice(["P0", "P1"]), float(rng.randint(1, 3))
+        if k % 2 == 0:
+            ok = inventory_repo.inbound(code, EXP, f"2026/01/{wid + 1:02d}", qty, table=False)[0]
+            moved[code] += qty if ok else 0.0
+        else:
+            ok, msg, _ = inventory_repo.outbound(code, EXP, qty, table=False)
+            assert ok or msg.startswith("在庫不足")
+            moved[code] -= qty if ok else 0.0
+    return dict(moved)
+
+def test_concurrent_terminals_keep_totals(backend, storage):
+    inventory_repo.get_store()   # 保存先の初期化を先に1回だけ
+    with get_context("spawn").Pool(3) as pool:
+        results = pool.map(_terminal, [(str(storage), backend, w, 30) for w in range(3)])
+    expected = defaultdict(float)
+    for moved in results:
+        for code, q in moved.items():
+            expected[code] += q
+    inventory_repo.use_storage(str(storage), backend)
+    df = inventory_repo.load_inventory()
+    got = {c: q for (c, _), q in stock(df).items()}
+    assert (df["qty"] >= 0).all()
+    assert {c: got.get(c, 0.0) for c in expected} == dict(expected)
+
+def write_master(storage, rows) -> None:
+    pd.DataFrame(rows, columns=inventory_repo.PM_COLUMNS).to_csv(
+        storage / "product_master.csv", index=False, encoding=inventory_repo.ENC)
+
+def test_product_master_edits_are_seen_by_every_site(backend, storage):
+    storage.mkdir(parents=True, exist_ok=True)
+    write_master(storage, [("A", "りんご")])
+    for site in ("", "east"):
+        inventory_repo.use_storage(str(storage), backend, site)
+        assert inventory_repo.load_product_master().values.tolist() == [["A", "りんご"]]
+    # 初回の取り込み（sqlite）より後の編集も、どの拠点にもそのまま反映される
+    write_master(storage, [("A", "りんご"), ("B", "ばなな")])
+    for site in ("", "east"):
+        inventory_repo.use_storage(str(storage), backend, site)
+        assert inventory_repo.load_product_master()["product_code"].tolist() == ["A", "B"]
+        assert [c for c, _ in inventory_repo.product_index().search("ばなな")] == ["B"]
+
+def test_reads_from_other_threads_wait_for_open_transaction(backend):
+    store = inventory_repo.get_store()
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(store.available("A", EXP)))
+    with pytest.raises(RuntimeError):
+        with store.batch():
+            store.inbound("A", EXP, "2026/01/01", 1.0, "2026-01-01 00:00:00")
+            # 別スレッド（画面の読み込み等）は取り消されるかもしれない途中の状態を読まない
+            reader.start()
+            reader.join(0.3)
+            assert not seen
+            raise RuntimeError("rollback")
+    reader.join()
+    assert seen == [0.0] and store.available("A", EXP) == 0.0
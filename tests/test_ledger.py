@@ -0,0 +1,55 @@
+import random
+import pytest
+from factory_app.infra import inventory_repo
+
+EXPS = ["2026/12/01", "2027/03/01"]
+
+@pytest.fixture
+def moves(backend, monkeypatch):
+    """1〜4月の移動を時刻を決めて記録する。戻り値: [(時刻, 区分, 製品, 期限, 数量), ...]（成功したものだけ）"""
+    rng = random.Random(0)
+    clock = {"now": ""}
+    monkeypatch.setattr(inventory_repo, "_now_str", lambda: clock["now"])
+    done = []
+    for k in range(200):
+        month, day = 1 + k // 50, 1 + (k % 50) // 2
+        clock["now"] = f"2026-{month:02d}-{day:02d} {8 + k % 10:02d}:00:00"
+        code, exp, qty = f"P{rng.randrange(3)}", rng.choice(EXPS), float(rng.randint(1, 5))
+        op = rng.choice(["inbound", "inbound", "return_in", "outbound"])
+        if op == "outbound":
+            ok = inventory_repo.outbound(code, exp, qty, table=False)[0]
+        else:
+            ok = getattr(inventory_repo, op)(code, exp, "2026/01/01", qty, table=False)[0]
+        if ok:
+            done.append((clock["now"], op, code, exp, qty))
+    return done
+
+def expected_at(moves, day: str):
+    end = day.replace("/", "-") + " 23:59:59"
+    pos = {}
+    for ts, op, code, exp, qty in moves:
+        if ts <= end:
+            pos[(code, exp)] = pos.get((code, exp), 0.0) + (-qty if op == "outbound" else qty)
+    return {k: v for k, v in pos.items() if v}
+
+def got(df):
+    return {(c, e): q for c, e, q in df[["product_code", "exp_date", "qty"]].to_numpy().tolist()}
+
+DAYS = ["2025/12/31", "2026/01/10", "2026/01/31", "2026/02/14", "2026/03/31", "2026/04/20", "2026/04/30"]
+
+def test_stock_at_matches_movements(moves):
+    for day in DAYS:
+        assert got(inventory_repo.stock_at(day)) == expected_at(moves, day), day
+
+def test_archived_ledger_gives_same_stock(moves):
+    assert inventory_repo.archive_ledger("2026-03") == ["2026-01", "2026-02"]
+    assert inventory_repo.archive_ledger("2026-03") == []
+    for day in DAYS:
+        assert got(inventory_repo.stock_at(day)) == expected_at(moves, day), day
+    assert inventory_repo.archive_ledger("2026-05") == ["2026-03", "2026-04"]
+    for day in DAYS:
+        assert got(inventory_repo.stock_at(day)) == expected_at(moves, day), day
+    # 締めた月と未締めの月にまたがる履歴
+    hist = inventory_repo.movement_history("2026/02/20", "2026/03/05")
+    want = [m for m in moves if "2026-02-20" <= m[0] <= "2026-03-05 23:59:59"]
+    assert list(zip(hist["ts"], hist["op"], hist["product_code"])) == [(ts, op, c) for ts, op, c, _, _ in want]
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime
+import pytest
+main_ui = pytest.importorskip("factory_app.ui.main_ui")
+import FreeSimpleGUI as sg
+from factory_app.infra import repo
+
+# 画面を開かずに検証する：TaskRunner と window は投入した処理・選択欄の値だけを持つ記録に置き換える
+RUNNERS = []
+
+def no_sync_load(*args):
+    raise AssertionError("load_or_init_state was called while building the window")
+
+class FakeRunner:
+    def __init__(self, window) -> None:
+        self.submitted = []
+        self.pending = 0
+        RUNNERS.append(self)
+
+    def submit(self, target, tag, fn, *args, **kw) -> None:
+        self.submitted.append((tag, fn, args))
+
+    def shutdown(self) -> None:
+        pass
+
+class FakeElement:
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def get(self):
+        return self.value
+
+class FakeWindow:
+    """最初の read で閉じる画面"""
+    def __init__(self, values) -> None:
+        self.values = values
+
+    def __getitem__(self, key):
+        return FakeElement(self.values[key])
+
+    def read(self, timeout=None):
+        return sg.WIN_CLOSED, None
+
+    def close(self) -> None:
+        pass
+
+def test_inspection_tab_is_built_without_loading_state(storage, monkeypatch):
+    monkeypatch.setattr(main_ui.uc, "load_or_init_state", no_sync_load)
+    tab, grid = main_ui.build_inspection_tab()
+    machine, type_name = main_ui.uc.machines()[0], main_ui.uc.type_names()[0]
+    assert grid.rows == len(repo.default_items(type_name, machine)) and grid.items == []
+    assert not os.path.exists(str(storage))   # 点検状態のファイル・DB をまだ開いていない
+
+def test_first_month_is_loaded_through_the_runner(storage, monkeypatch):
+    now = datetime.now()
+    values = {main_ui.I_YEAR: now.year, main_ui.I_MONTH: now.month, main_ui.I_MACHINE: "2番充填",
+              main_ui.I_TYPE: "保全点検"}
+    monkeypatch.setattr(main_ui, "build_window", lambda: (FakeWindow(values), None))
+    monkeypatch.setattr(main_ui, "TaskRunner", FakeRunner)
+    monkeypatch.setattr(main_ui, "start_inv", lambda runner: None)
+    monkeypatch.setattr(main_ui, "on_inv_close", lambda: None)
+    RUNNERS.clear()
+    main_ui.main_loop()
+    tag, fn, args = RUNNERS[0].submitted[0]
+    assert (tag, fn, args) == (main_ui.I_LOAD, main_ui.uc.load_or_init_state,
+                               ("保全点検", now.year, now.month, "2番充填"))
@@ -0,0 +1,72 @@
+import http.client, json
+import pytest
+from factory_app import service
+from factory_app.infra import inventory_repo
+from factory_app.service import BackgroundService, DEFAULT_HOST, Service, _apply_batch
+
+TOKEN = "test-token"
+EXP = "2026/12/01"
+
+@pytest.fixture
+def bg(storage):
+    svc = BackgroundService(TOKEN)
+    yield svc
+    svc.close()
+
+def call(bg, method: str, path: str, body=None, token=TOKEN):
+    conn = http.client.HTTPConnection("127.0.0.1", bg.port, timeout=30)
+    try:
+        headers = {"Content-Type": "application/json"}
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+        conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+        res = conn.getresponse()
+        return res.status, json.loads(res.read() or b"null")
+    finally:
+        conn.close()
+
+def move(op: str, qty: float, in_date: str = "2026/01/01"):
+    return op, {"op": op, "product_code": "A", "exp_date": EXP, "in_date": in_date, "qty": qty, "policy": "FIFO"}
+
+def test_listens_on_loopback_by_default(bg):
+    assert DEFAULT_HOST == "127.0.0.1"
+    assert bg.service._server.sockets[0].getsockname()[0] == "127.0.0.1"
+
+def test_token_is_required():
+    with pytest.raises(ValueError):
+        Service("")
+
+@pytest.mark.parametrize("token", [None, "wrong", ""])
+def test_requests_without_the_token_are_rejected(bg, token):
+    for method, path, body in (("GET", "/health", None), ("GET", "/metrics", None),
+                               ("POST", "/inventory/inbound", {"product_code": "A", "exp_date": EXP, "qty": 1})):
+        status, res = call(bg, method, path, body, token)
+        assert status == 401 and res["ok"] is False
+    assert inventory_repo.load_inventory().empty
+
+def test_moves_with_the_token(bg):
+    body = {"product_code": "A", "exp_date": EXP, "in_date": "2026/01/01", "qty": 2}
+    assert call(bg, "POST", "/inventory/inbound", body) == (200, {"ok": True, "message": "入庫を反映しました。"})
+    status, res = call(bg, "GET", "/inventory?product_code=A")
+    assert status == 200 and [r["qty"] for r in res["inventory"]] == [2.0]
+
+def test_batch_keeps_request_order(storage):
+    # 出庫の後に届いた入庫はその出庫に使わない（入庫を先に反映すると出庫が成功してしまう）
+    res = _apply_batch([move("outbound", 1.0), move("inbound", 2.0), move("outbound", 1.5),
+                        move("return_in", 1.0, "2025/12/01"), move("outbound", 1.0)])
+    assert [r["ok"] for r in res] == [False, True, True, True, True]
+    assert inventory_repo.load_inventory()[["in_date", "qty"]].values.tolist() == [["2026/01/01", 0.5],
+                                                                                  ["2025/12/01", 0.0]]
+
+def test_batch_is_applied_in_few_writes(storage, monkeypatch):
+    calls = []
+    real = service.uc_inv.import_movements
+
+    def counted(moves, *args, **kw):
+        calls.append(len(moves))
+        return real(moves, *args, **kw)
+
+    monkeypatch.setattr(service.uc_inv, "import_movements", counted)
+    _apply_batch([move("inbound", 1.0), move("return_in", 1.0), move("outbound", 1.0), move("outbound", 1.0),
+                  move("inbound", 1.0), move("outbound", 1.0)])
+    assert calls == [4, 2]
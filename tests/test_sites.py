@@ -0,0 +1,74 @@
+import json, os, subprocess, sys
+import pytest
+from factory_app import cli
+from factory_app.infra import inventory_repo, settings
+from factory_app.usecase import inventory as uc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 新しいプロセスで、保存先を向けた直後に最初に呼ぶのが画面の在庫表・期限の索引・CLI の場合
+FIRST_USE = {
+    "table_page": "print(len(inventory_repo.table_page().rows))",
+    "expiry_index": "print(len(inventory_repo.expiry_index().before('2027/01/01')))",
+    "expiry_report_cli": "from factory_app import cli\n"
+                         "sys.exit(cli.main(['expiry-report', '--date', '2026-11-25', '--days', '30', '--format', 'csv']))",
+}
+
+def run_fresh(storage, code: str) -> subprocess.CompletedProcess:
+    script = ("import sys\n"
+              "from factory_app.infra import inventory_repo, settings\n"
+              f"settings.use_settings({str(storage.parent / 'config' / 'settings.json')!r})\n"
+              f"inventory_repo.use_storage({str(storage)!r})\n" + code)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, "-c", script], cwd=str(storage.parent), env=env,
+                          capture_output=True, text=True, encoding="utf-8", timeout=120)
+
+@pytest.mark.parametrize("site", ["", "line2"])
+@pytest.mark.parametrize("first", sorted(FIRST_USE))
+def test_first_use_in_fresh_process(storage, site, first):
+    if site:
+        settings.update_settings({"site": site})
+    inventory_repo.use_storage(str(storage))
+    assert inventory_repo.current_site() == site
+    inventory_repo.inbound("A", "2026/12/01", "2026/10/01", 2.0, table=False)
+    inventory_repo.inbound("B", "2027/06/01", "2026/10/01", 1.0, table=False)
+    proc = run_fresh(storage, FIRST_USE[first])
+    assert proc.returncode == 0, proc.stderr
+    out = proc.stdout.strip().splitlines()
+    if first == "expiry_report_cli":
+        assert len(out) == 2 and out[1].split(",")[1] == "A"   # 見出し + 期限間近の1ロット
+    elif first == "table_page":
+        assert out == ["2"]
+    else:
+        assert out == ["1"]
+
+def test_sites_are_separate(storage):
+    for site, qty in (("east", 1.0), ("west", 2.0)):
+        uc.use_site(site)
+        assert inventory_repo.inbound("A", "2026/12/01", "2026/10/01", qty, table=False)[0]
+    uc.use_site("east")
+    assert inventory_repo.load_inventory()["qty"].tolist() == [1.0]
+    assert uc.sites() == ["east", "west"]
+    summary = uc.site_stock_summary(sites=["east", "west"], processes=1)
+    assert summary[["site", "qty"]].values.tolist() == [["east", 1.0], ["west", 2.0]]
+    combined = uc.site_stock_summary(sites=["east", "west"], processes=1, combined=True)
+    assert combined["qty"].tolist() == [3.0]
+    # 順に実行したあとは元の拠点へ戻る
+    assert inventory_repo.current_site() == "east"
+
+def test_expiry_report_cli_without_sites(storage, tmp_path, capsys):
+    # 拠点が1つも無い保存先でも、基準日のファイル名で空の一覧を出す
+    assert inventory_repo.sites() == []
+    out = tmp_path / "out"
+    assert cli.main(["expiry-report", "--sites", "all", "--out", str(out), "--date", "2026-11-25", "--days", "30"]) == 0
+    assert json.loads(capsys.readouterr().out) == []
+    assert os.listdir(out) == ["expiry_20261125.csv"]
+
+def test_map_sites_passes_args_as_a_tuple(storage):
+    names = ["east", "west"]
+    assert inventory_repo.map_sites(inventory_repo.current_site, names) == names
+    for site, qty in (("east", 1.0), ("west", 2.0)):
+        uc.use_site(site)
+        inventory_repo.inbound("A", "2026/12/01", "2026/10/01", qty, table=False)
+    got = inventory_repo.map_sites(uc.stock_summary, names, (uc.BY_EXP, ["A"]), processes=1)
+    assert [f["qty"].tolist() for f in got] == [[1.0], [2.0]]